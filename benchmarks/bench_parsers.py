@@ -0,0 +1,190 @@
+"""Microbenchmarks for CalBot's text-handling hot paths.
+
+Runs each benchmark over the phrase corpus and reports ops/sec and bytes
+allocated per call, then compares against benchmarks/baseline.json. Exits
+non-zero if any benchmark regresses past the tolerance, so it can gate CI.
+
+Usage:
+    python benchmarks/bench_parsers.py                    # compare to baseline
+    python benchmarks/bench_parsers.py --update-baseline  # record a new baseline
+    python benchmarks/bench_parsers.py --only parse_time_flexible
+
+Baselines are machine-specific: record them on the machine that runs the check.
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+# Importing cal builds the OpenAI client; no requests are made
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import pytz  # noqa: E402
+
+import cal  # noqa: E402
+from chatbot_server import extract_booking_details  # noqa: E402
+from corpus import booking_phrases, date_phrases, time_phrases  # noqa: E402
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+EVENT_TYPE_ID = 1
+
+
+def _tolerant(func):
+    """Wrap a call so unparseable corpus phrases don't abort the run"""
+    def call(arg):
+        try:
+            return func(arg)
+        except ValueError:
+            return None
+    return call
+
+
+def _slot_payload(day, step_minutes: int = 5) -> dict:
+    """A /slots response with a slot every few minutes from 9am to 5pm local time"""
+    tz = pytz.timezone(cal.USER_TIMEZONE)
+    start = tz.localize(datetime.combine(day, datetime.min.time()).replace(hour=9))
+    slots = []
+    for i in range(0, 8 * 60, step_minutes):
+        if (i // step_minutes) % 3 == 1:
+            continue  # leave gaps so some requests miss
+        slot = (start + timedelta(minutes=i)).astimezone(pytz.UTC)
+        slots.append({"time": slot.strftime("%Y-%m-%dT%H:%M:%SZ")})
+    return {"slots": {day.isoformat(): slots}}
+
+
+def build_benchmarks() -> dict:
+    """name -> (setup, call, inputs); setup runs before every timed pass"""
+    today = datetime.now().date()
+    tomorrow = today + timedelta(days=1)
+    slots = _slot_payload(tomorrow)
+    requested_times = [t.strip() for t in time_phrases(1000)]
+
+    def prime_slots():
+        cal.slot_cache.put(EVENT_TYPE_ID, tomorrow, cal.slot_minutes(slots, tomorrow))
+
+    def check_slots(requested_time):
+        return cal.check_availability.func(EVENT_TYPE_ID, "tomorrow", requested_time)
+
+    def parse_date_cold(phrase):
+        return cal._parse_date_on.__wrapped__(phrase.strip().lower(), today)
+
+    return {
+        "parse_date_flexible": (None, _tolerant(parse_date_cold), date_phrases()),
+        "parse_date_flexible[memo]": (None, _tolerant(cal.parse_date_flexible), date_phrases()),
+        "parse_time_flexible": (None, cal.parse_time_flexible.__wrapped__, time_phrases()),
+        "parse_time_flexible[memo]": (None, cal.parse_time_flexible, time_phrases()),
+        "extract_booking_details": (None, extract_booking_details, booking_phrases()),
+        "check_availability[slots]": (prime_slots, check_slots, requested_times),
+    }
+
+
+def _timed_pass(setup, call, inputs, loops: int) -> float:
+    if setup:
+        setup()
+    start = time.perf_counter()
+    for _ in range(loops):
+        for arg in inputs:
+            call(arg)
+    return time.perf_counter() - start
+
+
+def measure(setup, call, inputs, repeat: int, min_pass_seconds: float = 0.2) -> dict:
+    """Best-of-``repeat`` throughput plus mean bytes allocated per call.
+
+    Each timed pass loops over the corpus enough times to last at least
+    ``min_pass_seconds``, which keeps fast benchmarks out of timer noise.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        warmup = _timed_pass(setup, call, inputs, 1)
+        loops = max(1, math.ceil(min_pass_seconds / max(warmup, 1e-9)))
+        best = min(_timed_pass(setup, call, inputs, loops) for _ in range(repeat))
+
+        if setup:
+            setup()
+        allocated = 0
+        try:
+            for arg in inputs:
+                # Restarting clears the peak (tracemalloc.reset_peak is 3.9+)
+                tracemalloc.start()
+                call(arg)
+                allocated += tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "ops_per_sec": round(len(inputs) * loops / best, 1),
+        "alloc_bytes_per_call": round(allocated / len(inputs), 1),
+    }
+
+
+def compare(name: str, result: dict, baseline: dict, tolerance: float) -> list:
+    """Return regression messages for one benchmark"""
+    expected = baseline.get(name)
+    if not expected:
+        return []
+    problems = []
+    floor = expected["ops_per_sec"] * (1 - tolerance)
+    if result["ops_per_sec"] < floor:
+        problems.append(f"{name}: {result['ops_per_sec']:.0f} ops/s < {floor:.0f} "
+                        f"(baseline {expected['ops_per_sec']:.0f})")
+    # Small absolute slack: tracemalloc numbers jitter by a few blocks
+    ceiling = expected["alloc_bytes_per_call"] * (1 + tolerance) + 64
+    if result["alloc_bytes_per_call"] > ceiling:
+        problems.append(f"{name}: {result['alloc_bytes_per_call']:.0f} B/call > {ceiling:.0f} "
+                        f"(baseline {expected['alloc_bytes_per_call']:.0f})")
+    return problems
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--update-baseline", action="store_true", help="write results to baseline.json")
+    parser.add_argument("--tolerance", type=float, default=0.30, help="allowed fractional regression")
+    parser.add_argument("--repeat", type=int, default=5, help="timed passes per benchmark (best is kept)")
+    parser.add_argument("--only", action="append", help="run only the named benchmark(s)")
+    args = parser.parse_args(argv)
+
+    baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+    benchmarks = build_benchmarks()
+    names = args.only or list(benchmarks)
+
+    results, problems = {}, []
+    print(f"{'benchmark':<30} {'calls':>6} {'ops/sec':>12} {'B/call':>10} {'vs baseline':>12}")
+    for name in names:
+        setup, call, inputs = benchmarks[name]
+        result = measure(setup, call, inputs, args.repeat)
+        results[name] = result
+        expected = baseline.get(name)
+        delta = f"{result['ops_per_sec'] / expected['ops_per_sec'] - 1:+.1%}" if expected else "new"
+        print(f"{name:<30} {len(inputs):>6} {result['ops_per_sec']:>12,.0f} "
+              f"{result['alloc_bytes_per_call']:>10,.0f} {delta:>12}")
+        problems += compare(name, result, baseline, args.tolerance)
+
+    if args.update_baseline:
+        baseline.update(results)
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        print(f"\nBaseline written to {BASELINE_PATH.relative_to(ROOT)}")
+        return 0
+
+    if problems:
+        print("\n❌ Regressions:")
+        for problem in problems:
+            print(f"  - {problem}")
+        return 1
+    print("\n✅ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""Concurrency check: N simultaneous sessions should take about as long as one.
+
+Runs one scripted /ws session alone, then --sessions of the same session at
+once, against a stubbed model and Cal.com with fixed latency. Each session
+spends nearly all its time waiting on those stubs. So if the event loop never
+blocks on the agent, the N sessions overlap and finish in about one session's
+wall time. If something blocks the loop, they queue up behind each other and
+the wall time grows with N. The exit status is non-zero when the concurrent
+run takes more than --max-ratio times the single session, or any session fails.
+
+Usage:
+    python benchmarks/concurrency_check.py --sessions 20
+    python benchmarks/concurrency_check.py --target http://127.0.0.1:8000 --sessions 10
+
+Starts the same local stack as load_chat.py unless --target is given. The
+local stack gets AGENT_MAX_WORKERS of at least --sessions, so the executor
+isn't the bottleneck. Needs `pip install websockets httpx`.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import websockets
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from load_chat import local_stack, receive_reply  # noqa: E402
+
+# A read, then a booking and its confirmation: model calls plus Cal.com reads and a write
+TURNS = ["Show me my scheduled events", "Book a meeting tomorrow at 10am", "yes"]
+
+
+async def session(url: str, timeout: float) -> float:
+    """Run TURNS through one /ws session; return its wall time in seconds"""
+    started = time.perf_counter()
+    async with websockets.connect(url, max_size=None, open_timeout=timeout) as ws:
+        await receive_reply(ws, timeout)  # greeting
+        for turn in TURNS:
+            await ws.send(turn)
+            frame, _first = await receive_reply(ws, timeout)
+            if frame["type"] == "error":
+                raise RuntimeError(frame.get("content", "error frame"))
+    return time.perf_counter() - started
+
+
+async def run_check(args, base_url: str) -> dict:
+    ws_url = base_url.replace("http", "ws", 1).rstrip("/") + "/ws"
+    await session(ws_url, args.timeout)  # warm-up: imports, connection pools, first mirror sync
+
+    single = [await session(ws_url, args.timeout) for _ in range(args.repeat)]
+    print(f"   1 session:  {statistics.median(single):.2f}s (median of {args.repeat})")
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(session(ws_url, args.timeout) for _ in range(args.sessions)),
+                                   return_exceptions=True)
+    wall = time.perf_counter() - started
+    errors = [f"{type(r).__name__}: {r}" for r in results if isinstance(r, BaseException)]
+    durations = [r for r in results if not isinstance(r, BaseException)]
+    print(f"   {args.sessions} sessions: {wall:.2f}s wall")
+    return {
+        "sessions": args.sessions,
+        "single_seconds": round(statistics.median(single), 3),
+        "concurrent_wall_seconds": round(wall, 3),
+        "concurrent_max_seconds": round(max(durations, default=0.0), 3),
+        "ratio": round(wall / statistics.median(single), 2),
+        "errors": errors[:5],
+        "error_count": len(errors),
+    }
+
+
+def verdict(report: dict, args) -> int:
+    status = 0
+    print(f"\n⏱️ {report['sessions']} concurrent sessions took {report['ratio']:.2f}x one session "
+          f"(limit {args.max_ratio:.1f}x)")
+    if report["ratio"] > args.max_ratio:
+        print("❌ Sessions are queuing behind each other; something is blocking the event loop")
+        status = 1
+    if report["error_count"]:
+        print(f"❌ {report['error_count']} sessions failed: {report['errors']}")
+        status = 1
+    if not status:
+        print("✅ Sessions ran concurrently")
+    return status
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Check that concurrent /ws sessions don't block each other")
+    parser.add_argument("--target", help="URL of a running server (default: start a local stubbed stack)")
+    parser.add_argument("--sessions", type=int, default=20, help="sessions to run at once")
+    parser.add_argument("--repeat", type=int, default=3, help="single-session runs to take the median of")
+    parser.add_argument("--max-ratio", type=float, default=2.0,
+                        help="allowed concurrent wall time, as a multiple of one session's")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for a reply")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--base-port", type=int, default=8100, help="local stack ports: server, +1 Cal.com, +2 LLM")
+    parser.add_argument("--calcom-latency-ms", type=float, default=200.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--json", dest="json_path", help="also write the report to this file")
+    args = parser.parse_args(argv)
+    # Fixed latency on both fakes, so one session's time is predictable
+    args.calcom_jitter_ms = args.llm_token_ms = 0.0
+    args.calcom_error_rate = args.calcom_rate_limit_rate = 0.0
+
+    print(f"🔀 1 session alone, then {args.sessions} at once")
+    if args.target:
+        report = asyncio.run(run_check(args, args.target))
+    else:
+        workers = max(args.sessions, int(os.environ.get("AGENT_MAX_WORKERS", "16")))
+        os.environ["AGENT_MAX_WORKERS"] = str(workers)
+        with local_stack(args) as (server, _calcom_url, _llm_url):
+            report = asyncio.run(run_check(args, server))
+
+    status = verdict(report, args)
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(report, indent=2))
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
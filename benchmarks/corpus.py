@@ -0,0 +1,84 @@
+"""Phrase corpus for the parser benchmarks.
+
+The phrases are synthetic: the templates below are modelled on the date,
+time and booking formats CalBot supports, not taken from real user
+messages. The builders fill them with random dates, times and fillers into
+a few thousand deterministic samples (fixed seed), so runs are comparable.
+"""
+import random
+
+SEED = 2025
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+MONTHS = ["january", "jan", "february", "feb", "march", "mar", "april", "apr", "may",
+          "june", "jun", "july", "jul", "august", "aug", "september", "sep",
+          "october", "oct", "november", "nov", "december", "dec"]
+EVENT_NAMES = ["", "15 min meeting ", "30 min meeting ", "secret meeting ", "30 minute "]
+
+DATE_TEMPLATES = [
+    "today", "tomorrow", "Tomorrow", "day after tomorrow", "yesterday",
+    "this week", "next week",
+    "this {weekday}", "next {weekday}", "last {weekday}", "This {Weekday}",
+    "{m}/{d}/{yy}", "{m}/{d}/{yyyy}", "{mm}/{dd}/{yyyy}",
+    "{yyyy}-{mm}-{dd}", "{yyyy}/{m}/{d}", "{yyyy}{mm}{dd}",
+    "{month} {d}", "{month} {d}{suffix}", "{month} {d}, {yyyy}", "{Month} {d}{suffix}, {yyyy}",
+    "{d}{suffix} {month}", "{d} {month} {yyyy}", "{d}{suffix} {Month}, {yyyy}",
+]
+
+TIME_TEMPLATES = [
+    "{h12}pm", "{h12}am", "{h12} pm", "{h12} PM", "{h12}:{mi}pm", "{h12}:{mi} PM",
+    "{h12}:{mi} am", "{h24}:{mi}", "{h24}", "{h12}", " {h12}:{mi}PM ",
+]
+
+BOOKING_TEMPLATES = [
+    "book a {event}meeting {date} at {time}",
+    "Book {event}{date} @ {time}",
+    "book me in {date} {time}",
+    "can you book a {event}call for {date} at {time}?",
+    "please book {date} {time}",
+    "book {event}at {time} {date}",
+    "I need to book a meeting {date}, around {time}",
+    "book something {date}",
+]
+
+SUFFIXES = ["", "st", "nd", "rd", "th"]
+
+
+def _fields(rng: random.Random) -> dict:
+    month = rng.choice(MONTHS)
+    weekday = rng.choice(WEEKDAYS)
+    m, d = rng.randint(1, 12), rng.randint(1, 28)
+    year = rng.choice([2025, 2026])
+    h24 = rng.randint(0, 23)
+    return {
+        "weekday": weekday, "Weekday": weekday.title(),
+        "month": month, "Month": month.title(),
+        "m": m, "d": d, "mm": f"{m:02d}", "dd": f"{d:02d}",
+        "yy": f"{year % 100:02d}", "yyyy": year,
+        "suffix": rng.choice(SUFFIXES),
+        "h12": rng.randint(1, 12), "h24": h24,
+        "mi": rng.choice(["00", "15", "30", "45", "05", "50"]),
+    }
+
+
+def date_phrases(n: int = 3000) -> list:
+    rng = random.Random(SEED)
+    return [rng.choice(DATE_TEMPLATES).format(**_fields(rng)) for _ in range(n)]
+
+
+def time_phrases(n: int = 3000) -> list:
+    rng = random.Random(SEED + 1)
+    return [rng.choice(TIME_TEMPLATES).format(**_fields(rng)) for _ in range(n)]
+
+
+def booking_phrases(n: int = 3000) -> list:
+    rng = random.Random(SEED + 2)
+    phrases = []
+    for _ in range(n):
+        fields = _fields(rng)
+        date = rng.choice(DATE_TEMPLATES).format(**fields)
+        time = rng.choice(TIME_TEMPLATES).format(**fields).strip()
+        phrases.append(rng.choice(BOOKING_TEMPLATES).format(
+            event=rng.choice(EVENT_NAMES), date=date, time=time
+        ))
+    return phrases
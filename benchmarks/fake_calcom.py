@@ -0,0 +1,297 @@
+"""Local stand-in for the Cal.com v1 API, for offline benchmarks and soak tests.
+
+Implements the endpoints cal.py uses (/event-types, /slots, /bookings GET,
+POST and DELETE) on top of an in-memory calendar. Latency, jitter, 5xx
+errors and 429 rate limiting can be injected, either at random or as a
+per-minute request limit like the real API's. All randomness comes from
+one seeded RNG, so runs are repeatable.
+
+Usage:
+    python benchmarks/fake_calcom.py --port 8787 --latency-ms 80 --jitter-ms 20 \\
+        --error-rate 0.01 --rate-limit-rate 0.02
+
+    CALCOM_BASE_URL=http://127.0.0.1:8787/v1 CALCOM_API_KEY=fake python chatbot_server.py
+
+Test-control endpoints (no API key needed):
+    GET  /_fake/stats   request counts per endpoint and status
+    POST /_fake/reset   restore the seeded calendar and clear stats
+    POST /_fake/config  change fault injection at runtime, e.g. {"latency_ms": 200}
+"""
+import argparse
+import asyncio
+import itertools
+import math
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, asdict, fields
+from datetime import datetime, timedelta
+from typing import Optional
+
+import pytz
+import uvicorn
+from fastapi import APIRouter, FastAPI, Request
+from fastapi.responses import JSONResponse
+
+EVENT_TYPES = [
+    {"id": 1001, "title": "15 Min Meeting", "slug": "15min", "length": 15},
+    {"id": 1002, "title": "30 Min Meeting", "slug": "30min", "length": 30},
+    {"id": 1003, "title": "Secret Meeting", "slug": "secret", "length": 15},
+]
+
+
+@dataclass
+class FakeConfig:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0        # fraction of requests answered with a 500
+    rate_limit_rate: float = 0.0   # fraction of requests answered with a 429
+    retry_after: int = 1           # seconds, sent with injected 429s
+    requests_per_minute: int = 0   # upstream rate limit per one-minute window (0: none)
+    seed: int = 42
+    seed_bookings: int = 0         # random bookings placed over the next week
+    timezone: str = "America/Los_Angeles"
+    work_start_hour: int = 9
+    work_end_hour: int = 17
+    host_name: str = "Fake Host"
+
+
+def _parse_iso(value: str) -> datetime:
+    value = value.replace("Z", "+00:00")
+    if "T" not in value:
+        value += "T00:00:00+00:00"
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else pytz.UTC.localize(parsed)
+
+
+def _iso(dt: datetime) -> str:
+    return dt.astimezone(pytz.UTC).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+class FakeCalendar:
+    """In-memory event types and bookings with Cal.com-shaped responses"""
+
+    def __init__(self, config: FakeConfig):
+        self.config = config
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.rng = random.Random(self.config.seed)
+            self.event_types = {e["id"]: dict(e) for e in EVENT_TYPES}
+            self.bookings = {}
+            self._ids = itertools.count(1)
+            self.stats = Counter()
+        tz = pytz.timezone(self.config.timezone)
+        today = datetime.now(tz).date()
+        for _ in range(self.config.seed_bookings):
+            event = self.rng.choice(EVENT_TYPES)
+            day = today + timedelta(days=self.rng.randint(0, 6))
+            minute = self.rng.randrange(
+                self.config.work_start_hour * 60, self.config.work_end_hour * 60 - event["length"], 15
+            )
+            start = tz.localize(datetime.combine(day, datetime.min.time()) + timedelta(minutes=minute))
+            self.create_booking(event["id"], start, "seed@example.com", "Seed Attendee")
+
+    def _overlaps(self, start: datetime, end: datetime) -> bool:
+        return any(
+            b["status"] != "CANCELLED" and b["_start"] < end and start < b["_end"]
+            for b in self.bookings.values()
+        )
+
+    def slots(self, event_type_id: int, start: datetime, end: datetime, tz_name: str) -> dict:
+        event = self.event_types.get(event_type_id)
+        if not event:
+            return {}
+        tz = pytz.timezone(tz_name or self.config.timezone)
+        length = timedelta(minutes=event["length"])
+        result = {}
+        day = start.astimezone(tz).date()
+        with self.lock:
+            while day <= end.astimezone(tz).date():
+                cursor = tz.localize(datetime.combine(day, datetime.min.time()).replace(hour=self.config.work_start_hour))
+                close = tz.localize(datetime.combine(day, datetime.min.time()).replace(hour=self.config.work_end_hour))
+                while cursor + length <= close:
+                    if start <= cursor <= end and not self._overlaps(cursor, cursor + length):
+                        result.setdefault(day.isoformat(), []).append({"time": _iso(cursor)})
+                    cursor += length
+                day += timedelta(days=1)
+        return result
+
+    def create_booking(self, event_type_id: int, start: datetime, email: str, name: str) -> Optional[dict]:
+        event = self.event_types.get(event_type_id)
+        if not event:
+            return None
+        end = start + timedelta(minutes=event["length"])
+        with self.lock:
+            if self._overlaps(start, end):
+                return None
+            booking_id = next(self._ids)
+            self.bookings[booking_id] = {
+                "id": booking_id,
+                "uid": f"fake-{booking_id}",
+                "title": f"{event['title']} between {self.config.host_name} and {name}",
+                "eventTypeId": event_type_id,
+                "startTime": _iso(start),
+                "endTime": _iso(end),
+                "status": "ACCEPTED",
+                "attendees": [{"email": email, "name": name}],
+                "user": {"name": self.config.host_name},
+                "_start": start,
+                "_end": end,
+            }
+            return self.public(self.bookings[booking_id])
+
+    @staticmethod
+    def public(booking: dict) -> dict:
+        return {k: v for k, v in booking.items() if not k.startswith("_")}
+
+
+def create_app(config: FakeConfig = None) -> FastAPI:
+    config = config or FakeConfig()
+    calendar = FakeCalendar(config)
+    app = FastAPI(title="Fake Cal.com")
+    app.state.calendar = calendar
+    api = APIRouter(prefix="/v1")
+    window = {"start": 0.0, "count": 0}
+
+    def over_limit() -> bool:
+        now = time.monotonic()
+        if now - window["start"] >= 60:
+            window.update(start=now, count=0)
+        window["count"] += 1
+        return window["count"] > config.requests_per_minute
+
+    @app.middleware("http")
+    async def inject_faults(request: Request, call_next):
+        path = request.url.path
+        if path.startswith("/_fake"):
+            return await call_next(request)
+        if config.latency_ms or config.jitter_ms:
+            delay = config.latency_ms + calendar.rng.uniform(-config.jitter_ms, config.jitter_ms)
+            await asyncio.sleep(max(0.0, delay) / 1000)
+        template = "/v1/bookings/{id}" if path.startswith("/v1/bookings/") else path
+        if not request.query_params.get("apiKey"):
+            response = JSONResponse({"message": "No apiKey provided"}, status_code=401)
+        elif config.requests_per_minute and over_limit():
+            response = JSONResponse(
+                {"message": "Rate limit exceeded"}, status_code=429,
+                headers={"Retry-After": str(max(1, math.ceil(window["start"] + 60 - time.monotonic())))}
+            )
+        elif calendar.rng.random() < config.rate_limit_rate:
+            response = JSONResponse(
+                {"message": "Too many requests"}, status_code=429,
+                headers={"Retry-After": str(config.retry_after)}
+            )
+        elif calendar.rng.random() < config.error_rate:
+            response = JSONResponse({"message": "Injected upstream error"}, status_code=500)
+        else:
+            response = await call_next(request)
+        calendar.stats[f"{request.method} {template} {response.status_code}"] += 1
+        return response
+
+    @api.get("/event-types")
+    async def list_event_types():
+        return {"event_types": list(calendar.event_types.values())}
+
+    @api.get("/event-types/{event_type_id}")
+    async def get_event_type(event_type_id: int):
+        event = calendar.event_types.get(event_type_id)
+        if not event:
+            return JSONResponse({"message": "Event type not found"}, status_code=404)
+        return {"event_type": event}
+
+    @api.get("/slots")
+    async def get_slots(eventTypeId: int, startTime: str, endTime: str, timeZone: str = None):
+        return {"slots": calendar.slots(eventTypeId, _parse_iso(startTime), _parse_iso(endTime), timeZone)}
+
+    @api.get("/bookings")
+    async def list_bookings(attendeeEmail: str = None, startTime: str = None,
+                            endTime: str = None, status: str = None):
+        start = _parse_iso(startTime) if startTime else None
+        end = _parse_iso(endTime) if endTime else None
+        now = datetime.now(pytz.UTC)
+        with calendar.lock:
+            bookings = sorted(calendar.bookings.values(), key=lambda b: b["_start"])
+        selected = []
+        for booking in bookings:
+            if attendeeEmail and attendeeEmail not in [a["email"] for a in booking["attendees"]]:
+                continue
+            if start and booking["_start"] < start or end and booking["_start"] > end:
+                continue
+            if status == "upcoming" and (booking["_end"] < now or booking["status"] == "CANCELLED"):
+                continue
+            selected.append(calendar.public(booking))
+        return {"bookings": selected}
+
+    @api.post("/bookings")
+    async def create_booking(request: Request):
+        body = await request.json()
+        responses = body.get("responses") or {}
+        try:
+            start = _parse_iso(body["start"])
+            event_type_id = int(body["eventTypeId"])
+        except (KeyError, TypeError, ValueError):
+            return JSONResponse({"message": "invalid_type in 'start' validation"}, status_code=400)
+        if event_type_id not in calendar.event_types:
+            return JSONResponse({"message": "Event type not found"}, status_code=404)
+        booking = calendar.create_booking(
+            event_type_id, start, responses.get("email", ""), responses.get("name", "Guest")
+        )
+        if booking is None:
+            return JSONResponse({"message": "no_available_users_found_error"}, status_code=400)
+        return booking
+
+    @api.delete("/bookings/{booking_id}")
+    async def cancel_booking(booking_id: int):
+        with calendar.lock:
+            booking = calendar.bookings.get(booking_id)
+            if not booking:
+                return JSONResponse({"message": "Booking not found"}, status_code=404)
+            booking["status"] = "CANCELLED"
+        return {"message": "Booking successfully cancelled."}
+
+    @app.get("/_fake/stats")
+    async def stats():
+        with calendar.lock:
+            return {
+                "requests": dict(calendar.stats),
+                "bookings": sum(1 for b in calendar.bookings.values() if b["status"] != "CANCELLED"),
+                "config": asdict(config),
+            }
+
+    @app.post("/_fake/reset")
+    async def reset():
+        calendar.reset()
+        return {"ok": True}
+
+    @app.post("/_fake/config")
+    async def update_config(request: Request):
+        body = await request.json()
+        known = {f.name for f in fields(FakeConfig)}
+        for key, value in body.items():
+            if key in known:
+                setattr(config, key, type(getattr(config, key))(value))
+        return asdict(config)
+
+    app.include_router(api)
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a local fake Cal.com API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    for field in fields(FakeConfig):
+        default = getattr(FakeConfig, field.name)
+        parser.add_argument(f"--{field.name.replace('_', '-')}", type=type(default), default=default)
+    args = parser.parse_args(argv)
+    config = FakeConfig(**{f.name: getattr(args, f.name) for f in fields(FakeConfig)})
+    print(f"🧪 Fake Cal.com on http://{args.host}:{args.port}/v1")
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
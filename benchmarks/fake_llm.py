@@ -0,0 +1,192 @@
+"""Scripted stand-in for the OpenAI chat completions API, for load tests.
+
+Picks CalBot's tool calls from keywords in the last user message and, once
+tool results come back, answers with them, so the agent loop runs its real
+code path (tool calling, streaming) without an OpenAI account. Supports
+streaming and non-streaming responses, with configurable latency.
+
+Usage reports estimated prompt tokens and simulates OpenAI's prompt caching
+(prefixes of 1024+ tokens, in 128-token steps, are cached once seen), so
+cached_tokens shows whether requests share a stable prefix.
+
+Usage:
+    python benchmarks/fake_llm.py --port 8788 --latency-ms 300 --token-ms 15
+    OPENAI_BASE_URL=http://127.0.0.1:8788/v1 OPENAI_API_KEY=fake python chatbot_server.py
+"""
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import re
+import time
+from dataclasses import dataclass
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+TIME_RE = re.compile(r'\b(\d{1,2}(?::\d{2})?\s*(?:am|pm)?)\b(?!/)', re.IGNORECASE)
+
+
+@dataclass
+class FakeLLMConfig:
+    latency_ms: float = 0.0     # before the first token
+    token_ms: float = 0.0       # between streamed chunks
+    event_type_id: int = 1001   # first event type in fake_calcom.py
+    model: str = "gpt-4o"
+
+
+class PromptCacheSim:
+    """Which prompt prefixes have been seen, at OpenAI's caching granularity"""
+    CHARS_PER_TOKEN = 4
+    MIN_TOKENS = 1024
+    STEP_TOKENS = 128
+
+    def __init__(self):
+        self._seen = set()
+
+    def usage(self, body: dict) -> dict:
+        prompt = json.dumps(body.get("tools", []), sort_keys=True) + "".join(
+            json.dumps(m, sort_keys=True) for m in body.get("messages", []))
+        prompt_tokens = len(prompt) // self.CHARS_PER_TOKEN
+        cached = 0
+        for tokens in range(self.MIN_TOKENS, prompt_tokens + 1, self.STEP_TOKENS):
+            key = hashlib.sha1(prompt[:tokens * self.CHARS_PER_TOKEN].encode()).digest()
+            if key in self._seen:
+                cached = tokens
+            self._seen.add(key)
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": 0, "total_tokens": prompt_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached}}
+
+
+def _date_reference(text: str) -> str:
+    for word in ("today", "tomorrow", "this week"):
+        if word in text:
+            return word
+    return "tomorrow"
+
+
+def plan_tool_call(text: str, config: FakeLLMConfig):
+    """Return (tool name, args) for a user message, or None to just chat"""
+    text = text.lower()
+    times = [t.strip() for t in TIME_RE.findall(text) if t.strip()]
+    date = _date_reference(text)
+    if "cancel" in text:
+        return "cancel_event", {"time": times[0] if times else None, "date_reference": date}
+    if "move" in text or "reschedule" in text:
+        if len(times) >= 2:
+            return "reschedule_event", {"old_time": times[0], "new_time": times[1], "date_reference": date}
+        return None
+    if "book" in text:
+        return "book_meeting", {
+            "event_type_id": config.event_type_id, "date": date,
+            "time": times[0] if times else "10am", "attendee_name": "Load Test",
+        }
+    if ("available" in text or "free" in text) and ("week" in text or "days" in text):
+        return "check_availability_range", {"event_type_id": config.event_type_id,
+                                            "dates": "next week" if "next week" in text else "this week"}
+    if "available" in text or "free" in text:
+        args = {"event_type_id": config.event_type_id, "date": date}
+        if times:
+            args["requested_time"] = times[0]
+        return "check_availability", args
+    if "type" in text:
+        return "list_event_types", {}
+    if any(word in text for word in ("show", "schedule", "meetings", "calendar", "list")):
+        return "list_scheduled_events", {}
+    return None
+
+
+def create_app(config: FakeLLMConfig = None) -> FastAPI:
+    config = config or FakeLLMConfig()
+    app = FastAPI(title="Fake OpenAI")
+    ids = itertools.count(1)
+    stats = {"requests": 0, "tool_calls": 0, "prompt_tokens": 0, "cached_tokens": 0}
+    prompt_cache = PromptCacheSim()
+
+    def reply_for(messages: list):
+        """Return (content, tool_calls) for the next assistant turn"""
+        last = messages[-1]
+        if last.get("role") == "tool":
+            # Keep replies reply-sized: a real model summarizes long tool output
+            results = [m.get("content", "") for m in reversed(messages) if m.get("role") == "tool"]
+            return "Here's what I found:\n" + str(results[0])[:300], None
+        plan = plan_tool_call(str(last.get("content", "")), config)
+        if not plan:
+            return "I can book, list, cancel or reschedule meetings for you. What would you like to do?", None
+        name, args = plan
+        return None, [{
+            "id": f"call_{next(ids)}", "type": "function",
+            "function": {"name": name, "arguments": json.dumps({k: v for k, v in args.items() if v is not None})},
+        }]
+
+    def envelope(obj: str, choice: dict) -> dict:
+        return {"id": f"chatcmpl-{next(ids)}", "object": obj, "created": int(time.time()),
+                "model": config.model, "choices": [choice]}
+
+    async def stream(content, tool_calls, usage=None):
+        await asyncio.sleep(config.latency_ms / 1000)
+        yield "data: " + json.dumps(envelope("chat.completion.chunk", {
+            "index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None})) + "\n\n"
+        if tool_calls:
+            delta = {"tool_calls": [dict(call, index=i) for i, call in enumerate(tool_calls)]}
+            yield "data: " + json.dumps(envelope("chat.completion.chunk", {
+                "index": 0, "delta": delta, "finish_reason": None})) + "\n\n"
+        else:
+            for word in re.findall(r'\S+\s*', content):
+                if config.token_ms:
+                    await asyncio.sleep(config.token_ms / 1000)
+                yield "data: " + json.dumps(envelope("chat.completion.chunk", {
+                    "index": 0, "delta": {"content": word}, "finish_reason": None})) + "\n\n"
+        yield "data: " + json.dumps(envelope("chat.completion.chunk", {
+            "index": 0, "delta": {}, "finish_reason": "tool_calls" if tool_calls else "stop"})) + "\n\n"
+        if usage:
+            yield "data: " + json.dumps(dict(envelope("chat.completion.chunk", {}), choices=[], usage=usage)) + "\n\n"
+        yield "data: [DONE]\n\n"
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        content, tool_calls = reply_for(body.get("messages", []))
+        if tool_calls:
+            stats["tool_calls"] += len(tool_calls)
+        usage = prompt_cache.usage(body)
+        stats["prompt_tokens"] += usage["prompt_tokens"]
+        stats["cached_tokens"] += usage["prompt_tokens_details"]["cached_tokens"]
+        if body.get("stream"):
+            include_usage = (body.get("stream_options") or {}).get("include_usage")
+            return StreamingResponse(stream(content, tool_calls, usage if include_usage else None),
+                                     media_type="text/event-stream")
+        await asyncio.sleep(config.latency_ms / 1000)
+        message = {"role": "assistant", "content": content}
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+        response = envelope("chat.completion", {
+            "index": 0, "message": message, "finish_reason": "tool_calls" if tool_calls else "stop"})
+        response["usage"] = usage
+        return response
+
+    @app.get("/_fake/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a scripted fake OpenAI chat API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8788)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--token-ms", type=float, default=0.0)
+    parser.add_argument("--event-type-id", type=int, default=1001)
+    args = parser.parse_args(argv)
+    config = FakeLLMConfig(latency_ms=args.latency_ms, token_ms=args.token_ms, event_type_id=args.event_type_id)
+    print(f"🧪 Fake OpenAI on http://{args.host}:{args.port}/v1")
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""End-to-end load generator for the CalBot web server.
+
+Opens many concurrent WebSocket sessions against /ws and drives scripted
+conversations through them: book, list, cancel, reschedule, availability,
+and yes/no confirmations. It can also fire REST traffic at /chat. It
+reports throughput, latency percentiles and error rates per channel.
+
+By default it starts the whole stack locally: fake_calcom.py, fake_llm.py
+and one chatbot_server worker pointed at both. Results are reproducible and
+no real Cal.com or OpenAI account is touched. Pass --target to load an
+already running server instead.
+
+Usage:
+    python benchmarks/load_chat.py --sessions 2000 --concurrency 500 --rest-requests 1000
+    python benchmarks/load_chat.py --target http://127.0.0.1:8000 --sessions 200
+
+Needs `pip install websockets httpx`. For thousands of sockets, raise the
+open-file limit first (`ulimit -n 65536`).
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+import websockets
+
+ROOT = Path(__file__).resolve().parent.parent
+HERE = Path(__file__).resolve().parent
+
+HOURS = ["9am", "9:30am", "10am", "10:30am", "11am", "1pm", "1:30pm", "2pm", "2:30pm", "3pm", "4pm"]
+
+# Scripted conversations; {t1}/{t2} are filled with random working-hour times
+SCRIPTS = {
+    "book": ["Book a meeting tomorrow at {t1}"],
+    "book_confirm": ["Book a meeting tomorrow at {t1}", "yes"],
+    "book_decline": ["Book a meeting tomorrow at {t1}", "no"],
+    "list": ["Show me my scheduled events"],
+    "cancel": ["Cancel my {t1} meeting tomorrow"],
+    "reschedule": ["Move my {t1} meeting tomorrow to {t2}"],
+    "availability": ["Is {t1} free tomorrow?"],
+    "event_types": ["What meeting types are available?"],
+    "book_then_list": ["Book a meeting tomorrow at {t1}", "Show me my scheduled events"],
+}
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Recorder:
+    """Per-channel turn latencies, time-to-first-frame and errors"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.first_frame = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_samples = defaultdict(list)
+        self.by_script = defaultdict(list)
+
+    def turn(self, channel: str, script: str, latency: float, first_frame: float = None):
+        self.latencies[channel].append(latency)
+        self.by_script[f"{channel}:{script}"].append(latency)
+        if first_frame is not None:
+            self.first_frame[channel].append(first_frame)
+
+    def error(self, channel: str, detail: str):
+        self.errors[channel] += 1
+        if len(self.error_samples[channel]) < 5:
+            self.error_samples[channel].append(detail[:200])
+
+    def summary(self, wall: dict) -> dict:
+        report = {}
+        for channel in sorted(set(self.latencies) | set(self.errors)):
+            lat = self.latencies[channel]
+            total = len(lat) + self.errors[channel]
+            report[channel] = {
+                "turns": len(lat),
+                "errors": self.errors[channel],
+                "error_rate": self.errors[channel] / total if total else 0.0,
+                "throughput_per_sec": len(lat) / wall[channel] if wall.get(channel) else 0.0,
+                "latency_ms": {**{p: percentile(lat, p) * 1000 for p in (50, 90, 99)},
+                               "max": max(lat, default=0) * 1000},
+                "first_frame_ms": {p: percentile(self.first_frame[channel], p) * 1000 for p in (50, 99)},
+                "error_samples": self.error_samples[channel],
+            }
+        report["scripts"] = {
+            name: {"turns": len(lat), "p50_ms": percentile(lat, 50) * 1000, "p99_ms": percentile(lat, 99) * 1000}
+            for name, lat in sorted(self.by_script.items())
+        }
+        return report
+
+
+def render(script: list, rng: random.Random) -> list:
+    t1, t2 = rng.sample(HOURS, 2)
+    return [turn.format(t1=t1, t2=t2) for turn in script]
+
+
+async def receive_reply(ws, timeout: float):
+    """Read frames until the final message/error frame; return (frame, seconds to first frame)"""
+    start = time.perf_counter()
+    first = None
+    while True:
+        raw = await asyncio.wait_for(ws.recv(), timeout)
+        if first is None:
+            first = time.perf_counter() - start
+        try:
+            frame = json.loads(raw)
+        except ValueError:
+            frame = {"type": "message", "content": raw}
+        if frame.get("type") in ("message", "error"):
+            return frame, first
+
+
+async def ws_session(url: str, name: str, turns: list, recorder: Recorder, timeout: float):
+    try:
+        async with websockets.connect(url, max_size=None, open_timeout=timeout) as ws:
+            await receive_reply(ws, timeout)  # greeting
+            for turn in turns:
+                start = time.perf_counter()
+                await ws.send(turn)
+                frame, first = await receive_reply(ws, timeout)
+                if frame["type"] == "error":
+                    recorder.error("ws", frame.get("content", ""))
+                else:
+                    recorder.turn("ws", name, time.perf_counter() - start, first)
+    except (OSError, asyncio.TimeoutError, websockets.WebSocketException) as e:
+        recorder.error("ws", f"{type(e).__name__}: {e}")
+
+
+async def rest_request(client: httpx.AsyncClient, name: str, message: str, recorder: Recorder):
+    start = time.perf_counter()
+    try:
+        response = await client.post("/chat", json={"message": message})
+        reply = response.json().get("reply", "") if response.status_code == 200 else ""
+        if response.status_code != 200 or reply.startswith("Sorry, I encountered an error"):
+            recorder.error("rest", f"{response.status_code}: {reply or response.text}")
+        else:
+            recorder.turn("rest", name, time.perf_counter() - start)
+    except (httpx.HTTPError, asyncio.TimeoutError) as e:
+        recorder.error("rest", f"{type(e).__name__}: {e}")
+
+
+async def run_bounded(coros, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def guarded(coro):
+        async with semaphore:
+            await coro
+
+    await asyncio.gather(*(guarded(c) for c in coros))
+
+
+async def run_load(args) -> dict:
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    wall = {}
+    ws_url = args.target.replace("http", "ws", 1).rstrip("/") + "/ws"
+
+    names = list(SCRIPTS)
+    if args.sessions:
+        sessions = []
+        for _ in range(args.sessions):
+            name = rng.choice(names)
+            sessions.append(ws_session(ws_url, name, render(SCRIPTS[name], rng), recorder, args.timeout))
+        start = time.perf_counter()
+        await run_bounded(sessions, args.concurrency)
+        wall["ws"] = time.perf_counter() - start
+
+    if args.rest_requests:
+        single_turn = [n for n in names if len(SCRIPTS[n]) == 1]
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=args.target, timeout=args.timeout, limits=limits) as client:
+            requests = []
+            for _ in range(args.rest_requests):
+                name = rng.choice(single_turn)
+                requests.append(rest_request(client, name, render(SCRIPTS[name], rng)[0], recorder))
+            start = time.perf_counter()
+            await run_bounded(requests, args.concurrency)
+            wall["rest"] = time.perf_counter() - start
+
+    return recorder.summary(wall)
+
+
+def wait_until_up(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with contextlib.suppress(httpx.HTTPError):
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+@contextlib.contextmanager
+def local_stack(args):
+    """Start fake Cal.com, fake OpenAI and one chatbot_server worker; stop them on exit"""
+    calcom_port, llm_port, server_port = args.base_port + 1, args.base_port + 2, args.base_port
+    quiet = {"stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
+    procs = [
+        subprocess.Popen([sys.executable, str(HERE / "fake_calcom.py"), "--port", str(calcom_port),
+                          "--latency-ms", str(args.calcom_latency_ms), "--jitter-ms", str(args.calcom_jitter_ms),
+                          "--error-rate", str(args.calcom_error_rate),
+                          "--rate-limit-rate", str(args.calcom_rate_limit_rate),
+                          "--requests-per-minute", str(getattr(args, "calcom_requests_per_minute", 0)),
+                          "--seed", str(args.seed)], **quiet),
+        subprocess.Popen([sys.executable, str(HERE / "fake_llm.py"), "--port", str(llm_port),
+                          "--latency-ms", str(args.llm_latency_ms), "--token-ms", str(args.llm_token_ms)], **quiet),
+    ]
+    env = dict(
+        os.environ,
+        CALCOM_BASE_URL=f"http://127.0.0.1:{calcom_port}/v1",
+        CALCOM_API_KEY="fake",
+        OPENAI_BASE_URL=f"http://127.0.0.1:{llm_port}/v1",
+        OPENAI_API_KEY="fake",
+        CALCOM_RATE_LIMIT=str(getattr(args, "client_rate_limit", 0)),
+    )
+    try:
+        wait_until_up(f"http://127.0.0.1:{calcom_port}/_fake/stats")
+        wait_until_up(f"http://127.0.0.1:{llm_port}/_fake/stats")
+        procs.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "chatbot_server:app", "--port", str(server_port),
+             "--log-level", "warning"],
+            cwd=ROOT, env=env, **quiet
+        ))
+        wait_until_up(f"http://127.0.0.1:{server_port}/health")
+        yield f"http://127.0.0.1:{server_port}", f"http://127.0.0.1:{calcom_port}", f"http://127.0.0.1:{llm_port}"
+    finally:
+        for proc in reversed(procs):
+            proc.terminate()
+        for proc in procs:
+            with contextlib.suppress(subprocess.TimeoutExpired):
+                proc.wait(timeout=10)
+
+
+def print_report(report: dict):
+    for channel in ("ws", "rest"):
+        if channel not in report:
+            continue
+        r = report[channel]
+        lat, first = r["latency_ms"], r["first_frame_ms"]
+        print(f"\n📊 {channel.upper()}: {r['turns']} turns, {r['errors']} errors "
+              f"({r['error_rate']:.2%}), {r['throughput_per_sec']:.1f} turns/s")
+        print(f"   latency ms  p50 {lat[50]:.0f}  p90 {lat[90]:.0f}  p99 {lat[99]:.0f}  max {lat['max']:.0f}")
+        if channel == "ws":
+            print(f"   first frame ms  p50 {first[50]:.0f}  p99 {first[99]:.0f}")
+        for sample in r["error_samples"]:
+            print(f"   ❌ {sample}")
+    print("\n   per script (p50 / p99 ms):")
+    for name, s in report["scripts"].items():
+        print(f"   {name:<24} {s['turns']:>6}  {s['p50_ms']:>8.0f} / {s['p99_ms']:.0f}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Load test CalBot's /ws and /chat endpoints")
+    parser.add_argument("--target", help="URL of a running server (default: start a local stubbed stack)")
+    parser.add_argument("--sessions", type=int, default=200, help="WebSocket sessions to run")
+    parser.add_argument("--rest-requests", type=int, default=0, help="POST /chat requests to send")
+    parser.add_argument("--concurrency", type=int, default=50, help="sessions/requests in flight at once")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for a reply")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--base-port", type=int, default=8100, help="local stack ports: server, +1 Cal.com, +2 LLM")
+    parser.add_argument("--calcom-latency-ms", type=float, default=50.0)
+    parser.add_argument("--calcom-jitter-ms", type=float, default=10.0)
+    parser.add_argument("--calcom-error-rate", type=float, default=0.0)
+    parser.add_argument("--calcom-rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--calcom-requests-per-minute", type=int, default=0, help="fake Cal.com's rate limit (0: none)")
+    parser.add_argument("--client-rate-limit", type=float, default=0.0,
+                        help="server's CALCOM_RATE_LIMIT in requests/second (0: off)")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--llm-token-ms", type=float, default=5.0)
+    parser.add_argument("--json", dest="json_path", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    if args.target:
+        report = asyncio.run(run_load(args))
+    else:
+        with local_stack(args) as (server, calcom_url, llm_url):
+            args.target = server
+            report = asyncio.run(run_load(args))
+            report["upstream"] = {
+                "calcom": httpx.get(f"{calcom_url}/_fake/stats").json()["requests"],
+                "llm": httpx.get(f"{llm_url}/_fake/stats").json(),
+            }
+
+    print_report(report)
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(report, indent=2, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
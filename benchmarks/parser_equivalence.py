@@ -0,0 +1,143 @@
+"""Equivalence check for the date and time parsers.
+
+Runs parse_date_flexible and parse_time_flexible over the benchmark corpus
+plus edge inputs, with the clock frozen at TODAY, and compares every result
+against the frozen table in benchmarks/parser_equivalence.json: the parsed
+value, or the exception type and message. When recorded, the table matched
+the parsers as they were before they were precompiled and memoized, except
+for M/D dates ("7/31"), which those rejected. Edits to _DATE_FORMATS,
+_TIME_RE or the caches that change behavior show up here. Exits non-zero on
+any difference.
+
+Usage:
+    python benchmarks/parser_equivalence.py           # compare to the table
+    python benchmarks/parser_equivalence.py --update  # re-record after an intended change
+
+Review the table's diff before committing an update.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+from datetime import date, datetime
+from pathlib import Path
+from unittest import mock
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+# Importing cal builds the OpenAI client; no requests are made
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import cal  # noqa: E402
+from corpus import date_phrases, time_phrases  # noqa: E402
+
+TABLE_PATH = Path(__file__).resolve().parent / "parser_equivalence.json"
+TODAY = date(2025, 7, 15)  # a Tuesday
+
+EDGE_DATES = [
+    "", " ", "TOMORROW", "  today  ", "day after tomorrow", "in 3 days", "garbage", "the 5th",
+    "7/31", "7/28", "12/25", "7/14", "2/29", "0/0", "1/1/1", "7-31-2025",
+    "13/45/2025", "2/30/2025", "2/29/2028", "0/10/2025", "7/31/25", "7/31/49", "7/31/50",
+    "2025-13-01", "2025/7/31", "20250731", "19000101",
+    "july 31st, 2025", "31 july 2025", "sept 5", "dec 25th", "feb 30",
+    "next friday", "this monday", "last sunday", "friday", "this tuesday", "last tuesday",
+    "this friday or next monday", "next week monday", "tomorrow at 3pm",
+]
+
+EDGE_TIMES = [
+    "", "0", "7", "12", "13", "0am", "12am", "12pm", "13pm", "15:30pm", "24:00", "23:59",
+    "9:30", "9:5", "2:60pm", "noon", "midnight", "3 o'clock", "  3PM ", "at 3pm", "@ 2:30",
+]
+
+
+class _FrozenDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls(TODAY.year, TODAY.month, TODAY.day, 9, 0, tzinfo=tz)
+
+
+def _outcome(func, arg):
+    """The parser's result as JSON, or the exception it raised"""
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):  # the date parser prints debug lines
+            result = func(arg)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    if isinstance(result, tuple):
+        return [result[0].isoformat(), result[1]]
+    return result
+
+
+def snapshot() -> dict:
+    """Every input's outcome under the frozen clock"""
+    table = {"today": TODAY.isoformat()}
+    with mock.patch.object(cal, "datetime", _FrozenDatetime):
+        for func, inputs in ((cal.parse_date_flexible, date_phrases() + EDGE_DATES),
+                             (cal.parse_time_flexible, time_phrases() + EDGE_TIMES)):
+            table[func.__name__] = {arg: _outcome(func, arg) for arg in dict.fromkeys(inputs)}
+    return table
+
+
+def write_table(table: dict):
+    """One entry per line, so an update's diff shows exactly what changed"""
+    lines = ["{", f'  "today": {json.dumps(table["today"])},']
+    names = [name for name in table if name != "today"]
+    for n, name in enumerate(names):
+        entries = table[name]
+        lines.append(f"  {json.dumps(name)}: {{")
+        lines.extend(f"    {json.dumps(arg)}: {json.dumps(outcome)}{',' if i < len(entries) - 1 else ''}"
+                     for i, (arg, outcome) in enumerate(entries.items()))
+        lines.append("  }," if n < len(names) - 1 else "  }")
+    lines.append("}")
+    TABLE_PATH.write_text("\n".join(lines) + "\n")
+
+
+def compare(table: dict, expected: dict) -> list:
+    """Return mismatch messages, including inputs missing from either side"""
+    problems = []
+    for name, outcomes in table.items():
+        if name == "today":
+            continue
+        frozen = expected.get(name, {})
+        for arg, outcome in outcomes.items():
+            if arg not in frozen:
+                problems.append(f"{name}({arg!r}): not in the table")
+            elif frozen[arg] != outcome:
+                problems.append(f"{name}({arg!r}): {frozen[arg]} -> {outcome}")
+        problems.extend(f"{name}({arg!r}): in the table but no longer checked" for arg in frozen if arg not in outcomes)
+    return problems
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--update", action="store_true", help="re-record the frozen table")
+    parser.add_argument("--show", type=int, default=20, help="mismatches to print")
+    args = parser.parse_args(argv)
+
+    table = snapshot()
+    checked = sum(len(outcomes) for name, outcomes in table.items() if name != "today")
+    if args.update:
+        write_table(table)
+        print(f"📝 Recorded {checked} outcomes to {TABLE_PATH}")
+        return 0
+
+    expected = json.loads(TABLE_PATH.read_text())
+    if expected.get("today") != table["today"]:
+        print(f"❌ The table was recorded for {expected.get('today')}, not {table['today']}; re-record it")
+        return 1
+    problems = compare(table, expected)
+    if problems:
+        print(f"❌ {len(problems)} of {checked} outcomes differ from the frozen table:")
+        for problem in problems[:args.show]:
+            print(f"  - {problem}")
+        return 1
+    print(f"✅ {checked} parser outcomes match the frozen table")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
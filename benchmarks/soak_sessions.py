@@ -0,0 +1,167 @@
+"""Soak test for WebSocket session cleanup: many short connections, flat memory.
+
+Opens and closes --cycles WebSocket connections against /ws and reads the
+server's calbot_process_resident_memory_bytes and calbot_sessions from
+/metrics as it goes. The connections are a mix of:
+
+- clean: connect, read the greeting, close
+- chat: send one message and read the reply, then close
+- abort: drop the TCP connection without a close handshake
+- vanish: send a message and drop the connection before the reply, so the
+  server's send fails mid-turn
+
+With sessions cleaned up on every path, RSS levels off after warm-up.
+Sessions without history are dropped as their connection ends; the ones
+that chatted stay resumable until they go idle. The local stack therefore runs with a
+short SESSION_IDLE_TTL (--session-ttl), and calbot_sessions should be back to 0
+once that has passed. The exit status is non-zero when RSS grows more than
+--max-growth-mb after warm-up, or when sessions are left behind.
+
+Usage:
+    python benchmarks/soak_sessions.py --cycles 100000 --concurrency 200
+    python benchmarks/soak_sessions.py --target http://127.0.0.1:8000 --cycles 5000
+
+Starts the same local stack as load_chat.py unless --target is given.
+Needs `pip install websockets httpx`.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import websockets
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from load_chat import local_stack  # noqa: E402
+
+# Share of cycles per kind, out of 20
+MIX = ["clean"] * 12 + ["chat"] * 3 + ["abort"] * 3 + ["vanish"] * 2
+MESSAGES = ["Show me my scheduled events", "What meeting types are available?", "hello"]
+
+
+def scrape(base_url: str) -> dict:
+    text = httpx.get(f"{base_url}/metrics", timeout=10).text
+    values = {}
+    for name in ("calbot_process_resident_memory_bytes", "calbot_sessions", "calbot_websocket_connections"):
+        match = re.search(rf'^{name} (\S+)$', text, re.MULTILINE)
+        values[name] = float(match.group(1)) if match else None
+    return values
+
+
+async def until_reply(ws, timeout: float):
+    """Read frames up to the next message/error frame"""
+    while json.loads(await asyncio.wait_for(ws.recv(), timeout)).get("type") not in ("message", "error"):
+        pass
+
+
+async def one_cycle(url: str, kind: str, message: str, timeout: float):
+    async with websockets.connect(url, open_timeout=timeout, close_timeout=1) as ws:
+        await until_reply(ws, timeout)  # session frame, then the greeting
+        if kind == "abort":
+            ws.transport.abort()
+        elif kind == "vanish":
+            await ws.send(message)
+            ws.transport.abort()
+        elif kind == "chat":
+            await ws.send(message)
+            await until_reply(ws, timeout)
+
+
+async def run_soak(args, base_url: str) -> dict:
+    ws_url = base_url.replace("http", "ws", 1) + "/ws"
+    counter = iter(range(args.cycles))
+    errors = {}
+    samples = []
+    started = time.perf_counter()
+
+    async def worker():
+        for i in counter:
+            kind = MIX[i % len(MIX)]
+            try:
+                await one_cycle(ws_url, kind, MESSAGES[i % len(MESSAGES)], args.timeout)
+            except (OSError, asyncio.TimeoutError, websockets.WebSocketException) as e:
+                key = f"{kind}: {type(e).__name__}"
+                errors[key] = errors.get(key, 0) + 1
+            if (i + 1) % args.sample_every == 0:
+                sample = await asyncio.get_running_loop().run_in_executor(None, scrape, base_url)
+                sample.update(cycles=i + 1, seconds=round(time.perf_counter() - started, 1))
+                samples.append(sample)
+                rss = sample["calbot_process_resident_memory_bytes"] / 2 ** 20
+                print(f"   {i + 1:>7} cycles  {sample['seconds']:>6.1f}s  RSS {rss:7.1f} MB  "
+                      f"sessions {sample['calbot_sessions']:.0f}  connections {sample['calbot_websocket_connections']:.0f}")
+
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    await asyncio.sleep(args.settle)  # let the last connections close and idle sessions expire
+    final = await asyncio.get_running_loop().run_in_executor(None, scrape, base_url)
+    return {"samples": samples, "final": final, "errors": errors,
+            "seconds": round(time.perf_counter() - started, 1)}
+
+
+def verdict(report: dict, args) -> int:
+    samples = sorted(report["samples"], key=lambda s: s["cycles"])
+    warm = [s for s in samples if s["cycles"] >= args.cycles * args.warmup]
+    status = 0
+    if len(warm) >= 2:
+        growth = (warm[-1]["calbot_process_resident_memory_bytes"]
+                  - warm[0]["calbot_process_resident_memory_bytes"]) / 2 ** 20
+        report["rss_growth_after_warmup_mb"] = round(growth, 1)
+        print(f"\n📈 RSS after warm-up: {growth:+.1f} MB over {warm[-1]['cycles'] - warm[0]['cycles']} cycles")
+        if growth > args.max_growth_mb:
+            print(f"❌ RSS grew more than {args.max_growth_mb} MB")
+            status = 1
+    leftover = report["final"]["calbot_sessions"]
+    print(f"🧹 Sessions left after all connections closed: {leftover:.0f}")
+    if leftover:
+        status = 1
+    if report["errors"]:
+        print(f"⚠️ Client errors: {report['errors']}")
+    print(f"⏱️ {args.cycles} cycles in {report['seconds']}s")
+    return status
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Check that /ws sessions don't leak memory")
+    parser.add_argument("--target", help="URL of a running server (default: start a local stubbed stack)")
+    parser.add_argument("--cycles", type=int, default=100000, help="connections to open and close")
+    parser.add_argument("--concurrency", type=int, default=200, help="connections in flight at once")
+    parser.add_argument("--sample-every", type=int, default=10000, help="cycles between /metrics samples")
+    parser.add_argument("--warmup", type=float, default=0.2, help="share of cycles before RSS should level off")
+    parser.add_argument("--max-growth-mb", type=float, default=20.0, help="allowed RSS growth after warm-up")
+    parser.add_argument("--session-ttl", type=float, default=5.0, help="SESSION_IDLE_TTL for the local stack")
+    parser.add_argument("--settle", type=float, help="seconds to wait before the final count "
+                        "(default: session TTL plus one sweep for the local stack, 1s with --target)")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--base-port", type=int, default=8100, help="local stack ports: server, +1 Cal.com, +2 LLM")
+    parser.add_argument("--json", dest="json_path", help="also write the report to this file")
+    args = parser.parse_args(argv)
+    # local_stack's fakes, without artificial latency
+    args.calcom_latency_ms = args.calcom_jitter_ms = args.llm_latency_ms = args.llm_token_ms = 0.0
+    args.calcom_error_rate = args.calcom_rate_limit_rate = 0.0
+
+    print(f"🔁 {args.cycles} connect/disconnect cycles, {args.concurrency} at a time")
+    if args.target:
+        args.settle = 1.0 if args.settle is None else args.settle
+        report = asyncio.run(run_soak(args, args.target))
+    else:
+        sweep_interval = 1.0
+        os.environ.update(SESSION_IDLE_TTL=str(args.session_ttl), SESSION_SWEEP_INTERVAL=str(sweep_interval))
+        if args.settle is None:
+            args.settle = args.session_ttl + sweep_interval + 1
+        with local_stack(args) as (server, _calcom_url, _llm_url):
+            report = asyncio.run(run_soak(args, server))
+
+    status = verdict(report, args)
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(report, indent=2))
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,117 +13,269 @@ from langgraph.graph import StateGraph, END
 from langgraph.prebuilt import ToolNode
 import json
 import pytz
+import re
+import asyncio
+import functools
+import threading
+import time
+import bisect
+import contextvars
+import random
+import copy
+import heapq
+import itertools
+from email.utils import parsedate_to_datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+import history
+import tracing
+from metrics import (
+    TOOL_DURATION,
+    CALCOM_REQUEST_DURATION,
+    LLM_REQUEST_DURATION,
+    LLM_PROMPT_TOKENS,
+    SLOT_CACHE_REQUESTS,
+    CALCOM_QUEUE_DEPTH,
+    CALCOM_QUEUE_WAIT,
+    CALCOM_THROTTLED,
+    CALCOM_COALESCED,
+)
 
 load_dotenv()
 
 # Cal.com API configuration
 CALCOM_API_KEY = os.getenv('CALCOM_API_KEY')
-CALCOM_BASE_URL = "https://api.cal.com/v1"
+CALCOM_BASE_URL = os.getenv('CALCOM_BASE_URL', 'https://api.cal.com/v1')
 USER_EMAIL = os.getenv('USER_EMAIL', 'your-email@example.com')
 USER_TIMEZONE = os.getenv('USER_TIMEZONE', 'America/Los_Angeles')  # Add this to .env
+CALCOM_POOL_SIZE = int(os.getenv('CALCOM_POOL_SIZE', '10'))
+
+# Per-endpoint (connect, read) timeouts in seconds, matched by path prefix.
+# Slot searches and booking writes are slower upstream than catalog reads.
+CALCOM_TIMEOUTS = {
+    "/event-types": (3.05, 5),
+    "/slots": (3.05, 10),
+    "/bookings": (3.05, 15),
+}
+CALCOM_DEFAULT_TIMEOUT = (3.05, 10)
+
+# Client-side rate limit for Cal.com, shared by every request in the process:
+# requests per second (0, the default, turns it off; Cal.com allows 120 a minute
+# per API key, shared by all workers) and the burst allowed after a quiet spell.
+# A request waits at most CALCOM_RATE_LIMIT_MAX_WAIT seconds for its turn, and a
+# 429 is retried up to CALCOM_RATE_LIMIT_RETRIES times after its Retry-After.
+CALCOM_RATE_LIMIT = float(os.getenv('CALCOM_RATE_LIMIT', '0'))
+CALCOM_RATE_BURST = int(os.getenv('CALCOM_RATE_BURST', '10'))
+CALCOM_RATE_LIMIT_MAX_WAIT = float(os.getenv('CALCOM_RATE_LIMIT_MAX_WAIT', '10'))
+CALCOM_RATE_LIMIT_RETRIES = int(os.getenv('CALCOM_RATE_LIMIT_RETRIES', '2'))
+
+# Identical GETs already in flight share one upstream request
+CALCOM_SINGLE_FLIGHT = os.getenv('CALCOM_SINGLE_FLIGHT', '1').lower() in ('1', 'true', 'yes')
+
+# Slot cache: how long a day's /slots response is reused, and how many days are kept
+SLOT_CACHE_TTL = float(os.getenv('SLOT_CACHE_TTL', '60'))
+SLOT_CACHE_SIZE = int(os.getenv('SLOT_CACHE_SIZE', '256'))
+
+# Alternatives offered when a requested time is taken: how many times in total
+# (closest first), how far from the request the others may be (minutes), and
+# which side to prefer ("nearest", "earlier" or "later")
+SLOT_SUGGESTION_COUNT = int(os.getenv('SLOT_SUGGESTION_COUNT', '3'))
+SLOT_SUGGESTION_MAX_DISTANCE = int(os.getenv('SLOT_SUGGESTION_MAX_DISTANCE', '120'))
+SLOT_SUGGESTION_BIAS = os.getenv('SLOT_SUGGESTION_BIAS', 'nearest')
+
+# Tool calls from one model response run concurrently, up to this many at once,
+# each given at most TOOL_CALL_TIMEOUT seconds (web server)
+TOOL_CALL_CONCURRENCY = int(os.getenv('TOOL_CALL_CONCURRENCY', '4'))
+TOOL_CALL_TIMEOUT = float(os.getenv('TOOL_CALL_TIMEOUT', '30'))
+
+# Seconds before the event-type catalog is refreshed in the background
+EVENT_TYPE_REFRESH_INTERVAL = float(os.getenv('EVENT_TYPE_REFRESH_INTERVAL', '300'))
+
+# Local booking mirror: seconds before a synced day is re-read from Cal.com,
+# and an optional SQLite file that keeps the mirror across restarts
+BOOKING_SYNC_INTERVAL = float(os.getenv('BOOKING_SYNC_INTERVAL', '30'))
+BOOKING_STORE_PATH = os.getenv('BOOKING_STORE_PATH')
+
+# Bulk cancellation: DELETEs in flight at once, and retries per booking after
+# network errors, 429s and 5xx (exponential backoff starting at BULK_CANCEL_BACKOFF seconds)
+BULK_CANCEL_CONCURRENCY = int(os.getenv('BULK_CANCEL_CONCURRENCY', '5'))
+BULK_CANCEL_RETRIES = int(os.getenv('BULK_CANCEL_RETRIES', '2'))
+BULK_CANCEL_BACKOFF = float(os.getenv('BULK_CANCEL_BACKOFF', '0.5'))
+
+# Log cached vs. uncached prompt tokens for every turn (prompt-caching check)
+PROMPT_CACHE_STATS = os.getenv('PROMPT_CACHE_STATS', '').lower() in ('1', 'true', 'yes')
+
+# Local working hours; free times are only suggested inside them
+WORKDAY_START_HOUR = int(os.getenv('WORKDAY_START_HOUR', '9'))
+WORKDAY_END_HOUR = int(os.getenv('WORKDAY_END_HOUR', '17'))
 
 # 1. Add helper function to manage date and time parsing:
+
+# Date/time grammar, compiled once at import. Parsing runs several times per
+# booking turn (check, book, cancel, reschedule), so nothing here is rebuilt
+# per call.
+_TIME_RE = re.compile(r'(\d{1,2})(?::(\d{2}))?(?:\s*(am|pm))?')
+
+_WEEKDAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+_WEEKDAY_INDEX = {day: i for i, day in enumerate(_WEEKDAYS)}
+_RELATIVE_KINDS = ('this', 'next', 'last')
+_RELATIVE_WEEKDAY_RE = re.compile(r'(this|next|last) (' + '|'.join(_WEEKDAYS) + r')')
+
+_MONTHS = {
+    'january': 1, 'jan': 1, 'february': 2, 'feb': 2, 'march': 3, 'mar': 3,
+    'april': 4, 'apr': 4, 'may': 5, 'june': 6, 'jun': 6,
+    'july': 7, 'jul': 7, 'august': 8, 'aug': 8, 'september': 9, 'sep': 9,
+    'october': 10, 'oct': 10, 'november': 11, 'nov': 11, 'december': 12, 'dec': 12
+}
+_MONTH_NAMES = r'(january|february|march|april|may|june|july|august|september|october|november|december|jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)'
+
+
+def _parse_mdy(m, today):
+    """Helper to parse MM/DD/YYYY format"""
+    month, day, year = int(m[0]), int(m[1]), int(m[2])
+    
+    # Handle 2-digit years
+    if year < 100:
+        year += 2000 if year < 50 else 1900
+    
+    # Validate month and day ranges
+    if month < 1 or month > 12:
+        raise ValueError(f"Invalid month: {month}")
+    if day < 1 or day > 31:
+        raise ValueError(f"Invalid day: {day}")
+        
+    try:
+        return datetime(year, month, day).date()
+    except ValueError as e:
+        raise ValueError(f"Invalid date: {month}/{day}/{year} - {str(e)}")
+
+
+def _parse_md(m, today):
+    """Helper to parse MM/DD without a year: the next occurrence, today included"""
+    month, day = int(m[0]), int(m[1])
+    if month < 1 or month > 12:
+        raise ValueError(f"Invalid month: {month}")
+    date_obj = datetime(today.year, month, day).date()
+    if date_obj < today:
+        date_obj = datetime(today.year + 1, month, day).date()
+    return date_obj
+
+
+def _parse_month_day_year(month_str, day, year):
+    """Helper to parse month name formats"""
+    month_num = _MONTHS.get(month_str.lower())
+    if month_num:
+        return datetime(int(year), month_num, int(day)).date()
+    raise ValueError(f"Unknown month: {month_str}")
+
+
+# Explicit date formats, tried in priority order; the first that parses to a
+# plausible date wins
+_DATE_FORMATS = (
+    # MM/DD/YYYY, M/D/YYYY, MM/DD/YY, M/D/YY
+    (re.compile(r'(\d{1,2})/(\d{1,2})/(\d{2,4})'), _parse_mdy),
+    # YYYY-MM-DD, YYYY/MM/DD
+    (re.compile(r'(\d{4})[-/](\d{1,2})[-/](\d{1,2})'),
+     lambda m, today: datetime(int(m[0]), int(m[1]), int(m[2])).date()),
+    # MM/DD, M/D (next occurrence)
+    (re.compile(r'(?<![\d/])(\d{1,2})/(\d{1,2})(?![\d/])'), _parse_md),
+    # Month DD, YYYY or Month DD (assume current year)
+    (re.compile(_MONTH_NAMES + r'\.?\s+(\d{1,2})(?:st|nd|rd|th)?,?\s*(\d{4})?'),
+     lambda m, today: _parse_month_day_year(m[0], m[1], m[2] if m[2] else str(today.year))),
+    # DD Month, YYYY or DD Month (assume current year)
+    (re.compile(r'(\d{1,2})(?:st|nd|rd|th)?\s+' + _MONTH_NAMES + r'\.?,?\s*(\d{4})?'),
+     lambda m, today: _parse_month_day_year(m[1], m[0], m[2] if m[2] else str(today.year))),
+    # ISO format variations
+    (re.compile(r'(\d{4})(\d{2})(\d{2})'),
+     lambda m, today: datetime(int(m[0]), int(m[1]), int(m[2])).date()),
+)
+
+# Union of the explicit formats: one scan rules them all out for phrases
+# like "this friday" or "next week"
+_ANY_DATE_FORMAT_RE = re.compile('|'.join(f'(?:{pattern.pattern})' for pattern, _ in _DATE_FORMATS))
+
+PARSE_CACHE_SIZE = 1024
+
+
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
 def parse_time_flexible(time_str: str) -> str:
     """Parse various time formats into standard format"""
-    import re
-    
     time_str = time_str.strip().lower()
     
     # Handle formats like "2pm", "2 pm", "2:30pm", "2:30 pm", "14:00", "2"
-    patterns = [
-        r'(\d{1,2}):(\d{2})\s*(am|pm)',  # "2:30 pm"
-        r'(\d{1,2})\s*(am|pm)',          # "2 pm" or "2pm"
-        r'(\d{1,2}):(\d{2})',            # "14:30"
-        r'(\d{1,2})'                     # "14" or "2"
-    ]
+    match = _TIME_RE.match(time_str)
+    if not match:
+        # If no pattern matches, return original
+        return time_str
     
-    for pattern in patterns:
-        match = re.match(pattern, time_str)
-        if match:
-            groups = match.groups()
-            
-            if len(groups) == 3:  # Hour:Minute AM/PM
-                hour, minute, period = groups
-                return f"{hour}:{minute} {period.upper()}"
-            elif len(groups) == 2:  # Hour AM/PM or Hour:Minute
-                if groups[1] in ['am', 'pm']:  # Hour AM/PM
-                    hour, period = groups
-                    return f"{hour}:00 {period.upper()}"
-                else:  # Hour:Minute (24-hour)
-                    hour, minute = groups
-                    hour_int = int(hour)
-                    if hour_int > 12:
-                        return f"{hour}:{minute}"
-                    else:
-                        # Convert to 12-hour format
-                        if hour_int == 0:
-                            return f"12:{minute} AM"
-                        elif hour_int == 12:
-                            return f"12:{minute} PM"
-                        elif hour_int > 12:
-                            return f"{hour_int - 12}:{minute} PM"
-                        else:
-                            return f"{hour}:{minute} AM"
-            elif len(groups) == 1:  # Just hour
-                hour = int(groups[0])
-                if hour > 12:
-                    # 24-hour format
-                    if hour == 0:
-                        return "12:00 AM"
-                    elif hour > 12:
-                        return f"{hour - 12}:00 PM"
-                    else:
-                        return f"{hour}:00 AM"
-                else:
-                    # Assume business hours: 1-11 are PM unless clearly morning context
-                    if hour >= 7 and hour <= 11:
-                        return f"{hour}:00 AM"
-                    else:
-                        return f"{hour}:00 PM"
+    hour, minute, period = match.groups()
     
-    # If no pattern matches, return original
-    return time_str
-
-def parse_date_flexible(date_str: str) -> tuple:
-    """Parse various date formats and return (date_obj, date_for_api_string)"""
-    import re
-    from datetime import datetime, timedelta
+    if period:
+        # Hour:Minute AM/PM or Hour AM/PM
+        return f"{hour}:{minute or '00'} {period.upper()}"
     
-    date_str = date_str.strip().lower()
-    today = datetime.now().date()
+    if minute is not None:
+        # Hour:Minute (24-hour)
+        hour_int = int(hour)
+        if hour_int > 12:
+            return f"{hour}:{minute}"
+        # Convert to 12-hour format
+        if hour_int == 0:
+            return f"12:{minute} AM"
+        elif hour_int == 12:
+            return f"12:{minute} PM"
+        return f"{hour}:{minute} AM"
     
+    # Just hour
+    hour = int(hour)
+    if hour > 12:
+        # 24-hour format
+        return f"{hour - 12}:00 PM"
+    # Assume business hours: 7-11 are AM, everything else PM
+    if 7 <= hour <= 11:
+        return f"{hour}:00 AM"
+    return f"{hour}:00 PM"
+
+
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_date_on(date_str: str, today) -> tuple:
+    """Parse a normalized date phrase relative to ``today``.
+
+    ``today`` is part of the memo key, so cached answers roll over at midnight.
+    """
     # Handle relative dates
-    if date_str in ["today"]:
+    if date_str == "today":
         return today, "today"
-    elif date_str in ["tomorrow"]:
-        date_obj = today + timedelta(days=1)
-        return date_obj, "tomorrow"
+    elif date_str == "tomorrow":
+        return today + timedelta(days=1), "tomorrow"
     elif "day after tomorrow" in date_str:
         date_obj = today + timedelta(days=2)
         return date_obj, date_obj.strftime("%Y-%m-%d")
-    elif date_str in ["yesterday"]:
+    elif date_str == "yesterday":
         date_obj = today - timedelta(days=1)
         return date_obj, date_obj.strftime("%Y-%m-%d")
     
-    # Handle weekday references
-    weekdays = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
-    for i, day in enumerate(weekdays):
-        if f"this {day}" in date_str:
+    # Handle weekday references; the earliest weekday wins, then this/next/last
+    relative = [
+        (_WEEKDAY_INDEX[day], _RELATIVE_KINDS.index(kind), kind)
+        for kind, day in _RELATIVE_WEEKDAY_RE.findall(date_str)
+    ]
+    if relative:
+        i, _, kind = min(relative)
+        if kind == "this":
             days_ahead = i - today.weekday()
             if days_ahead <= 0:  # Target day already happened this week
                 days_ahead += 7
             date_obj = today + timedelta(days=days_ahead)
-            return date_obj, date_obj.strftime("%Y-%m-%d")
-        elif f"next {day}" in date_str:
-            days_ahead = i - today.weekday() + 7
-            date_obj = today + timedelta(days=days_ahead)
-            return date_obj, date_obj.strftime("%Y-%m-%d")
-        elif f"last {day}" in date_str:
+        elif kind == "next":
+            date_obj = today + timedelta(days=i - today.weekday() + 7)
+        else:
             days_back = today.weekday() - i
             if days_back <= 0:
                 days_back += 7
             date_obj = today - timedelta(days=days_back)
-            return date_obj, date_obj.strftime("%Y-%m-%d")
+        return date_obj, date_obj.strftime("%Y-%m-%d")
     
     # Handle "next week", "this week"
     if "next week" in date_str:
@@ -132,70 +284,20 @@ def parse_date_flexible(date_str: str) -> tuple:
     elif "this week" in date_str:
         return today, "this week"
     
-    # Handle various date formats with multiple patterns
-    patterns = [
-        # MM/DD/YYYY, M/D/YYYY, MM/DD/YY, M/D/YY - FIXED ORDER
-        (r'(\d{1,2})/(\d{1,2})/(\d{2,4})', lambda m: parse_mdy(m[0], m[1], m[2])),
-        # YYYY-MM-DD, YYYY/MM/DD
-        (r'(\d{4})[-/](\d{1,2})[-/](\d{1,2})', lambda m: datetime.strptime(f"{m[0]}-{m[1]:0>2}-{m[2]:0>2}", "%Y-%m-%d").date()),
-        # Month DD, YYYY or Month DD (assume current year)
-        (r'(january|february|march|april|may|june|july|august|september|october|november|december|jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)\.?\s+(\d{1,2})(?:st|nd|rd|th)?,?\s*(\d{4})?', 
-         lambda m: parse_month_day_year(m[0], m[1], m[2] if m[2] else str(today.year))),
-        # DD Month, YYYY or DD Month (assume current year)
-        (r'(\d{1,2})(?:st|nd|rd|th)?\s+(january|february|march|april|may|june|july|august|september|october|november|december|jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)\.?,?\s*(\d{4})?',
-         lambda m: parse_month_day_year(m[1], m[0], m[2] if m[2] else str(today.year))),
-        # ISO format variations
-        (r'(\d{4})(\d{2})(\d{2})', lambda m: datetime.strptime(f"{m[0]}-{m[1]}-{m[2]}", "%Y-%m-%d").date()),
-    ]
-    
-    def parse_mdy(month, day, year):
-        """Helper to parse MM/DD/YYYY format"""
-        month = int(month)
-        day = int(day)
-        year = int(year)
-        
-        # Handle 2-digit years
-        if year < 100:
-            year += 2000 if year < 50 else 1900
-        
-        # Validate month and day ranges
-        if month < 1 or month > 12:
-            raise ValueError(f"Invalid month: {month}")
-        if day < 1 or day > 31:
-            raise ValueError(f"Invalid day: {day}")
-            
-        try:
-            return datetime(year, month, day).date()
-        except ValueError as e:
-            raise ValueError(f"Invalid date: {month}/{day}/{year} - {str(e)}")
-    
-    def parse_month_day_year(month_str, day, year):
-        """Helper to parse month name formats"""
-        month_dict = {
-            'january': 1, 'jan': 1, 'february': 2, 'feb': 2, 'march': 3, 'mar': 3,
-            'april': 4, 'apr': 4, 'may': 5, 'june': 6, 'jun': 6,
-            'july': 7, 'jul': 7, 'august': 8, 'aug': 8, 'september': 9, 'sep': 9,
-            'october': 10, 'oct': 10, 'november': 11, 'nov': 11, 'december': 12, 'dec': 12
-        }
-        month_num = month_dict.get(month_str.lower())
-        if month_num:
-            return datetime(int(year), month_num, int(day)).date()
-        raise ValueError(f"Unknown month: {month_str}")
-    
-    # Try each pattern
-    for pattern, converter in patterns:
-        match = re.search(pattern, date_str, re.IGNORECASE)
-        if match:
-            try:
-                date_obj = converter(match.groups())
-                # Validate date is reasonable (not too far in past/future)
-                days_diff = abs((date_obj - today).days)
-                if days_diff > 365 * 5:  # More than 5 years difference
-                    continue  # Try next pattern
-                return date_obj, date_obj.strftime("%Y-%m-%d")
-            except (ValueError, TypeError) as e:
-                print(f"Date parsing error for pattern {pattern}: {e}")  # Debug info
-                continue
+    # Try each explicit format in priority order
+    if _ANY_DATE_FORMAT_RE.search(date_str):
+        for pattern, converter in _DATE_FORMATS:
+            match = pattern.search(date_str)
+            if match:
+                try:
+                    date_obj = converter(match.groups(), today)
+                    # Validate date is reasonable (not too far in past/future)
+                    if abs((date_obj - today).days) > 365 * 5:  # More than 5 years difference
+                        continue  # Try next pattern
+                    return date_obj, date_obj.strftime("%Y-%m-%d")
+                except (ValueError, TypeError) as e:
+                    print(f"Date parsing error for pattern {pattern.pattern}: {e}")  # Debug info
+                    continue
     
     # Final attempt: try direct parsing as YYYY-MM-DD
     try:
@@ -208,46 +310,999 @@ def parse_date_flexible(date_str: str) -> tuple:
     raise ValueError(f"Could not parse date '{date_str}'. Try formats like 'tomorrow', '7/31/2025', 'July 28th', 'this Thursday', or 'YYYY-MM-DD'")
 
 
+def parse_date_flexible(date_str: str) -> tuple:
+    """Parse various date formats and return (date_obj, date_for_api_string)"""
+    return _parse_date_on(date_str.strip().lower(), datetime.now().date())
+
+
+# Multi-day phrases: "next 3 weekdays", "this weekend", "monday to friday", ...
+_NUMBER_WORDS = {'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7,
+                 'eight': 8, 'nine': 9, 'ten': 10, 'fourteen': 14}
+_RANGE_COUNT_RE = re.compile(
+    r'next (\d+|' + '|'.join(_NUMBER_WORDS) + r') (weekdays?|business days?|working days?|days?)'
+)
+_RANGE_SPLIT_RE = re.compile(r'\s+(?:to|through|thru|until|till|and|-|–)\s+')
+_WEEKDAYS_ONLY_RE = re.compile(r'\b(?:weekdays?|business days?|working days?)\b')
+AVAILABILITY_RANGE_MAX_DAYS = int(os.getenv('AVAILABILITY_RANGE_MAX_DAYS', '14'))
+
+
+def _range_endpoint(text: str, today, not_before):
+    """One end of a range; a bare weekday ("friday") is its next occurrence on or after ``not_before``"""
+    if text in _WEEKDAY_INDEX:
+        return not_before + timedelta(days=(_WEEKDAY_INDEX[text] - not_before.weekday()) % 7)
+    return _parse_date_on(text, today)[0]
+
+
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_date_range_on(text: str, today) -> tuple:
+    """Parse a normalized multi-day phrase relative to ``today`` into a tuple of dates"""
+    weekdays_only = bool(_WEEKDAYS_ONLY_RE.search(text))
+    match = _RANGE_COUNT_RE.search(text)
+    if match:
+        count = int(match.group(1)) if match.group(1).isdigit() else _NUMBER_WORDS[match.group(1)]
+        days, day = [], today
+        while len(days) < min(count, AVAILABILITY_RANGE_MAX_DAYS):
+            if not weekdays_only or day.weekday() < 5:
+                days.append(day)
+            day += timedelta(days=1)
+        return tuple(days)
+
+    if "weekend" in text:
+        if "next weekend" in text:
+            # On a Sunday the following Saturday is six days out, not thirteen
+            saturday = today + timedelta(days=(5 - today.weekday()) % 7 or 7)
+            if today.weekday() < 5:
+                saturday += timedelta(days=7)
+        elif today.weekday() == 6:
+            return (today,)
+        else:
+            saturday = today + timedelta(days=5 - today.weekday())
+        start, end = saturday, saturday + timedelta(days=1)
+    elif "next week" in text:
+        start = today + timedelta(days=7 - today.weekday())
+        end = start + timedelta(days=6)
+    elif "this week" in text or "rest of the week" in text:
+        start, end = today, today + timedelta(days=6 - today.weekday())
+    else:
+        text = re.sub(r'^(?:from|between)\s+', '', text)
+        parts = _RANGE_SPLIT_RE.split(text, maxsplit=1)
+        start = _range_endpoint(parts[0].strip(), today, today)
+        end = _range_endpoint(parts[1].strip(), today, start) if len(parts) == 2 else start
+        if end < start:
+            raise ValueError(f"The range '{text}' ends before it starts")
+
+    days = []
+    day = start
+    while day <= end and len(days) < AVAILABILITY_RANGE_MAX_DAYS:
+        if not weekdays_only or day.weekday() < 5:
+            days.append(day)
+        day += timedelta(days=1)
+    return tuple(days)
+
+
+def parse_date_range(text: str, end_text: str = None) -> tuple:
+    """Parse a date range ("this week", "next 3 weekdays", "7/28 to 8/1", or a start
+    and an end phrase) into a tuple of dates, at most AVAILABILITY_RANGE_MAX_DAYS long"""
+    if end_text:
+        text = f"{text.strip()} to {end_text.strip()}"
+    return _parse_date_range_on(text.strip().lower(), datetime.now().date())
+
+
 
 
 class AgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], add_messages]
 
-def make_calcom_request(endpoint: str, method: str = "GET", data: dict = None):
-    """Helper function to make requests to Cal.com API"""
-    if not CALCOM_API_KEY:
-        return {"error": "Cal.com API key not configured"}
-    
-    headers = {
-        "Content-Type": "application/json",
-        "Accept": "application/json"
-    }
-    
-    params = {"apiKey": CALCOM_API_KEY}
-    url = f"{CALCOM_BASE_URL}{endpoint}"
-    
+def endpoint_template(endpoint: str) -> str:
+    """Collapse IDs in an endpoint path for metric labels ("/bookings/123" -> "/bookings/{id}")"""
+    return re.sub(r'/\d+(?=/|$)', '/{id}', endpoint.split("?", 1)[0])
+
+
+def retry_after_seconds(response, default: float) -> float:
+    """Seconds to wait from a 429's Retry-After header (seconds or an HTTP date)"""
+    value = response.headers.get("Retry-After", "").strip()
+    if not value:
+        return default
     try:
-        if method == "GET":
-            response = requests.get(url, headers=headers, params=params, timeout=10)
-        elif method == "POST":
-            response = requests.post(url, headers=headers, params=params, json=data, timeout=10)
-        elif method == "DELETE":
-            response = requests.delete(url, headers=headers, params=params, json=data, timeout=10)
-        elif method == "PATCH":
-            response = requests.patch(url, headers=headers, params=params, json=data, timeout=10)
-            
-        if response.status_code not in [200, 204]:
-            error_text = response.text[:500]
-            print(f"❌ API Error: {method} {response.url} - Status: {response.status_code}")
-            return {"error": f"API request failed with status {response.status_code}: {error_text}"}
-            
-        if response.content:
-            return response.json()
-        return {"success": True, "status_code": response.status_code}
-            
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Request failed: {str(e)}")
-        return {"error": f"Request failed: {str(e)}"}
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class RateLimiter:
+    """Token bucket shared by every Cal.com request in the process.
+
+    Waiting requests are served in priority lanes: any waiting write
+    (booking, cancellation, reschedule) goes ahead of every waiting read,
+    then first come, first served. A 429 pauses the whole bucket for its
+    Retry-After, so other requests back off too instead of hitting the
+    limit again.
+    """
+    LANES = ("write", "read")
+
+    def __init__(self, rate: float = CALCOM_RATE_LIMIT, burst: int = CALCOM_RATE_BURST,
+                 max_wait: float = CALCOM_RATE_LIMIT_MAX_WAIT):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_wait = max_wait
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiting = []  # heap of (lane priority, arrival)
+        self._arrivals = itertools.count()
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, lane: str = "read") -> Optional[float]:
+        """Wait for a token; returns the seconds waited, or None after max_wait"""
+        if self.rate <= 0:
+            return 0.0
+        ticket = (self.LANES.index(lane), next(self._arrivals))
+        start = time.monotonic()
+        deadline = start + self.max_wait
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            CALCOM_QUEUE_DEPTH.inc(lane=lane)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    first = self._waiting[0] == ticket
+                    if first and now >= self._paused_until and self._tokens >= 1:
+                        self._tokens -= 1
+                        CALCOM_QUEUE_WAIT.observe(now - start, lane=lane)
+                        return now - start
+                    if now >= deadline:
+                        CALCOM_QUEUE_WAIT.observe(now - start, lane=lane)
+                        CALCOM_THROTTLED.inc(lane=lane, outcome="queue_timeout")
+                        return None
+                    # The first in line sleeps until its token is due; the rest until woken
+                    delay = max(self._paused_until - now, (1 - self._tokens) / self.rate) if first else deadline - now
+                    self._cond.wait(min(delay, deadline - now))
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                CALCOM_QUEUE_DEPTH.dec(lane=lane)
+                self._cond.notify_all()
+
+    def pause(self, seconds: float):
+        """Hold every request for ``seconds`` (after a 429) and empty the bucket"""
+        with self._cond:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._tokens = 0.0
+            self._updated = now
+
+    def depth(self) -> int:
+        with self._cond:
+            return len(self._waiting)
+
+
+class SingleFlight:
+    """Runs one call per key at a time. Callers that ask for a key while its
+    call is in flight wait for it and get a copy of its result instead of
+    making the call again.
+    """
+
+    class _Call:
+        __slots__ = ("done", "result", "shared", "error", "waiters")
+
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = self.shared = self.error = None
+            self.waiters = 0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.coalesced = 0
+
+    def do(self, key, fn) -> tuple:
+        """``(result, shared)``: ``fn()``'s result, and whether another caller's call produced it"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.shared), True
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            # No one can join once the call is removed; copy once for the waiters,
+            # so the leader's caller may change its result freely
+            if call.waiters and call.error is None:
+                call.shared = copy.deepcopy(call.result)
+            call.done.set()
+
+    def forget(self):
+        """Let later callers start new calls rather than join the ones in flight"""
+        with self._lock:
+            self._calls.clear()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+class CalComClient:
+    """Cal.com API client backed by a shared keep-alive connection pool.
+
+    The sync methods are what the tools (and so the CLI) use. The ``a``-prefixed
+    coroutines run the same request on a bounded executor so the FastAPI
+    server can await Cal.com without blocking its event loop.
+    """
+
+    def __init__(self, api_key: str, base_url: str, pool_size: int = CALCOM_POOL_SIZE,
+                 timeouts: dict = None, limiter: RateLimiter = None,
+                 retries_429: int = CALCOM_RATE_LIMIT_RETRIES, single_flight: bool = CALCOM_SINGLE_FLIGHT):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.timeouts = dict(CALCOM_TIMEOUTS if timeouts is None else timeouts)
+        self.limiter = limiter or RateLimiter()
+        self.retries_429 = retries_429
+        self.single_flight = SingleFlight() if single_flight else None
+        self._session = None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    session.headers.update({
+                        "Content-Type": "application/json",
+                        "Accept": "application/json"
+                    })
+                    self._session = session
+        return self._session
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.pool_size, thread_name_prefix="calcom"
+                    )
+        return self._executor
+
+    def timeout_for(self, endpoint: str) -> tuple:
+        """Return the (connect, read) timeout for the longest matching path prefix"""
+        path = endpoint.split("?", 1)[0]
+        best = None
+        for prefix in self.timeouts:
+            if path.startswith(prefix) and (best is None or len(prefix) > len(best)):
+                best = prefix
+        return self.timeouts[best] if best else CALCOM_DEFAULT_TIMEOUT
+
+    def request(self, endpoint: str, method: str = "GET", data: dict = None, params: dict = None) -> dict:
+        """Make a request to the Cal.com API.
+
+        Always returns a dict; failures are reported as ``{"error": ...}``.
+        A GET identical to one already in flight (same endpoint and
+        parameters) waits for that request and gets a copy of its result,
+        unless a write has finished since that request started.
+        """
+        if self.single_flight is None:
+            return self._send(endpoint, method, data, params)
+        if method != "GET":
+            result = self._send(endpoint, method, data, params)
+            # Reads in flight may predate this write; don't hand their results to later callers
+            self.single_flight.forget()
+            return result
+        key = (endpoint, json.dumps({k: v for k, v in (params or {}).items() if v is not None},
+                                    sort_keys=True, default=str))
+        result, shared = self.single_flight.do(key, lambda: self._send(endpoint, method, data, params))
+        if shared:
+            CALCOM_COALESCED.inc(endpoint=endpoint_template(endpoint))
+            tracing.current_span().set_attribute("calcom.coalesced", True)
+        return result
+
+    def _send(self, endpoint: str, method: str, data: dict = None, params: dict = None) -> dict:
+        """One upstream request. Every attempt takes a token from ``limiter``
+        first (writes ahead of reads), and 429s are retried after their Retry-After."""
+        if not self.api_key:
+            return {"error": "Cal.com API key not configured"}
+
+        query = {"apiKey": self.api_key}
+        if params:
+            query.update({k: v for k, v in params.items() if v is not None})
+        url = f"{self.base_url}{endpoint}"
+
+        template = endpoint_template(endpoint)
+        lane = "read" if method == "GET" else "write"
+        with CALCOM_REQUEST_DURATION.time(method=method, endpoint=template, status="error") as labels:
+            with tracing.span(f"{method} {template}", {
+                "http.request.method": method,
+                "http.route": template,
+                "url.path": endpoint,
+                # Query parameters without the API key
+                "calcom.params": params,
+            }, kind="CLIENT") as span:
+                try:
+                    queued = 0.0
+                    for attempt in range(self.retries_429 + 1):
+                        waited = self.limiter.acquire(lane)
+                        if waited is None:
+                            labels["status"] = "throttled"
+                            span.set_status("ERROR", "Rate limit queue timeout")
+                            return {"error": "Cal.com rate limit: too many requests are queued right now. "
+                                             "Don't retry; ask the user to try again in a few seconds.",
+                                    "status_code": 429, "rate_limited": True}
+                        queued += waited
+                        response = self.session.request(
+                            method, url, params=query, json=data, timeout=self.timeout_for(endpoint)
+                        )
+                        if response.status_code != 429:
+                            break
+                        delay = retry_after_seconds(response, default=2 ** attempt)
+                        self.limiter.pause(delay)
+                        if attempt == self.retries_429 or delay > self.limiter.max_wait:
+                            CALCOM_THROTTLED.inc(lane=lane, outcome="gave_up")
+                            break
+                        CALCOM_THROTTLED.inc(lane=lane, outcome="retried")
+                        print(f"⏳ Cal.com rate limit: {method} {endpoint} retrying in {delay:g}s")
+                    labels["status"] = response.status_code
+                    span.set_attribute("http.response.status_code", response.status_code)
+                    span.set_attribute("calcom.queue_wait_s", round(queued, 3))
+                    span.set_attribute("calcom.attempts", attempt + 1)
+
+                    if response.status_code == 429:
+                        print(f"❌ API Error: {method} {endpoint} - rate limited after {attempt + 1} attempts")
+                        span.set_status("ERROR", "HTTP 429")
+                        return {"error": f"Cal.com rate limit reached (retry after {delay:g}s). "
+                                         "Don't retry; ask the user to try again shortly.",
+                                "status_code": 429, "retry_after": delay, "rate_limited": True}
+
+                    if response.status_code not in [200, 204]:
+                        error_text = response.text[:500]
+                        print(f"❌ API Error: {method} {endpoint} - Status: {response.status_code}")
+                        span.set_status("ERROR", f"HTTP {response.status_code}")
+                        return {"error": f"API request failed with status {response.status_code}: {error_text}",
+                                "status_code": response.status_code}
+
+                    if response.content:
+                        return response.json()
+                    return {"success": True, "status_code": response.status_code}
+
+                except requests.exceptions.RequestException as e:
+                    print(f"❌ Request failed: {str(e)}")
+                    span.record_exception(e)
+                    return {"error": f"Request failed: {str(e)}"}
+
+    def get(self, endpoint: str, params: dict = None) -> dict:
+        return self.request(endpoint, "GET", params=params)
+
+    def post(self, endpoint: str, data: dict = None, params: dict = None) -> dict:
+        return self.request(endpoint, "POST", data=data, params=params)
+
+    def delete(self, endpoint: str, data: dict = None, params: dict = None) -> dict:
+        return self.request(endpoint, "DELETE", data=data, params=params)
+
+    def patch(self, endpoint: str, data: dict = None, params: dict = None) -> dict:
+        return self.request(endpoint, "PATCH", data=data, params=params)
+
+    async def arequest(self, endpoint: str, method: str = "GET", data: dict = None, params: dict = None) -> dict:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(tracing.wrap(self.request), endpoint, method, data, params)
+        )
+
+    async def aget(self, endpoint: str, params: dict = None) -> dict:
+        return await self.arequest(endpoint, "GET", params=params)
+
+    async def apost(self, endpoint: str, data: dict = None, params: dict = None) -> dict:
+        return await self.arequest(endpoint, "POST", data=data, params=params)
+
+    async def adelete(self, endpoint: str, data: dict = None, params: dict = None) -> dict:
+        return await self.arequest(endpoint, "DELETE", data=data, params=params)
+
+    async def apatch(self, endpoint: str, data: dict = None, params: dict = None) -> dict:
+        return await self.arequest(endpoint, "PATCH", data=data, params=params)
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+# Shared client: every tool goes through this pool
+calcom = CalComClient(CALCOM_API_KEY, CALCOM_BASE_URL)
+
+
+class SlotCache:
+    """TTL + LRU cache of one day's available slots (see ``slot_minutes``).
+
+    Keyed by (event_type_id, local date, timezone). Our own writes invalidate
+    the affected day for every event type, since they share one calendar.
+    """
+
+    def __init__(self, ttl: float = SLOT_CACHE_TTL, maxsize: int = SLOT_CACHE_SIZE, clock=time.monotonic):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(event_type_id, day, timezone):
+        return (int(event_type_id), day, timezone)
+
+    def get(self, event_type_id, day, timezone: str = USER_TIMEZONE):
+        key = self._key(event_type_id, day, timezone)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    SLOT_CACHE_REQUESTS.inc(result="hit")
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            SLOT_CACHE_REQUESTS.inc(result="miss")
+            return None
+
+    def put(self, event_type_id, day, value, timezone: str = USER_TIMEZONE):
+        key = self._key(event_type_id, day, timezone)
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, day, event_type_id=None) -> int:
+        """Drop cached slots for a day (all event types unless one is given)"""
+        with self._lock:
+            stale = [
+                key for key in self._entries
+                if key[1] == day and (event_type_id is None or key[0] == int(event_type_id))
+            ]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+slot_cache = SlotCache()
+
+
+def normalize_event_name(name: str) -> str:
+    """Normalize an event type title/slug/alias for lookups ("15-Minute Meeting" -> "15 min meeting")"""
+    text = re.sub(r'[^a-z0-9]+', ' ', name.lower())
+    text = re.sub(r'(\d)([a-z])', r'\1 \2', text)
+    text = re.sub(r'\b(?:minutes?|mins?)\b', 'min', text)
+    return ' '.join(text.split())
+
+
+class EventTypeCatalog:
+    """Event types loaded once from `/event-types` and refreshed in the background.
+
+    Lookups by ID or by normalized title, slug or "<length> min" alias are dict
+    hits. Only the very first load blocks; afterwards a stale catalog keeps
+    serving while a background thread refreshes it.
+    """
+
+    def __init__(self, client: CalComClient, refresh_interval: float = EVENT_TYPE_REFRESH_INTERVAL,
+                 clock=time.monotonic):
+        self.client = client
+        self.refresh_interval = refresh_interval
+        self._clock = clock
+        self._by_id = {}
+        self._by_alias = {}
+        self._aliases_longest_first = []
+        self._loaded_at = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self.last_error = None
+
+    def _index(self, event_types: list):
+        by_id, by_alias = {}, {}
+        for event in event_types:
+            if event.get("id") is None:
+                continue
+            by_id[int(event["id"])] = event
+            aliases = [event.get("title") or "", (event.get("slug") or "").replace("-", " ")]
+            if event.get("length"):
+                aliases += [f"{event['length']} min", f"{event['length']} min meeting"]
+            for alias in aliases:
+                alias = normalize_event_name(alias)
+                if alias:
+                    by_alias.setdefault(alias, event)
+        with self._lock:
+            self._by_id = by_id
+            self._by_alias = by_alias
+            self._aliases_longest_first = sorted(by_alias, key=len, reverse=True)
+            self._loaded_at = self._clock()
+
+    def _apply(self, result: dict) -> bool:
+        if "error" in result:
+            self.last_error = result["error"]
+            return False
+        self.last_error = None
+        self._index(result.get("event_types") or [])
+        return True
+
+    def refresh(self) -> bool:
+        """Reload the catalog from Cal.com; on failure the previous catalog is kept"""
+        return self._apply(self.client.get("/event-types"))
+
+    async def arefresh(self) -> bool:
+        return self._apply(await self.client.aget("/event-types"))
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        finally:
+            self._refreshing = False
+
+    def _ensure_fresh(self):
+        if self._loaded_at is None:
+            self.refresh()
+            return
+        if self._clock() - self._loaded_at < self.refresh_interval:
+            return
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, name="event-type-refresh", daemon=True).start()
+
+    def all(self) -> list:
+        self._ensure_fresh()
+        return list(self._by_id.values())
+
+    def get(self, event_type_id) -> Optional[dict]:
+        self._ensure_fresh()
+        try:
+            return self._by_id.get(int(event_type_id))
+        except (TypeError, ValueError):
+            return None
+
+    def lookup(self, name: str) -> Optional[dict]:
+        """Find an event type by title, slug or alias such as "30 min" """
+        self._ensure_fresh()
+        return self._by_alias.get(normalize_event_name(name))
+
+    def find_in_text(self, text: str) -> Optional[dict]:
+        """Find the event type named anywhere in a free-form message (longest alias wins)"""
+        self._ensure_fresh()
+        padded = f" {normalize_event_name(text)} "
+        for alias in self._aliases_longest_first:
+            if f" {alias} " in padded:
+                return self._by_alias[alias]
+        return None
+
+    def default(self) -> Optional[dict]:
+        """The shortest event type, used when the user doesn't name one"""
+        events = self.all()
+        return min(events, key=lambda e: e.get("length") or 0) if events else None
+
+    def duration(self, event_type_id) -> Optional[int]:
+        event = self.get(event_type_id)
+        return event.get("length") if event else None
+
+
+event_catalog = EventTypeCatalog(calcom)
+
+
+def _parse_api_time(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+class IntervalSet:
+    """Sorted, disjoint [start, end) intervals (timestamps), merged on build.
+
+    Overlap checks are a binary search, and listing the free gaps in a window
+    costs O(log n + k) for k busy intervals inside it.
+    """
+
+    def __init__(self, intervals=()):
+        merged = []
+        for start, end in sorted(intervals):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self._starts = [start for start, _ in merged]
+        self._ends = [end for _, end in merged]
+
+    def __len__(self):
+        return len(self._starts)
+
+    def overlapping(self, start: float, end: float) -> Optional[tuple]:
+        """The busy interval that overlaps [start, end), if any"""
+        i = bisect.bisect_right(self._starts, start) - 1
+        if i >= 0 and self._ends[i] > start:
+            return self._starts[i], self._ends[i]
+        if i + 1 < len(self._starts) and self._starts[i + 1] < end:
+            return self._starts[i + 1], self._ends[i + 1]
+        return None
+
+    def gaps(self, start: float, end: float, min_length: float = 0) -> list:
+        """Free (start, end) gaps inside [start, end) at least ``min_length`` long"""
+        gaps = []
+        cursor = start
+        i = bisect.bisect_right(self._ends, start)
+        while i < len(self._starts) and self._starts[i] < end:
+            if self._starts[i] - cursor >= min_length and self._starts[i] > cursor:
+                gaps.append((cursor, self._starts[i]))
+            cursor = max(cursor, self._ends[i])
+            i += 1
+        if end - cursor >= min_length and end > cursor:
+            gaps.append((cursor, end))
+        return gaps
+
+
+class BookingSyncError(Exception):
+    """Raised by BookingStore queries when Cal.com can't be read"""
+
+
+class BookingStore:
+    """Local mirror of the user's bookings, indexed by ID and by start time.
+
+    Tools read from the mirror instead of fetching `/bookings` every turn.
+    A local day is synced from Cal.com the first time it is read and again
+    once BOOKING_SYNC_INTERVAL has passed; a read over several days fetches
+    all the stale ones in one ranged request. Each sync only applies what changed
+    for that day: new and updated bookings are upserted, and ones that are gone
+    upstream are dropped. Our own book/cancel calls write through, so they
+    show up immediately. With ``path``, the mirror and its sync times are also
+    kept in SQLite and reloaded on start.
+
+    Cancelled bookings are never stored.
+    """
+
+    UPCOMING = "upcoming"
+
+    def __init__(self, client: CalComClient, email: str = USER_EMAIL, timezone: str = USER_TIMEZONE,
+                 sync_interval: float = BOOKING_SYNC_INTERVAL, path: str = None, clock=time.time):
+        self.client = client
+        self.email = email
+        self.tz = pytz.timezone(timezone)
+        self.sync_interval = sync_interval
+        self._clock = clock
+        self._by_id = {}      # id -> booking dict as returned by Cal.com
+        self._spans = {}      # id -> (start timestamp, end timestamp)
+        self._starts = []     # sorted (start timestamp, id)
+        self._max_length = 0  # longest booking seen, bounds conflict searches
+        self._busy = None     # IntervalSet of all bookings, rebuilt after changes
+        self._synced = {}     # local date or UPCOMING -> time of last sync
+        self._lock = threading.RLock()
+        self.syncs = 0
+        self.changes = 0
+        self._db = None
+        if path:
+            self._open(path)
+
+    # ----- SQLite persistence -----
+    def _open(self, path: str):
+        import sqlite3
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS bookings (id INTEGER PRIMARY KEY, start_ts REAL, data TEXT);
+            CREATE INDEX IF NOT EXISTS bookings_start ON bookings (start_ts);
+            CREATE TABLE IF NOT EXISTS sync_state (window TEXT PRIMARY KEY, synced_at REAL);
+        """)
+        for (data,) in self._db.execute("SELECT data FROM bookings"):
+            self._put(json.loads(data), persist=False)
+        for window, synced_at in self._db.execute("SELECT window, synced_at FROM sync_state"):
+            key = window if window == self.UPCOMING else datetime.strptime(window, "%Y-%m-%d").date()
+            self._synced[key] = synced_at
+
+    def _persist(self, sql: str, args: tuple):
+        if self._db is not None:
+            self._db.execute(sql, args)
+            self._db.commit()
+
+    # ----- index maintenance (callers hold the lock) -----
+    def _put(self, booking: dict, persist: bool = True) -> bool:
+        """Insert or update one booking; return True if anything changed"""
+        booking_id = int(booking["id"])
+        if str(booking.get("status", "")).upper() == "CANCELLED":
+            return self._drop(booking_id)
+        old = self._by_id.get(booking_id)
+        if old == booking:
+            return False
+        if old is not None:
+            self._starts.remove((self._spans[booking_id][0], booking_id))
+        start_ts = _parse_api_time(booking["startTime"]).timestamp()
+        end_ts = _parse_api_time(booking["endTime"]).timestamp() if booking.get("endTime") else start_ts
+        bisect.insort(self._starts, (start_ts, booking_id))
+        self._by_id[booking_id] = booking
+        self._spans[booking_id] = (start_ts, end_ts)
+        self._max_length = max(self._max_length, end_ts - start_ts)
+        self._busy = None
+        if persist:
+            self._persist("INSERT OR REPLACE INTO bookings (id, start_ts, data) VALUES (?, ?, ?)",
+                          (booking_id, start_ts, json.dumps(booking)))
+        return True
+
+    def _drop(self, booking_id: int) -> bool:
+        old = self._by_id.pop(booking_id, None)
+        if old is None:
+            return False
+        self._starts.remove((self._spans.pop(booking_id)[0], booking_id))
+        self._busy = None
+        self._persist("DELETE FROM bookings WHERE id = ?", (booking_id,))
+        return True
+
+    def _ids_between(self, start_ts: float, end_ts: float) -> list:
+        lo = bisect.bisect_left(self._starts, (start_ts,))
+        hi = bisect.bisect_left(self._starts, (end_ts,))
+        return [booking_id for _, booking_id in self._starts[lo:hi]]
+
+    def _day_bounds(self, day) -> tuple:
+        start = self.tz.localize(datetime.combine(day, datetime.min.time()))
+        end = self.tz.localize(datetime.combine(day + timedelta(days=1), datetime.min.time()))
+        return start, end
+
+    # ----- sync -----
+    def _is_fresh(self, window) -> bool:
+        synced_at = self._synced.get(window)
+        return synced_at is not None and self._clock() - synced_at < self.sync_interval
+
+    def _apply_window(self, window, bookings: list, start_ts: float, end_ts: float) -> int:
+        """Make the mirror match ``bookings`` for one window; return the number of changes"""
+        seen = set()
+        changed = 0
+        with self._lock:
+            for booking in bookings:
+                if booking.get("id") is None or not booking.get("startTime"):
+                    continue
+                seen.add(int(booking["id"]))
+                changed += self._put(booking)
+            for booking_id in self._ids_between(start_ts, end_ts):
+                if booking_id not in seen:
+                    changed += self._drop(booking_id)
+            self._synced[window] = self._clock()
+            key = window if window == self.UPCOMING else window.isoformat()
+            self._persist("INSERT OR REPLACE INTO sync_state (window, synced_at) VALUES (?, ?)",
+                          (key, self._synced[window]))
+            self.syncs += 1
+            self.changes += changed
+        return changed
+
+    def sync_day(self, day, force: bool = False) -> Optional[str]:
+        """Bring one local day up to date; return an error message on failure"""
+        return self.sync_days(day, day, force)
+
+    def sync_days(self, first_day, last_day, force: bool = False) -> Optional[str]:
+        """Bring local days first_day..last_day up to date with one request
+        spanning the stale ones; return an error message on failure"""
+        stale = [
+            first_day + timedelta(days=i) for i in range((last_day - first_day).days + 1)
+            if force or not self._is_fresh(first_day + timedelta(days=i))
+        ]
+        if not stale:
+            return None
+        start, end = self._day_bounds(stale[0])[0], self._day_bounds(stale[-1])[1]
+        result = self.client.get("/bookings", params={
+            "attendeeEmail": self.email,
+            "startTime": start.astimezone(pytz.UTC).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "endTime": end.astimezone(pytz.UTC).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        })
+        if "error" in result:
+            return result["error"]
+        by_day = {}
+        for booking in result.get("bookings") or []:
+            if booking.get("startTime"):
+                day = _parse_api_time(booking["startTime"]).astimezone(self.tz).date()
+                by_day.setdefault(day, []).append(booking)
+        # Fresh days between stale ones were fetched too; they're refreshed along with them
+        day = stale[0]
+        while day <= stale[-1]:
+            day_start, day_end = self._day_bounds(day)
+            self._apply_window(day, by_day.get(day, []), day_start.timestamp(), day_end.timestamp())
+            day += timedelta(days=1)
+        return None
+
+    def sync_upcoming(self, force: bool = False) -> Optional[str]:
+        """Bring every booking that hasn't ended yet up to date"""
+        if not force and self._is_fresh(self.UPCOMING):
+            return None
+        result = self.client.get("/bookings", params={"attendeeEmail": self.email, "status": "upcoming"})
+        if "error" in result:
+            # Fallback to try without status parameter if needed
+            result = self.client.get("/bookings", params={"attendeeEmail": self.email})
+            if "error" in result:
+                return result["error"]
+        now = datetime.now(pytz.UTC)
+        bookings = [
+            b for b in result.get("bookings") or []
+            if b.get("endTime") and _parse_api_time(b["endTime"]) >= now
+        ]
+        self._apply_window(self.UPCOMING, bookings, now.timestamp(), float("inf"))
+        return None
+
+    # ----- queries -----
+    def between(self, start: datetime, end: datetime, sync: bool = True) -> list:
+        """Bookings starting in [start, end), in start order, syncing each local day first"""
+        if sync:
+            self._sync_days(start, end)
+        with self._lock:
+            return [self._by_id[i] for i in self._ids_between(start.timestamp(), end.timestamp())]
+
+    def on_days(self, first_day, last_day) -> list:
+        """Bookings on local days first_day..last_day inclusive"""
+        return self.between(self._day_bounds(first_day)[0], self._day_bounds(last_day)[1])
+
+    def starting_at(self, start: datetime) -> list:
+        """Bookings that start exactly at ``start`` (an aware datetime)"""
+        return self.between(start, start + timedelta(seconds=1))
+
+    def upcoming(self) -> list:
+        """Bookings that haven't ended yet, in start order"""
+        error = self.sync_upcoming()
+        if error:
+            raise BookingSyncError(error)
+        now = datetime.now(pytz.UTC)
+        with self._lock:
+            ids = self._ids_between((now - timedelta(days=1)).timestamp(), float("inf"))
+            return [
+                self._by_id[i] for i in ids
+                if _parse_api_time(self._by_id[i]["endTime"]) >= now
+            ]
+
+    def get(self, booking_id) -> Optional[dict]:
+        with self._lock:
+            return self._by_id.get(int(booking_id))
+
+    def _sync_days(self, start: datetime, end: datetime):
+        error = self.sync_days(start.astimezone(self.tz).date(),
+                               (end - timedelta(microseconds=1)).astimezone(self.tz).date())
+        if error:
+            raise BookingSyncError(error)
+
+    def _days_fresh(self, start: datetime, end: datetime) -> bool:
+        day = start.astimezone(self.tz).date()
+        while day <= (end - timedelta(microseconds=1)).astimezone(self.tz).date():
+            if not self._is_fresh(day):
+                return False
+            day += timedelta(days=1)
+        return True
+
+    def conflicts(self, start: datetime, end: datetime, ignore_id=None, sync: bool = True) -> list:
+        """Bookings overlapping [start, end), optionally ignoring one booking (the one being moved).
+
+        With ``sync=False`` nothing is fetched: unless every day the window
+        (and the longest booking before it) touches is fresh, the result is
+        empty, meaning "no conflict known".
+        """
+        if sync:
+            # Syncing can reveal a longer booking, which widens the window to sync
+            lookback = -1
+            while lookback != self._max_length:
+                lookback = self._max_length
+                self._sync_days(start - timedelta(seconds=lookback), end)
+        elif not self._days_fresh(start - timedelta(seconds=self._max_length), end):
+            return []
+        start_ts, end_ts = start.timestamp(), end.timestamp()
+        with self._lock:
+            # Only bookings starting less than the longest booking before ``start`` can reach it
+            candidates = self._ids_between(start_ts - self._max_length, end_ts)
+            return [
+                self._by_id[i] for i in candidates
+                if i != ignore_id and self._spans[i][1] > start_ts
+            ]
+
+    def free_gaps(self, start: datetime, end: datetime, min_minutes: float = 0, ignore_id=None) -> list:
+        """Free (start, end) local datetimes inside [start, end) of at least ``min_minutes``"""
+        self._sync_days(start, end)
+        with self._lock:
+            if ignore_id is not None and ignore_id in self._spans:
+                busy = IntervalSet(span for i, span in self._spans.items() if i != ignore_id)
+            else:
+                if self._busy is None:
+                    self._busy = IntervalSet(self._spans.values())
+                busy = self._busy
+        return [
+            (datetime.fromtimestamp(gap_start, self.tz), datetime.fromtimestamp(gap_end, self.tz))
+            for gap_start, gap_end in busy.gaps(start.timestamp(), end.timestamp(), min_minutes * 60)
+        ]
+
+    def suggest_times(self, around: datetime, duration: int, count: int = 3, ignore_id=None) -> list:
+        """Up to ``count`` free start times on the same day, within working hours, closest to ``around``"""
+        day = around.astimezone(self.tz).date()
+        opens = self.tz.localize(datetime.combine(day, datetime.min.time()).replace(hour=WORKDAY_START_HOUR))
+        closes = self.tz.localize(datetime.combine(day, datetime.min.time()).replace(hour=WORKDAY_END_HOUR))
+        length = timedelta(minutes=duration)
+        starts = []
+        for gap_start, gap_end in self.free_gaps(opens, closes, duration, ignore_id=ignore_id):
+            # The start inside this gap that is nearest the requested time
+            starts.append(min(max(around, gap_start), gap_end - length))
+        starts.sort(key=lambda t: abs((t - around).total_seconds()))
+        return sorted(starts[:count])
+
+    # ----- write-through from our own calls -----
+    def record_booking(self, booking: dict):
+        if booking.get("id") is None or not booking.get("startTime"):
+            return
+        with self._lock:
+            self._put(booking)
+
+    def record_cancellation(self, booking_id):
+        with self._lock:
+            self._drop(int(booking_id))
+
+    def clear(self):
+        with self._lock:
+            self._by_id.clear()
+            self._spans.clear()
+            self._starts.clear()
+            self._busy = None
+            self._synced.clear()
+            self._persist("DELETE FROM bookings", ())
+            self._persist("DELETE FROM sync_state", ())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"bookings": len(self._by_id), "windows": len(self._synced),
+                    "syncs": self.syncs, "changes": self.changes}
+
+
+booking_store = BookingStore(calcom, path=BOOKING_STORE_PATH)
+
+
+# Callback(done, total, message) for progress on long-running tools. The web
+# server sets it around a tool call to stream progress frames; unset in the CLI.
+tool_progress = contextvars.ContextVar("calbot_tool_progress", default=None)
+
+
+def report_progress(done: int, total: int, message: str):
+    callback = tool_progress.get()
+    if callback is None:
+        return
+    try:
+        callback(done, total, message)
+    except Exception as e:
+        print(f"⚠️ Progress callback failed: {e}")
+
+
+def make_calcom_request(endpoint: str, method: str = "GET", data: dict = None, params: dict = None):
+    """Helper function to make requests to Cal.com API"""
+    return calcom.request(endpoint, method, data, params)
 
 
 
@@ -258,14 +1313,14 @@ def make_calcom_request(endpoint: str, method: str = "GET", data: dict = None):
 @tool
 def list_event_types() -> str:
     """Get available event types for booking"""
-    result = make_calcom_request("/event-types")
+    event_types = event_catalog.all()
     
-    if "error" in result:
-        return f"Error fetching event types: {result['error']}"
+    if not event_types and event_catalog.last_error:
+        return f"Error fetching event types: {event_catalog.last_error}"
     
-    if "event_types" in result and result["event_types"]:
+    if event_types:
         event_list = []
-        for event in result["event_types"]:
+        for event in event_types:
             event_list.append(f"- {event.get('title', 'Untitled')} (ID: {event.get('id')}) - {event.get('length', 0)} minutes")
         return f"Available event types:\n" + "\n".join(event_list)
     else:
@@ -274,6 +1329,148 @@ def list_event_types() -> str:
 
 
 
+def slot_minutes(result: dict, day, timezone: str = USER_TIMEZONE) -> tuple:
+    """Sorted minute-of-day start times of the `/slots` slots that fall on local ``day``"""
+    tz = pytz.timezone(timezone)
+    minutes = set()
+    slots_by_date = result.get("slots")
+    if isinstance(slots_by_date, dict):
+        for slots in slots_by_date.values():
+            for slot in slots:
+                if not (isinstance(slot, dict) and "time" in slot):
+                    continue
+                try:
+                    slot_dt = _parse_api_time(slot["time"]).astimezone(tz)
+                except ValueError:
+                    continue
+                if slot_dt.date() == day:
+                    minutes.add(slot_dt.hour * 60 + slot_dt.minute)
+    return tuple(sorted(minutes))
+
+
+def format_minutes(minutes: int) -> str:
+    """Minute of day as "2:30 PM" """
+    hour, minute = divmod(minutes, 60)
+    return f"{hour % 12 or 12}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+
+
+def nearest_slots(minutes: tuple, requested: int, count: int = SLOT_SUGGESTION_COUNT,
+                  max_distance: int = SLOT_SUGGESTION_MAX_DISTANCE, bias: str = SLOT_SUGGESTION_BIAS) -> list:
+    """Up to ``count`` free slots closest to ``requested`` (minute of day), closest first.
+
+    Binary-searches the sorted slot list, then walks outwards from the
+    requested time. The closest slot is always returned. The others must be
+    within ``max_distance`` minutes. With a bias of "earlier" or "later",
+    distances on the other side count double.
+    """
+    before_weight = 2 if bias == "later" else 1
+    after_weight = 2 if bias == "earlier" else 1
+    hi = bisect.bisect_left(minutes, requested)
+    lo = hi - 1
+    picked = []
+    while len(picked) < count and (lo >= 0 or hi < len(minutes)):
+        before = (requested - minutes[lo]) * before_weight if lo >= 0 else None
+        after = (minutes[hi] - requested) * after_weight if hi < len(minutes) else None
+        if after is None or (before is not None and before <= after):
+            slot, lo = minutes[lo], lo - 1
+        else:
+            slot, hi = minutes[hi], hi + 1
+        if picked and abs(slot - requested) > max_distance:
+            # Weighted order can still reach a nearer slot on the other side
+            if (lo < 0 or requested - minutes[lo] > max_distance) and \
+                    (hi >= len(minutes) or minutes[hi] - requested > max_distance):
+                break
+            continue
+        picked.append(slot)
+    return picked
+
+
+def fetch_day_slots(event_type_id, days) -> dict:
+    """Map each local date in ``days`` to its sorted slot minutes.
+
+    Days already in the slot cache are served from it. All the others come
+    from a single `/slots` request covering them, and each is cached. Returns
+    ``{"error": ...}`` if Cal.com can't be read.
+    """
+    slots_by_day = {}
+    missing = []
+    for day in days:
+        minutes = slot_cache.get(event_type_id, day)
+        if minutes is None:
+            missing.append(day)
+        else:
+            slots_by_day[day] = minutes
+    tracing.current_span().set_attribute("calbot.slot_cache.hit", not missing)
+    if missing:
+        # Bounds of the whole span of days in the user's timezone
+        user_tz = pytz.timezone(USER_TIMEZONE)
+        range_start = user_tz.localize(datetime.combine(min(missing), datetime.min.time()))
+        range_end = user_tz.localize(datetime.combine(max(missing) + timedelta(days=1), datetime.min.time()))
+        range_end -= timedelta(milliseconds=1)
+        result = calcom.get("/slots", params={
+            "eventTypeId": event_type_id,
+            "startTime": range_start.astimezone(pytz.UTC).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z",
+            "endTime": range_end.astimezone(pytz.UTC).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z",
+            "timeZone": USER_TIMEZONE
+        })
+        if "error" in result:
+            return result
+        for day in missing:
+            slots_by_day[day] = slot_minutes(result, day)
+            slot_cache.put(event_type_id, day, slots_by_day[day])
+    return slots_by_day
+
+
+def summarize_slots(minutes: tuple) -> str:
+    """Compact description of a day's slots: "9:00 AM-11:30 AM, 2:00 PM (7 times, every 30 min)" """
+    if not minutes:
+        return "fully booked"
+    step = min((b - a for a, b in zip(minutes, minutes[1:])), default=0)
+    runs = []
+    run_start = previous = minutes[0]
+    for minute in minutes[1:] + (None,):
+        if minute is not None and minute - previous == step:
+            previous = minute
+            continue
+        runs.append(format_minutes(run_start) if run_start == previous
+                    else f"{format_minutes(run_start)}-{format_minutes(previous)}")
+        run_start = previous = minute
+    count = f"{len(minutes)} time{'s' if len(minutes) != 1 else ''}"
+    if step:
+        count += f", every {step} min"
+    return f"{', '.join(runs)} ({count})"
+
+
+@tool
+def check_availability_range(event_type_id: int, dates: str, end_date: str = None) -> str:
+    """Summarize free times over several days with one lookup. ``dates`` is a range such as
+    "this week", "next week", "next 3 weekdays", "this weekend" or "monday to friday", or a
+    start date with ``end_date``. Use this instead of calling check_availability once per day."""
+    try:
+        try:
+            days = parse_date_range(dates, end_date)
+        except ValueError as e:
+            return f"❌ {str(e)}. Please use ranges like 'this week', 'next 3 weekdays' or 'July 28th to July 31st'"
+        if not days:
+            return "❌ That range doesn't include any days. Please try a different range."
+
+        slots_by_day = fetch_day_slots(event_type_id, days)
+        if "error" in slots_by_day:
+            return f"Error checking availability: {slots_by_day['error']}"
+
+        event_type = event_catalog.get(event_type_id)
+        title = event_type.get("title", "meeting") if event_type else "meeting"
+        lines = [f"📅 Availability for {title}, {days[0].strftime('%a %b %d')} - {days[-1].strftime('%a %b %d')}:"]
+        for day in days:
+            lines.append(f"• {day.strftime('%A, %B %d')}: {summarize_slots(slots_by_day[day])}")
+        if not any(slots_by_day[day] for day in days):
+            lines.append("\nNo free times in this range. Please try different dates.")
+        return "\n".join(lines)
+
+    except Exception as e:
+        return f"Error checking availability: {str(e)}"
+
+
 @tool
 def check_availability(event_type_id: int, date: str, requested_time: str = None) -> str:
     """Check if a specific time is available for booking"""
@@ -283,20 +1480,12 @@ def check_availability(event_type_id: int, date: str, requested_time: str = None
         except ValueError as e:
             return f"❌ {str(e)}. Please use formats like 'tomorrow', '7/31/2025', 'July 28th', or 'this Thursday'"
 
-        date_str = target_date.strftime("%Y-%m-%d")
-
-        # Set time bounds for the entire day in user's timezone
-        start_time = f"{date_str}T00:00:00.000Z"
-        end_time = f"{date_str}T23:59:59.999Z"
-
-        endpoint = f"/slots?eventTypeId={event_type_id}&startTime={start_time}&endTime={end_time}&timeZone={USER_TIMEZONE}"
-        result = make_calcom_request(endpoint)
-
-        if "error" in result:
-            return f"Error checking availability: {result['error']}"
+        slots_by_day = fetch_day_slots(event_type_id, (target_date,))
+        if "error" in slots_by_day:
+            return f"Error checking availability: {slots_by_day['error']}"
+        minutes = slots_by_day[target_date]
 
         # Parse requested time if provided
-        requested_slot = None
         if requested_time:
             try:
                 # Use flexible time parser first
@@ -307,84 +1496,57 @@ def check_availability(event_type_id: int, date: str, requested_time: str = None
                     time_obj = datetime.strptime(parsed_time, "%I:%M %p").time()
                 else:
                     time_obj = datetime.strptime(parsed_time, "%H:%M").time()
-
-                requested_time_str = time_obj.strftime("%H:%M")
             except ValueError:
                 return f"Couldn't understand the time '{requested_time}'. Please try formats like '2pm', '2:30 PM', or '14:00'"
+            requested_minutes = time_obj.hour * 60 + time_obj.minute
 
-        # Check availability
-        available_slots = []
-        exact_match_found = False
-
-        if "slots" in result and isinstance(result["slots"], dict):
-            for date_key, slots in result["slots"].items():
-                for slot in slots:
-                    if isinstance(slot, dict) and "time" in slot:
-                        slot_time = slot["time"]
-                        try:
-                            # Parse the time and convert to user's timezone
-                            slot_dt = datetime.fromisoformat(slot_time.replace("Z", "+00:00"))
-                            user_tz = pytz.timezone(USER_TIMEZONE)
-                            slot_dt = slot_dt.astimezone(user_tz)
-
-                            # Check if this matches the requested time
-                            if requested_time:
-                                slot_time_str = slot_dt.strftime("%H:%M")
-                                if slot_time_str == requested_time_str:
-                                    exact_match_found = True
-                                    return f"✅ The requested time {requested_time} is available on {target_date.strftime('%A, %B %d')}."
-
-                            # Store for alternative suggestions
-                            available_slots.append(slot_dt.strftime("%I:%M %p").lstrip("0"))
-                        except ValueError:
-                            continue
-
-        if requested_time and not exact_match_found:
-            if available_slots:
-                # Find the closest available time to the requested time
-                try:
-                    requested_dt = datetime.strptime(requested_time_str, "%H:%M")
-                    requested_minutes = requested_dt.time().hour * 60 + requested_dt.time().minute
-
-                    # Sort available slots by proximity to requested time
-                    def time_distance(slot_str):
-                        try:
-                            slot_dt = datetime.strptime(slot_str, "%I:%M %p")
-                            slot_minutes = slot_dt.time().hour * 60 + slot_dt.time().minute
-                            return abs(slot_minutes - requested_minutes)
-                        except:
-                            return 999999  # Put invalid times at the end
-
-                    sorted_slots = sorted(available_slots, key=time_distance)
-                    closest_slot = sorted_slots[0]
-
-                    # Get 2-3 closest alternatives (within 2 hours if possible)
-                    close_alternatives = []
-                    for slot in sorted_slots[1:]:
-                        try:
-                            slot_dt = datetime.strptime(slot, "%I:%M %p")
-                            slot_minutes = slot_dt.time().hour * 60 + slot_dt.time().minute
-                            time_diff = abs(slot_minutes - requested_minutes)
-
-                            # Only include alternatives within 2 hours (120 minutes)
-                            if time_diff <= 120 and len(close_alternatives) < 2:
-                                close_alternatives.append(slot)
-                        except:
-                            continue
-                    
-                    alt_text = f"\n\nOther nearby times: {', '.join(close_alternatives)}" if close_alternatives else ""
-                    return f"❌ The requested time {requested_time} is not available on {target_date.strftime('%A, %B %d')}.\n\n✅ Closest available time: {closest_slot}{alt_text}\n\nWould you like to book {closest_slot} instead?"
-                except:
-                    return f"❌ The requested time {requested_time} is not available. Here are available times: {', '.join(available_slots[:3])}\n\nWhich time would you prefer?"
+            i = bisect.bisect_left(minutes, requested_minutes)
+            if i < len(minutes) and minutes[i] == requested_minutes:
+                return f"✅ The requested time {requested_time} is available on {target_date.strftime('%A, %B %d')}."
+
+            if minutes:
+                closest, *alternatives = [format_minutes(m) for m in nearest_slots(minutes, requested_minutes)]
+                alt_text = f"\n\nOther nearby times: {', '.join(alternatives)}" if alternatives else ""
+                return f"❌ The requested time {requested_time} is not available on {target_date.strftime('%A, %B %d')}.\n\n✅ Closest available time: {closest}{alt_text}\n\nWould you like to book {closest} instead?"
             else:
                 return f"❌ No available time slots found for {target_date.strftime('%A, %B %d')}. Please try a different date."
 
+        if not minutes:
+            return f"❌ No available time slots found for {target_date.strftime('%A, %B %d')}. Please try a different date."
+        return f"✅ Available on {target_date.strftime('%A, %B %d')}: {summarize_slots(minutes)}"
+
     except Exception as e:
         return f"Error checking availability: {str(e)}"
     
 
 
 
+def find_booking_conflict(start_dt: datetime, end_dt: datetime, ignore_id=None) -> Optional[str]:
+    """A "not available" message if [start_dt, end_dt) overlaps a known booking, else None.
+
+    Only checked against days the local booking mirror already has fresh, so
+    it never adds a Cal.com call; otherwise the slot check and the booking
+    request itself catch conflicts.
+    """
+    try:
+        clashes = booking_store.conflicts(start_dt, end_dt, ignore_id=ignore_id, sync=False)
+    except BookingSyncError:
+        return None
+    if not clashes:
+        return None
+    user_tz = pytz.timezone(USER_TIMEZONE)
+    clash = clashes[0]
+    clash_start = _parse_api_time(clash["startTime"]).astimezone(user_tz)
+    message = (f"❌ The requested time {format_minutes(start_dt.hour * 60 + start_dt.minute)} is not available on "
+               f"{start_dt.strftime('%A, %B %d')}: it overlaps '{clash.get('title', 'Meeting')}' "
+               f"at {format_minutes(clash_start.hour * 60 + clash_start.minute)}.")
+    duration = int((end_dt - start_dt).total_seconds() // 60)
+    free = booking_store.suggest_times(start_dt, duration, ignore_id=ignore_id)
+    if free:
+        message += f"\n\n✅ Free times that day: {', '.join(format_minutes(t.hour * 60 + t.minute) for t in free)}"
+    return message
+
+
 # Updated book_meeting function
 @tool
 def book_meeting(event_type_id: int, date: str, time: str, attendee_name: str, attendee_email: str = USER_EMAIL, reason: str = "") -> str:
@@ -402,28 +1564,18 @@ def book_meeting(event_type_id: int, date: str, time: str, attendee_name: str, a
         except ValueError as e:
             return f"❌ Couldn't understand time format: '{time}'. Please try formats like '2pm', '2:30 PM', or '14:00'."
         
-        # Check availability first using invoke method
-        availability_result = check_availability.invoke({
-            "event_type_id": event_type_id,
-            "date": date_for_availability,
-            "requested_time": parsed_time
-        })
-        
-        if "❌" in availability_result and "is not available" in availability_result:
-            return availability_result
-        elif "Error checking availability" in availability_result:
-            return availability_result
-
-        # Get event type details for duration
-        event_type = make_calcom_request(f"/event-types/{event_type_id}")
-        if "error" in event_type:
-            return f"❌ Error getting event details: {event_type['error']}"
-        
-        # Handle different response structures
-        if "event_type" in event_type:
-            duration = event_type["event_type"].get("length", 15)
-        else:
-            duration = event_type.get("length", 15)
+        # Get event type duration, from the catalog when we know the event type
+        duration = event_catalog.duration(event_type_id)
+        if duration is None:
+            event_type = calcom.get(f"/event-types/{event_type_id}")
+            if "error" in event_type:
+                return f"❌ Error getting event details: {event_type['error']}"
+            
+            # Handle different response structures
+            if "event_type" in event_type:
+                duration = event_type["event_type"].get("length", 15)
+            else:
+                duration = event_type.get("length", 15)
 
         # Parse the time and create datetime objects
         try:
@@ -447,7 +1599,22 @@ def book_meeting(event_type_id: int, date: str, time: str, attendee_name: str, a
         except ValueError as e:
             return f"❌ Couldn't understand time format: '{time}'. Please try formats like '2pm', '2:30 PM', or '14:00'."
 
+        # Reject clashes with bookings we already know about without a round trip
+        conflict = find_booking_conflict(start_dt, end_dt)
+        if conflict:
+            return conflict
 
+        # Then ask Cal.com, which also knows about working hours and other calendars
+        availability_result = check_availability.invoke({
+            "event_type_id": event_type_id,
+            "date": date_for_availability,
+            "requested_time": parsed_time
+        })
+        
+        if "❌" in availability_result and "is not available" in availability_result:
+            return availability_result
+        elif "Error checking availability" in availability_result:
+            return availability_result
 
         # Parse date with flexible date support
         try:
@@ -474,9 +1641,12 @@ def book_meeting(event_type_id: int, date: str, time: str, attendee_name: str, a
         print(f"🔄 Booking data: {json.dumps(booking_data, indent=2)}")
 
         # Make the booking request
-        result = make_calcom_request("/bookings", "POST", booking_data)
+        result = calcom.post("/bookings", booking_data)
         
         print(f"🔄 Booking API response: {json.dumps(result, indent=2)}")
+
+        # Whatever happened upstream, our view of this day's slots is now stale
+        slot_cache.invalidate(date_obj)
         
         if "error" in result:
             error_msg = result['error']
@@ -490,6 +1660,7 @@ def book_meeting(event_type_id: int, date: str, time: str, attendee_name: str, a
         # Check for successful booking
         if result.get("booking") or result.get("id"):
             booking = result.get("booking", result)
+            booking_store.record_booking(booking)
             
             try:
                 if booking.get('startTime'):
@@ -522,27 +1693,32 @@ def book_meeting(event_type_id: int, date: str, time: str, attendee_name: str, a
 def list_scheduled_events(user_email: str = USER_EMAIL) -> str:
     """List all valid upcoming events (excluding canceled ones) from the user's calendar"""
     try:
-        # First get all upcoming bookings
-        result = make_calcom_request(
-            f"/bookings?attendeeEmail={user_email}&status=upcoming"
-        )
-        
-        if "error" in result:
-            # Fallback to try without status parameter if needed
-            result = make_calcom_request(
-                f"/bookings?attendeeEmail={user_email}"
+        # The user's own calendar is served from the local mirror
+        if user_email == booking_store.email:
+            try:
+                bookings = booking_store.upcoming()
+            except BookingSyncError as e:
+                return f"❌ Calendar Error: {e}"
+        else:
+            result = calcom.get(
+                "/bookings", params={"attendeeEmail": user_email, "status": "upcoming"}
             )
+            
             if "error" in result:
-                return f"❌ Calendar Error: {result['error']}"
+                # Fallback to try without status parameter if needed
+                result = calcom.get("/bookings", params={"attendeeEmail": user_email})
+                if "error" in result:
+                    return f"❌ Calendar Error: {result['error']}"
+            bookings = result.get("bookings") or []
         
-        if not result.get("bookings"):
+        if not bookings:
             return "Your calendar shows no upcoming events."
 
         # Filter out canceled events and format valid ones
         valid_events = []
         user_tz = pytz.timezone(USER_TIMEZONE)
         
-        for booking in result["bookings"]:
+        for booking in bookings:
             # Skip canceled events
             if booking.get("status", "").upper() == "CANCELLED":
                 continue
@@ -597,6 +1773,66 @@ def list_scheduled_events(user_email: str = USER_EMAIL) -> str:
 
 
 
+def _is_retryable(result: dict) -> bool:
+    """Network failures (no status), rate limits and server errors are worth retrying.
+
+    Not a 429 the client has already waited out and retried (``rate_limited``).
+    """
+    if result.get("rate_limited"):
+        return False
+    status = result.get("status_code")
+    return status is None or status == 429 or status >= 500
+
+
+def cancel_booking_with_retry(booking_id, retries: int = BULK_CANCEL_RETRIES,
+                              backoff: float = BULK_CANCEL_BACKOFF) -> dict:
+    """DELETE one booking, retrying transient failures with jittered exponential backoff"""
+    for attempt in range(retries + 1):
+        result = calcom.delete(f"/bookings/{booking_id}")
+        if "error" not in result or attempt == retries or not _is_retryable(result):
+            return result
+        time.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+    return result
+
+
+def cancel_bookings(bookings: list, concurrency: int = BULK_CANCEL_CONCURRENCY) -> list:
+    """Cancel bookings concurrently and return one result line per booking, in input order.
+
+    Failures don't stop the others, so the caller always gets a full (possibly
+    partial) summary. Each finished cancellation is passed to report_progress.
+    """
+    user_tz = pytz.timezone(USER_TIMEZONE)
+
+    def cancel_one(booking):
+        try:
+            result = cancel_booking_with_retry(booking["id"])
+        except Exception as e:
+            result = {"error": str(e)}
+        if "error" in result:
+            return f"❌ Failed to cancel '{booking.get('title')}'"
+        booking_store.record_cancellation(booking["id"])
+        start_time = datetime.fromisoformat(booking['startTime'].replace("Z","+00:00")).astimezone(user_tz)
+        slot_cache.invalidate(start_time.date())
+        start_time = start_time.strftime("%I:%M %p")
+        return f"✅ Cancelled '{booking.get('title')}' at {start_time}"
+
+    total = len(bookings)
+    if total <= 1 or concurrency <= 1:
+        results = []
+        for booking in bookings:
+            results.append(cancel_one(booking))
+            report_progress(len(results), total, results[-1])
+        return results
+
+    results = [None] * total
+    with ThreadPoolExecutor(max_workers=min(concurrency, total), thread_name_prefix="calcom-cancel") as pool:
+        futures = {pool.submit(tracing.wrap(cancel_one), booking): i for i, booking in enumerate(bookings)}
+        for done, future in enumerate(as_completed(futures), 1):
+            results[futures[future]] = future.result()
+            report_progress(done, total, results[futures[future]])
+    return results
+
+
 @tool
 def cancel_event(time: str = None, date_reference: str = None, confirm: bool = False) -> str:
     """Cancel meetings with confirmation. Requires specific time/date or explicit confirmation for bulk actions."""
@@ -624,47 +1860,31 @@ def cancel_event(time: str = None, date_reference: str = None, confirm: bool = F
                 return f"❌ Could not understand date '{date_reference}'. Please use formats like 'tomorrow', '7/31/2025', 'July 28th', or 'this Thursday'"
             
 
-        # Get bookings in date range
-        bookings = make_calcom_request(
-            f"/bookings?attendeeEmail={USER_EMAIL}"
-            f"&startTime={start_date.isoformat()}T00:00:00Z"
-            f"&endTime={end_date.isoformat()}T23:59:59Z"
-        )
-        
-        if "error" in bookings:
-            return f"❌ Error fetching bookings: {bookings['error']}"
-
-        # Filter matching bookings
-        matching_bookings = []
-        for booking in bookings.get("bookings", []):
-            if booking.get("status") == "CANCELLED":
-                continue
-                
-            try:
-                start_utc = booking['startTime'].replace("Z", "+00:00")
-                start_local = datetime.fromisoformat(start_utc).astimezone(user_tz)
-                
-
-                # Time filtering - make it more precise
-                if time:
-                    try:
-                        # Parse the requested time
-                        parsed_time = parse_time_flexible(time)
-                        if "am" in parsed_time.lower() or "pm" in parsed_time.lower():
-                            time_obj = datetime.strptime(parsed_time, "%I:%M %p").time()
-                        else:
-                            time_obj = datetime.strptime(parsed_time, "%H:%M").time()
-                            
-                        # Exact time match only (no 15-minute tolerance)
-                        if not (start_local.time().hour == time_obj.hour and
-                               start_local.time().minute == time_obj.minute):
-                            continue
-                    except ValueError:
-                        return f"❌ Invalid time format: {time}. Use '2:00 PM' or '14:00'"
-                
-                matching_bookings.append(booking)
-            except Exception:
-                continue
+        # Look up bookings in the local mirror: by exact start time when a
+        # time is given, otherwise everything in the date range
+        try:
+            if time:
+                try:
+                    parsed_time = parse_time_flexible(time)
+                    if "am" in parsed_time.lower() or "pm" in parsed_time.lower():
+                        time_obj = datetime.strptime(parsed_time, "%I:%M %p").time()
+                    else:
+                        time_obj = datetime.strptime(parsed_time, "%H:%M").time()
+                except ValueError:
+                    return f"❌ Invalid time format: {time}. Use '2:00 PM' or '14:00'"
+
+                # Exact time match only (no 15-minute tolerance)
+                matching_bookings = []
+                day = start_date
+                while day <= end_date:
+                    matching_bookings += booking_store.starting_at(
+                        user_tz.localize(datetime.combine(day, time_obj))
+                    )
+                    day += timedelta(days=1)
+            else:
+                matching_bookings = booking_store.on_days(start_date, end_date)
+        except BookingSyncError as e:
+            return f"❌ Error fetching bookings: {e}"
 
         if not matching_bookings:
             if time:
@@ -684,16 +1904,8 @@ def cancel_event(time: str = None, date_reference: str = None, confirm: bool = F
                 f"Please confirm by repeating with 'confirm'"
             )
 
-        # Perform cancellations
-        results = []
-        for booking in matching_bookings:
-            result = make_calcom_request(f"/bookings/{booking['id']}", "DELETE")
-            if "error" in result:
-                results.append(f"❌ Failed to cancel '{booking.get('title')}'")
-            else:
-                start_time = datetime.fromisoformat(booking['startTime'].replace("Z","+00:00"))
-                start_time = start_time.astimezone(user_tz).strftime("%I:%M %p")
-                results.append(f"✅ Cancelled '{booking.get('title')}' at {start_time}")
+        # Perform cancellations (concurrently when there are several)
+        results = cancel_bookings(matching_bookings)
 
         # Format response
         if len(results) == 1:
@@ -726,18 +1938,7 @@ def reschedule_event(old_time: str, new_time: str, date_reference: str = "tomorr
                 return f"❌ Could not understand date '{date_reference}'. Please use formats like 'tomorrow', '7/31/2025', 'July 28th', or 'this Thursday'"
             
         
-        # Get bookings for the specified date BEFORE cancelling
-        bookings = make_calcom_request(
-            f"/bookings?attendeeEmail={USER_EMAIL}"
-            f"&startTime={old_date.isoformat()}T00:00:00Z"
-            f"&endTime={old_date.isoformat()}T23:59:59Z"
-        )
-        
-        if "error" in bookings:
-            return f"❌ Error finding meeting to reschedule: {bookings['error']}"
-
         # Find the meeting at the specified time with exact matching
-        target_meeting = None
         try:
             parsed_old_time = parse_time_flexible(old_time)
             if "am" in parsed_old_time.lower() or "pm" in parsed_old_time.lower():
@@ -747,22 +1948,11 @@ def reschedule_event(old_time: str, new_time: str, date_reference: str = "tomorr
         except ValueError:
             return f"❌ Invalid time format: {old_time}. Use format like '2:00 PM'"
 
-        for booking in bookings.get("bookings", []):
-            if booking.get("status") == "CANCELLED":
-                continue
-                
-            try:
-                start_utc = booking['startTime'].replace("Z", "+00:00")
-                start_local = datetime.fromisoformat(start_utc).astimezone(user_tz)
-                
-                booking_time = start_local.time()
-                # Exact time match only
-                if (booking_time.hour == time_obj.hour and 
-                    booking_time.minute == time_obj.minute):
-                    target_meeting = booking
-                    break
-            except Exception:
-                continue
+        try:
+            candidates = booking_store.starting_at(user_tz.localize(datetime.combine(old_date, time_obj)))
+        except BookingSyncError as e:
+            return f"❌ Error finding meeting to reschedule: {e}"
+        target_meeting = candidates[0] if candidates else None
 
         if not target_meeting:
             return f"❌ No meeting found at {old_time} on {old_date.strftime('%A, %B %d')} to reschedule."
@@ -775,14 +1965,7 @@ def reschedule_event(old_time: str, new_time: str, date_reference: str = "tomorr
         if not event_type_id:
             return "❌ Could not determine event type for rescheduling"
 
-        # 2. Cancel the original meeting
-        cancel_result = make_calcom_request(f"/bookings/{target_meeting['id']}", "DELETE")
-        if "error" in cancel_result:
-            return f"❌ Failed to cancel original meeting: {cancel_result['error']}"
-
-
-
-        # 3. Parse new date with flexible parsing
+        # 2. Parse new date with flexible parsing
         if new_date:
             try:
                 new_date_obj, new_date_str = parse_date_flexible(new_date)
@@ -793,7 +1976,31 @@ def reschedule_event(old_time: str, new_time: str, date_reference: str = "tomorr
             new_date_str = "today" if old_date == datetime.now().date() else old_date.strftime("%Y-%m-%d")
 
 
-        # 4. Book the new meeting using invoke method
+        # 3. Make sure the new time is free before giving up the old one
+        try:
+            parsed_new_time = parse_time_flexible(new_time)
+            if "am" in parsed_new_time.lower() or "pm" in parsed_new_time.lower():
+                new_time_obj = datetime.strptime(parsed_new_time, "%I:%M %p").time()
+            else:
+                new_time_obj = datetime.strptime(parsed_new_time, "%H:%M").time()
+        except ValueError:
+            return f"❌ Invalid time format: {new_time}. Use format like '2:00 PM'"
+        original_end = _parse_api_time(target_meeting["endTime"]).astimezone(user_tz)
+        new_start = user_tz.localize(datetime.combine(new_date_obj, new_time_obj))
+        conflict = find_booking_conflict(
+            new_start, new_start + (original_end - original_start), ignore_id=target_meeting["id"]
+        )
+        if conflict:
+            return f"{conflict}\n\nYour {original_title} at {original_start.strftime('%I:%M %p')} was not changed."
+
+        # 4. Cancel the original meeting
+        cancel_result = calcom.delete(f"/bookings/{target_meeting['id']}")
+        if "error" in cancel_result:
+            return f"❌ Failed to cancel original meeting: {cancel_result['error']}"
+        booking_store.record_cancellation(target_meeting["id"])
+        slot_cache.invalidate(original_start.date())
+
+        # 5. Book the new meeting using invoke method
         book_result = book_meeting.invoke({
             "event_type_id": event_type_id,
             "date": new_date_str,
@@ -825,25 +2032,80 @@ def reschedule_event(old_time: str, new_time: str, date_reference: str = "tomorr
 
 
 # Define tools
-tools = [list_event_types, book_meeting, list_scheduled_events, cancel_event, reschedule_event, check_availability]
+tools = [list_event_types, book_meeting, list_scheduled_events, cancel_event, reschedule_event, check_availability,
+         check_availability_range]
 
-# Initialize model with tools
-model = ChatOpenAI(model="gpt-4o", temperature=0).bind_tools(tools)
 
+def _instrument_tool(t):
+    """Record every invocation of a tool, including nested ones, in TOOL_DURATION"""
+    func = t.func
 
+    @functools.wraps(func)
+    def timed(*args, **kwargs):
+        with TOOL_DURATION.time(tool=t.name, outcome="exception") as labels:
+            with tracing.span(f"tool {t.name}", {"calbot.tool.name": t.name, "calbot.tool.args": kwargs or args}) as span:
+                result = func(*args, **kwargs)
+                # Tools report failures as "❌ ..."/"Error ..." strings rather than raising
+                labels["outcome"] = "error" if str(result).startswith(("❌", "Error")) else "ok"
+                span.set_attribute("calbot.tool.outcome", labels["outcome"])
+                if labels["outcome"] == "error":
+                    span.set_status("ERROR", str(result)[:200])
+                return result
 
+    t.func = timed
 
 
-def our_agent(state: AgentState) -> AgentState:
+for _t in tools:
+    _instrument_tool(_t)
+
+# Initialize model with tools
+# stream_usage: streamed replies also report token usage, including cached prompt tokens
+model = ChatOpenAI(model="gpt-4o", temperature=0, stream_usage=True).bind_tools(tools)
+
+
+def prompt_context() -> SystemMessage:
+    """The per-turn part of the system prompt.
+
+    Kept out of the static instructions so every request starts with the same
+    bytes (tools, instructions, earlier turns) and the provider's prompt cache
+    can reuse that prefix. Send it just before the user's message.
+    """
     current_datetime_str = datetime.now().strftime('%A, %B %d, %Y at %I:%M %p')
+    return SystemMessage(content=f"""# Context
+- Current time: {current_datetime_str}
+- User email: {USER_EMAIL}
+- User timezone: {USER_TIMEZONE}""")
+
+
+def prompt_usage(response) -> tuple:
+    """(prompt tokens, cached prompt tokens) of a model response; (0, 0) if it has no usage"""
+    usage = getattr(response, "usage_metadata", None) or {}
+    return usage.get("input_tokens", 0), (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+
+
+def record_prompt_usage(response, span=tracing.NOOP_SPAN) -> tuple:
+    """Count a model response's prompt tokens as cached or uncached; returns ``prompt_usage``"""
+    prompt_tokens, cached_tokens = prompt_usage(response)
+    if prompt_tokens:
+        LLM_PROMPT_TOKENS.inc(cached_tokens, cache="hit")
+        LLM_PROMPT_TOKENS.inc(prompt_tokens - cached_tokens, cache="miss")
+        span.set_attribute("llm.usage.input_tokens", prompt_tokens)
+        span.set_attribute("llm.usage.cache_read_input_tokens", cached_tokens)
+    return prompt_tokens, cached_tokens
+
+
+def format_prompt_usage(prompt_tokens: int, cached_tokens: int) -> str:
+    share = cached_tokens / prompt_tokens if prompt_tokens else 0
+    return f"🧮 Prompt tokens: {prompt_tokens:,} ({cached_tokens:,} cached, {share:.0%})"
 
-    system_prompt = SystemMessage(content=f"""
-    You are CalBot, an AI assistant that helps users manage their calendar through Cal.com.
 
-    # Context
-    - Current time: {current_datetime_str}
-    - User email: {USER_EMAIL}
-    - User timezone: {USER_TIMEZONE}
+
+
+
+# Instructions for the CLI agent. Static, so the prompt prefix stays cacheable;
+# the time and user details go in prompt_context()
+CLI_SYSTEM_PROMPT = SystemMessage(content="""
+    You are CalBot, an AI assistant that helps users manage their calendar through Cal.com.
 
     # Booking Workflow
     1. When user requests to book a meeting:
@@ -889,9 +2151,15 @@ def our_agent(state: AgentState) -> AgentState:
         b. Display the results in a clean, readable format
         c. If no events found, suggest booking a new one
 
+    # Availability Over Several Days
+    1. For questions like "what's free this week?" or "next 3 weekdays", call
+       check_availability_range ONCE for the whole range - never check_availability per day
+
 
 """)
 
+
+def our_agent(state: AgentState) -> AgentState:
     if not state["messages"]:
         initial_message = "Hello! I'm CalBot, your calendar assistant. How can I help?"
         return {"messages": [HumanMessage(content=initial_message), AIMessage(content=initial_message)]}
@@ -900,12 +2168,20 @@ def our_agent(state: AgentState) -> AgentState:
     print(f"\n👤 USER: {user_input}")
     user_message = HumanMessage(content=user_input)
 
-    all_messages = [system_prompt] + list(state["messages"]) + [user_message]
-    response = model.invoke(all_messages)
+    # The state keeps every message; the prompt gets the newest turns that fit the budget
+    all_messages = [CLI_SYSTEM_PROMPT, *history.window(state["messages"]), prompt_context(), user_message]
+    with LLM_REQUEST_DURATION.time(mode="invoke", outcome="error") as labels:
+        with tracing.span("model.invoke", {"llm.mode": "invoke", "llm.request.messages": len(all_messages)}) as span:
+            response = model.invoke(all_messages)
+            labels["outcome"] = "ok"
+            usage = record_prompt_usage(response, span)
+    if PROMPT_CACHE_STATS:
+        print(format_prompt_usage(*usage))
 
     print(f"\n🤖 CalBot: {response.content}")
 
-    return {"messages": list(state["messages"]) + [user_message, response]}
+    # add_messages appends these to the state
+    return {"messages": [user_message, response]}
 
 
 
@@ -984,7 +2260,9 @@ def run_calcom_agent():
     state = {"messages": []}
     
     try:
-        for step in app.stream(state, stream_mode="values"):
+        # ToolNode fans a response's tool calls out over a pool of this size
+        config = {"max_concurrency": TOOL_CALL_CONCURRENCY}
+        for step in app.stream(state, config=config, stream_mode="values"):
             if "messages" in step:
                 print_messages(step["messages"])
     except KeyboardInterrupt:
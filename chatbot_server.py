@@ -1,12 +1,18 @@
 # chatbot_server.py
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from pydantic import BaseModel
 from langchain_core.messages import AIMessage, HumanMessage, BaseMessage, SystemMessage, ToolMessage
-from typing import List, Dict
+from typing import List, Dict, Optional
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+import argparse
 import asyncio
+import contextlib
+import functools
+import secrets
 import uvicorn
 import os
 import re
@@ -19,21 +25,66 @@ from datetime import datetime
 from cal import (
     list_event_types,
     check_availability,
+    check_availability_range,
     book_meeting,
     list_scheduled_events,
     cancel_event,
     reschedule_event,
+    event_catalog,
+    calcom,
+    tool_progress,
+    prompt_context,
+    prompt_usage,
+    record_prompt_usage,
+    format_prompt_usage,
+    PROMPT_CACHE_STATS,
     AgentState,
     model,
     tools,
+    TOOL_CALL_CONCURRENCY,
+    TOOL_CALL_TIMEOUT,
     USER_EMAIL,
     USER_TIMEZONE
 )
 
+import metrics
+import tracing
+from sessions import (
+    ConversationContext, Session, SessionStore, create_session_store, SESSION_BACKEND, SESSION_SWEEP_INTERVAL,
+)
+from intents import ROUTER_MIN_CONFIDENCE, WRITE_INTENTS, classify_intent, plan_cache
+from metrics import AGENT_ITERATIONS, AGENT_TURNS, LLM_REQUEST_DURATION, ROUTER_DECISIONS, SESSIONS, WEBSOCKET_CONNECTIONS
+
 
 logging.basicConfig(level=logging.INFO)
 
-app = FastAPI(title="CalBot Web API")
+# Blocking work (the cal.py tools and their Cal.com I/O) runs on this bounded
+# pool so a slow call never stalls the event loop serving other sessions.
+AGENT_MAX_WORKERS = int(os.getenv('AGENT_MAX_WORKERS', '16'))
+agent_executor = ThreadPoolExecutor(max_workers=AGENT_MAX_WORKERS, thread_name_prefix="calbot-agent")
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking call on the agent executor and await its result.
+
+    The call runs in a copy of the caller's context, so its spans join the current trace.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(agent_executor, functools.partial(tracing.wrap(func), *args, **kwargs))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm the event-type catalog without holding up startup
+    warmup = asyncio.create_task(event_catalog.arefresh())
+    sweeper = asyncio.create_task(sweep_sessions())
+    yield
+    warmup.cancel()
+    sweeper.cancel()
+    agent_executor.shutdown(wait=False)
+    calcom.close()
+
+
+app = FastAPI(title="CalBot Web API", lifespan=lifespan)
 templates = Jinja2Templates(directory="templates")
 
 # Create directories if they don't exist
@@ -90,53 +141,88 @@ def execute_tool(tool_call):
         return f"⚠️ Sorry, I encountered an error with {tool_name}. Please try again."
 
 
+# Tools that change the calendar; these run one at a time, in call order
+WRITE_TOOLS = {"book_meeting", "cancel_event", "reschedule_event"}
 
-# this class is set to handle conversation context
-# This will help manage pending actions like bookings, cancellations, etc.
-class ConversationContext:
-    def __init__(self):
-        self.pending_action = None
-        self.pending_data = {}
-        
-    def set_pending_booking(self, event_type_id, date, suggested_time, original_time):
-        self.pending_action = "booking_confirmation"
-        self.pending_data = {
-            "event_type_id": event_type_id,
-            "date": date,
-            "suggested_time": suggested_time,
-            "original_time": original_time
-        }
-    
-    def clear(self):
-        self.pending_action = None
-        self.pending_data = {}
 
+async def execute_tool_calls(tool_calls, emit=None) -> list:
+    """Run one model response's tool calls concurrently.
 
-def handle_smart_booking(user_message: str) -> str:
-    """Handle booking requests with automatic availability checking"""
-    import re
-    
-    # Check if this is a booking request
-    if not "book" in user_message.lower():
-        return None
-    
-    # Extract event type ID with default to 15 min meeting
-    event_type_mapping = {
-        "15 min meeting": 2886675,
-        "30 min meeting": 2886676,
-        "secret meeting": 2886677
-    }
-    
-    event_type_id = 2886675  # Default to 15 min meeting
-    event_type_name = "15 Min Meeting"
-    
-    # Check if user specified a different meeting type
-    for event_name, event_id in event_type_mapping.items():
-        if event_name in user_message.lower():
-            event_type_id = event_id
-            event_type_name = event_name.title()
-            break
-    
+    Parallelism is bounded by TOOL_CALL_CONCURRENCY and each call by
+    TOOL_CALL_TIMEOUT. Calendar writes are serialized in call order; a write
+    that times out keeps the next one waiting until its thread finishes. Results
+    are returned in the same order as tool_calls. If ``emit`` is given it
+    receives tool_start/tool_progress/tool_end frames.
+    """
+    semaphore = asyncio.Semaphore(TOOL_CALL_CONCURRENCY)
+    write_lock = asyncio.Lock()
+
+    async def _run_tool(tool_call):
+        if tool_call["name"] not in WRITE_TOOLS:
+            return await asyncio.wait_for(run_blocking(execute_tool, tool_call), TOOL_CALL_TIMEOUT)
+        # The worker thread can't be stopped, so a write that times out may still
+        # go through. The lock is held until it does, not until the timeout.
+        await write_lock.acquire()
+        task = asyncio.ensure_future(run_blocking(execute_tool, tool_call))
+        task.add_done_callback(lambda _: write_lock.release())
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), TOOL_CALL_TIMEOUT)
+        except asyncio.TimeoutError:
+            logging.error(f"Tool {tool_call['name']} timed out after {TOOL_CALL_TIMEOUT}s; it may still complete")
+            return (f"⏳ {tool_call['name']} is taking longer than expected and may still complete. "
+                    "Don't retry it; check the calendar again in a minute.")
+
+    async def run_one(tool_call):
+        async with semaphore:
+            # Sends of tool_progress frames; drained before tool_end so they
+            # arrive first and a failed send ends the turn like any other
+            progress_sends = []
+            progress_open = True
+            if emit:
+                await emit({"type": "tool_start", "tool": tool_call["name"], "id": tool_call["id"]})
+                # Tools report progress from a worker thread; forward it as frames.
+                # Each run_one is its own task, so this doesn't leak to other calls.
+                loop = asyncio.get_running_loop()
+
+                def on_progress(done, total, message):
+                    # A write that outlived its timeout may still report; tool_end has gone out
+                    if not progress_open:
+                        return
+                    progress_sends.append(asyncio.run_coroutine_threadsafe(emit({
+                        "type": "tool_progress", "tool": tool_call["name"], "id": tool_call["id"],
+                        "done": done, "total": total, "content": message,
+                    }), loop))
+
+                tool_progress.set(on_progress)
+            span_attributes = {
+                "calbot.tool.name": tool_call["name"],
+                "calbot.tool.call_id": tool_call["id"],
+                "calbot.tool.args": tool_call["args"],
+            }
+            try:
+                # A read timeout is recorded on the span as an exception
+                with tracing.span("execute_tool", span_attributes):
+                    return await _run_tool(tool_call)
+            except asyncio.TimeoutError:
+                logging.error(f"Tool {tool_call['name']} timed out after {TOOL_CALL_TIMEOUT}s")
+                return f"⚠️ Sorry, {tool_call['name']} took too long to respond. Please try again."
+            finally:
+                if emit:
+                    progress_open = False
+                    results = await asyncio.gather(
+                        *(asyncio.wrap_future(send) for send in progress_sends), return_exceptions=True
+                    )
+                    failed = next((r for r in results if isinstance(r, BaseException)), None)
+                    if failed is not None:
+                        raise failed
+                    await emit({"type": "tool_end", "tool": tool_call["name"], "id": tool_call["id"]})
+
+    return await asyncio.gather(*(run_one(tool_call) for tool_call in tool_calls))
+
+
+
+def extract_booking_details(user_message: str):
+    """Pull (time, date) out of a booking message; None if no time is given"""
     # Extract time with more flexible patterns
     time_patterns = [
         r'@\s*(\d{1,2}:\d{2}\s*[ap]m)',   # "@ 3:00 PM"
@@ -192,6 +278,28 @@ def handle_smart_booking(user_message: str) -> str:
         else:
             date_str = "tomorrow"  # Default fallback
     
+    return time_str, date_str
+
+
+def handle_smart_booking(user_message: str) -> str:
+    """Handle booking requests with automatic availability checking"""
+    # Check if this is a booking request
+    if not "book" in user_message.lower():
+        return None
+    
+    # Resolve the event type from the catalog, defaulting to the shortest one
+    event_type = event_catalog.find_in_text(user_message) or event_catalog.default()
+    if not event_type:
+        return None  # Catalog unavailable - let the agent handle it
+    
+    event_type_id = event_type["id"]
+    event_type_name = event_type.get("title", "Meeting")
+    
+    details = extract_booking_details(user_message)
+    if not details:
+        return None
+    time_str, date_str = details
+    
     # First check availability
     availability_result = check_availability.invoke({
         "event_type_id": event_type_id,
@@ -218,57 +326,47 @@ def handle_smart_booking(user_message: str) -> str:
     
     # If not available, return the availability result with meeting type info
     if "❌" in availability_result:
-        return f"{availability_result}\n\n📝 Note: This will be a {event_type_name}. If you prefer a 30 Min Meeting or Secret Meeting, please specify."
+        others = [e.get("title", "Meeting") for e in event_catalog.all() if e["id"] != event_type_id]
+        note = f"📝 Note: This will be a {event_type_name}."
+        if others:
+            note += f" If you prefer a {' or '.join(others)}, please specify."
+        return f"{availability_result}\n\n{note}"
     
     return availability_result
 
 
 
 
-# Agent workflow function
-
-def run_agent_workflow(user_message: str, ws: WebSocket = None) -> str:
-    """Run the complete agent workflow with conversation state"""
-    # Handle confirmation responses
-    if ws and ws in manager.contexts:
-        context = manager.contexts[ws]
-        user_msg_lower = user_message.lower().strip()
-        
-        if user_msg_lower in ['yes', 'y', 'sure', 'ok', 'okay', 'confirm']:
-            if context.pending_action == "booking_confirmation":
-                # Execute the pending booking
-                booking_result = book_meeting.invoke({
-                    "event_type_id": context.pending_data["event_type_id"],
-                    "date": context.pending_data["date"],
-                    "time": context.pending_data["suggested_time"],
-                    "attendee_name": USER_EMAIL.split('@')[0],
-                    "attendee_email": USER_EMAIL,
-                    "reason": "Booked via CalBot confirmation"
-                })
-                context.clear()
-                return booking_result
-        elif user_msg_lower in ['no', 'n', 'nope', 'cancel']:
-            if context.pending_action == "booking_confirmation":
-                context.clear()
-                return "❌ Booking cancelled. Would you like to try a different time?"
-        elif user_msg_lower in ['reschedule', 'change time', 'modify']:
-            if context.pending_action == "booking_confirmation":
-                context.clear()
-                return "🔄 Please provide the new date and time for rescheduling."
-    else:
-        context = ConversationContext()
-        if ws:
-            manager.contexts[ws] = context  
-    # Add system prompt
-    current_datetime_str = datetime.now().strftime('%A, %B %d, %Y at %I:%M %p')
-    system_prompt = SystemMessage(content=f"""
+async def invoke_model(messages: list, emit=None, iteration: int = None):
+    """Call the model; with ``emit``, stream its reply as token frames"""
+    mode = "invoke" if emit is None else "stream"
+    with LLM_REQUEST_DURATION.time(mode=mode, outcome="error") as labels:
+        with tracing.span("model.invoke", {
+            "llm.mode": mode,
+            "llm.request.messages": len(messages),
+            "calbot.agent.iteration": iteration,
+        }) as span:
+            if emit is None:
+                response = await model.ainvoke(messages)
+            else:
+                response = None
+                async for chunk in model.astream(messages):
+                    if response is None:
+                        span.add_event("first_chunk")
+                    if chunk.content:
+                        await emit({"type": "token", "content": chunk.content})
+                    response = chunk if response is None else response + chunk
+            labels["outcome"] = "ok"
+            span.set_attribute("llm.response.tool_calls", len(response.tool_calls))
+            record_prompt_usage(response, span)
+    return response
+
+
+# Agent instructions. Byte-for-byte the same on every request, so the provider
+# can cache the prompt prefix; the time and user details go in prompt_context()
+SYSTEM_PROMPT = SystemMessage(content="""
         You are CalBot, an AI assistant that helps users manage their calendar through Cal.com.
 
-        # Context
-        - Current time: {current_datetime_str}
-        - User email: {USER_EMAIL}
-        - User timezone: {USER_TIMEZONE}
-
         # Booking Workflow
         1. When user requests to book a meeting:
             a. If they specify event type, date, and time in one message, proceed directly
@@ -298,6 +396,10 @@ def run_agent_workflow(user_message: str, ws: WebSocket = None) -> str:
             b. Display the results in a clean, readable format
             c. If no events found, suggest booking a new one
 
+        # Availability Over Several Days
+        1. For questions like "what's free this week?" or "next 3 weekdays", call
+           check_availability_range ONCE for the whole range - never check_availability per day
+
         # Important Rules
         - Always use the exact responses from tools - don't modify success/error messages
         - If a tool returns a detailed error, show it to help the user understand
@@ -307,14 +409,148 @@ def run_agent_workflow(user_message: str, ws: WebSocket = None) -> str:
         * event_type_id: find ID for "15 Min Meeting"
         - Don't ask for confirmations when user has already provided complete details
         """)
-    
-    messages = [system_prompt, HumanMessage(content=user_message)]
+
+
+def count_turn(path: str):
+    """Record how a chat turn was answered, in metrics and on the current span"""
+    AGENT_TURNS.inc(path=path)
+    tracing.current_span().set_attribute("calbot.path", path)
+
+
+def describe_tool_call(tool_call: dict) -> str:
+    """A short description of a routed calendar change, for its confirmation question"""
+    args = tool_call["args"]
+    if tool_call["name"] == "cancel_event":
+        when = " ".join(str(args[key]) for key in ("time", "date_reference") if args.get(key))
+        return f"cancel your meeting{' at ' + when if when else ''}"
+    old = " ".join(str(args[key]) for key in ("old_time", "date_reference") if args.get(key))
+    new = " ".join(str(args[key]) for key in ("new_time", "new_date") if args.get(key))
+    return f"move your {old} meeting to {new}"
+
+
+async def route_intent(user_message: str, emit=None, context: ConversationContext = None):
+    """Answer a clear-cut command by calling its tool directly, without the model.
+
+    Returns the tool result, or None when the message should go to smart
+    booking or the agent. Bookings always go to smart booking, which checks
+    availability and offers the closest time. Cancellations and reschedules
+    are only routed in a session: they are held in ``context`` and the
+    user is asked to confirm them first.
+    """
+    # The event-type lookup may have to load the catalog from Cal.com
+    route = await run_blocking(classify_intent, user_message)
+    if route is None:
+        ROUTER_DECISIONS.inc(intent="none", decision="no_match")
+        return None
+    span = tracing.current_span()
+    span.set_attribute("calbot.router.intent", route.intent)
+    span.set_attribute("calbot.router.confidence", route.confidence)
+    if not route.tool:
+        ROUTER_DECISIONS.inc(intent=route.intent, decision="deferred")
+        return None
+    if route.confidence < ROUTER_MIN_CONFIDENCE:
+        ROUTER_DECISIONS.inc(intent=route.intent, decision="low_confidence")
+        return None
+    tool_call = {"name": route.tool, "args": route.args, "id": f"router_{route.intent}"}
+    if route.intent in WRITE_INTENTS:
+        if context is None:
+            # Nowhere to keep the pending change; the model handles it
+            ROUTER_DECISIONS.inc(intent=route.intent, decision="deferred")
+            return None
+        ROUTER_DECISIONS.inc(intent=route.intent, decision="confirm")
+        summary = describe_tool_call(tool_call)
+        context.set_pending_tool_call(tool_call, summary)
+        return f"❓ Just to confirm: {summary}? Reply 'yes' to go ahead or 'no' to leave it."
+    ROUTER_DECISIONS.inc(intent=route.intent, decision="routed")
+    result, = await execute_tool_calls([tool_call], emit)
+    return result
+
+
+# Agent workflow function
+
+async def run_agent_workflow(user_message: str, ws: WebSocket = None, emit=None, session_id: str = None) -> str:
+    """Run the complete agent workflow with conversation state.
+
+    ``emit`` is an optional coroutine function that receives streaming frames
+    (token deltas and tool start/end events) while the turn is running.
+    WebSocket sessions (and /chat requests that pass a ``session_id``) keep a
+    token-budgeted history of earlier turns, which is sent with each model call.
+    """
+    if ws:
+        session = await manager.session(ws)
+    else:
+        session = await manager.store_call("get_or_open", session_id) if session_id else None
+    steps = []  # this turn's tool calls and results, for the history
+    reply = await answer_turn(user_message, session, emit, steps)
+    if session is not None:
+        session.history.add_turn([HumanMessage(content=user_message), *steps, AIMessage(content=reply)])
+        await manager.store_call("save", session)
+        tracing.current_span().set_attribute("calbot.history.tokens", session.history.tokens)
+    return reply
+
+
+async def answer_turn(user_message: str, session: Session, emit, steps: list) -> str:
+    """Answer one message; model tool calls and their results are appended to ``steps``"""
+    history = session.history if session else None
+    # Handle confirmation responses
+    if session:
+        context = session.context
+        user_msg_lower = user_message.lower().strip()
+        
+        if user_msg_lower in ['yes', 'y', 'sure', 'ok', 'okay', 'confirm']:
+            if context.pending_action == "booking_confirmation":
+                # Execute the pending booking
+                booking_result = await run_blocking(book_meeting.invoke, {
+                    "event_type_id": context.pending_data["event_type_id"],
+                    "date": context.pending_data["date"],
+                    "time": context.pending_data["suggested_time"],
+                    "attendee_name": USER_EMAIL.split('@')[0],
+                    "attendee_email": USER_EMAIL,
+                    "reason": "Booked via CalBot confirmation"
+                })
+                context.clear()
+                count_turn("confirmation")
+                return booking_result
+            if context.pending_action == "tool_confirmation":
+                tool_call = context.pending_data["tool_call"]
+                context.clear()
+                count_turn("confirmation")
+                result, = await execute_tool_calls([tool_call], emit)
+                return result
+        elif user_msg_lower in ['no', 'n', 'nope', 'cancel']:
+            if context.pending_action == "booking_confirmation":
+                context.clear()
+                count_turn("confirmation")
+                return "❌ Booking cancelled. Would you like to try a different time?"
+            if context.pending_action == "tool_confirmation":
+                context.clear()
+                count_turn("confirmation")
+                return "👍 Okay, I've left your calendar as it is."
+        elif user_msg_lower in ['reschedule', 'change time', 'modify']:
+            if context.pending_action == "booking_confirmation":
+                context.clear()
+                count_turn("confirmation")
+                return "🔄 Please provide the new date and time for rescheduling."
+        if context.pending_action == "tool_confirmation":
+            # Anything but yes/no moves on; don't leave the change waiting for a later "yes"
+            context.clear()
+    else:
+        context = ConversationContext()
+
+    messages = [SYSTEM_PROMPT, *(history.messages() if history else []), prompt_context(),
+                HumanMessage(content=user_message)]
+
+    # Common commands with every detail spelled out skip the model entirely
+    routed_result = await route_intent(user_message, emit, context if session else None)
+    if routed_result is not None:
+        count_turn("router")
+        return routed_result
 
     # Try smart booking first for simple booking requests
-    smart_booking_result = handle_smart_booking(user_message)
+    smart_booking_result = await run_blocking(handle_smart_booking, user_message)
     if smart_booking_result:
         # Check if this is a booking confirmation setup
-        if ws and "Would you like to book" in smart_booking_result and "instead?" in smart_booking_result:
+        if session and "Would you like to book" in smart_booking_result and "instead?" in smart_booking_result:
             # Extract booking details for context
             if "book" in user_message.lower():
                 import re
@@ -326,46 +562,68 @@ def run_agent_workflow(user_message: str, ws: WebSocket = None) -> str:
                     if suggested_match:
                         suggested_time = suggested_match.group(1)
                         date_str = "tomorrow" if "tomorrow" in user_message.lower() else "today"
+                        event_type = event_catalog.find_in_text(user_message) or event_catalog.default()
                         
-                        manager.contexts[ws].set_pending_booking(
-                            event_type_id=2886675,  # Default 15 min meeting
+                        context.set_pending_booking(
+                            event_type_id=event_type["id"],
                             date=date_str,
                             suggested_time=suggested_time,
                             original_time=original_time
                         )
         
+        count_turn("smart_booking")
         return smart_booking_result
     # If no smart booking, continue with the agent graph
 
     max_iterations = 5
     iteration = 0
-    
-    while iteration < max_iterations:
-        iteration += 1
-        
-        response = model.invoke(messages)
-        messages.append(response)
+    prompt_tokens = cached_tokens = 0
+    count_turn("agent")
+    try:
+        while iteration < max_iterations:
+            iteration += 1
+
+            # A repeat of a read-only request reuses the model's first plan;
+            # the tools still run, so the answer reflects the calendar now.
+            # Plans are only shared between turns without earlier context.
+            use_plan_cache = iteration == 1 and not history
+            cached_plan = plan_cache.get(user_message) if use_plan_cache else None
+            if cached_plan:
+                tracing.current_span().set_attribute("calbot.plan_cache", "hit")
+                response = AIMessage(content="", tool_calls=cached_plan)
+            else:
+                response = await invoke_model(messages, emit, iteration=iteration)
+                call_prompt_tokens, call_cached_tokens = prompt_usage(response)
+                prompt_tokens += call_prompt_tokens
+                cached_tokens += call_cached_tokens
+                if use_plan_cache:
+                    plan_cache.put(user_message, response.tool_calls)
+            messages.append(response)
         
-        if response.tool_calls:
-            for tool_call in response.tool_calls:
-                tool_result = execute_tool(tool_call)
-                
-                if (tool_call["name"] == "reschedule_event" and 
-                    ("✅ Reschedule completed successfully" in tool_result or 
-                     "⚠️ Reschedule partially completed" in tool_result)):
-                    return tool_result
-                
-                tool_message = ToolMessage(
-                    content=str(tool_result),
-                    tool_call_id=tool_call["id"]
-                )
-                messages.append(tool_message)
+            if response.tool_calls:
+                tool_results = await execute_tool_calls(response.tool_calls, emit)
+                tool_messages = [
+                    ToolMessage(content=str(tool_result), tool_call_id=tool_call["id"])
+                    for tool_call, tool_result in zip(response.tool_calls, tool_results)
+                ]
+                messages.extend(tool_messages)
+                steps.extend([response, *tool_messages])
+                for tool_call, tool_result in zip(response.tool_calls, tool_results):
+                    if (tool_call["name"] == "reschedule_event" and 
+                        ("✅ Reschedule completed successfully" in tool_result or 
+                         "⚠️ Reschedule partially completed" in tool_result)):
+                        return tool_result
             
-            continue
-        else:
-            return response.content
+                continue
+            else:
+                return response.content
     
-    return "I apologize, but I wasn't able to complete your request. Please try again."
+        return "I apologize, but I wasn't able to complete your request. Please try again."
+    finally:
+        AGENT_ITERATIONS.observe(iteration)
+        tracing.current_span().set_attribute("calbot.agent.iterations", iteration)
+        if PROMPT_CACHE_STATS:
+            logging.info(f"{format_prompt_usage(prompt_tokens, cached_tokens)} over {iteration} model call(s)")
 
 
 
@@ -373,82 +631,154 @@ def run_agent_workflow(user_message: str, ws: WebSocket = None) -> str:
 # ---------- REST endpoints ----------
 class ChatRequest(BaseModel):
     message: str
+    # Optional: continue a conversation (history, pending confirmation) across requests
+    session_id: Optional[str] = None
 
 @app.post("/chat")
 async def chat_endpoint(req: ChatRequest):
     """
     REST endpoint: POST /chat  {"message": "book a meeting tomorrow 2pm"}
+
+    Pass "session_id" (16-64 letters, digits, "-" or "_") to keep a
+    conversation going across requests, e.g. to answer "yes" to a suggested time.
     """
+    if req.session_id is not None and not valid_session_id(req.session_id):
+        raise HTTPException(status_code=400, detail="session_id must be 16-64 letters, digits, '-' or '_'")
     try:
-        reply = run_agent_workflow(req.message)
+        with tracing.span("POST /chat", {"calbot.transport": "rest", "calbot.message.length": len(req.message)},
+                          kind="SERVER"):
+            reply = await run_agent_workflow(req.message, session_id=req.session_id)
+        if req.session_id:
+            return {"reply": reply, "session_id": req.session_id}
         return {"reply": reply}
     except Exception as e:
         logging.error(f"Error in chat endpoint: {str(e)}")
         return {"reply": f"Sorry, I encountered an error: {str(e)}"}
 
 # ---------- WebSocket real-time chat ----------
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-        self.conversation_states: Dict[WebSocket, List[BaseMessage]] = {}
-        self.contexts: Dict[WebSocket, ConversationContext] = {}  # Add this line
+SESSION_ID_RE = re.compile(r'[A-Za-z0-9_-]{16,64}')
+
+
+def valid_session_id(session_id: str) -> bool:
+    return bool(SESSION_ID_RE.fullmatch(session_id))
+
 
-    async def connect(self, ws: WebSocket):
+class ConnectionManager:
+    """Open WebSocket connections, each with its own session in ``sessions``"""
+
+    def __init__(self, sessions: SessionStore):
+        self.active_connections: Dict[WebSocket, str] = {}  # connection -> session id
+        self.sessions = sessions
+
+    async def store_call(self, method: str, *args):
+        """Call a session-store method; shared backends block on I/O, so they run on the agent executor"""
+        func = getattr(self.sessions, method)
+        if self.sessions.blocking:
+            return await run_blocking(func, *args)
+        return func(*args)
+
+    async def connect(self, ws: WebSocket, session_id: str = None) -> str:
+        """Accept the connection and attach a session: the client's earlier one
+        if ``session_id`` names a live session, otherwise a new one"""
         await ws.accept()
-        self.active_connections.append(ws)
-        self.conversation_states[ws] = []
-        self.contexts[ws] = ConversationContext()  # Add this line
+        if session_id and valid_session_id(session_id) and await self.store_call("get", session_id):
+            logging.info(f"Resuming session {session_id[:8]}")
+        else:
+            session_id = secrets.token_hex(16)
+            await self.store_call("open", session_id)
+        self.active_connections[ws] = session_id
+        return session_id
 
     async def disconnect(self, ws: WebSocket):
-        if ws in self.active_connections:
-            self.active_connections.remove(ws)
-        if ws in self.conversation_states:
-            del self.conversation_states[ws]
-        if ws in self.contexts:  # Add this block
-            del self.contexts[ws]
+        """Forget a connection; its session stays resumable if it has history
+        or a pending confirmation. Safe to call more than once."""
+        session_id = self.active_connections.pop(ws, None)
+        if session_id is not None:
+            await self.store_call("release", session_id)
+
+    async def session(self, ws: WebSocket) -> Session:
+        """The connection's session; a new one if it expired while the connection sat idle"""
+        return await self.store_call("get_or_open", self.active_connections[ws])
 
     async def send_message(self, message: str, ws: WebSocket):
-        """Send a message to a specific WebSocket connection"""
+        """Send a message to a specific WebSocket connection.
+
+        A failed send means the client is gone: the connection is dropped and
+        WebSocketDisconnect is raised, ending the turn that was sending.
+        """
         try:
             await ws.send_text(message)
         except Exception as e:
             logging.error(f"Error sending message: {str(e)}")
             await self.disconnect(ws)
+            raise WebSocketDisconnect(code=1006) from e
+
+    async def send_frame(self, frame: dict, ws: WebSocket):
+        """Send a typed JSON frame (token, tool_start, tool_end, message, error)"""
+        await self.send_message(json.dumps(frame), ws)
 
     async def broadcast(self, message: str):
         """Send a message to all active connections"""
-        for connection in self.active_connections:
-            await self.send_message(message, connection)
+        for connection in list(self.active_connections):
+            with contextlib.suppress(WebSocketDisconnect):
+                await self.send_message(message, connection)
+
 
+manager = ConnectionManager(create_session_store())
+WEBSOCKET_CONNECTIONS.set_function(lambda: len(manager.active_connections))
+SESSIONS.set_function(lambda: manager.sessions.size)
 
 
+async def sweep_sessions():
+    """Expire idle sessions (and recount the shared stores) in the background"""
+    while True:
+        try:
+            expired = await manager.store_call("sweep")
+        except Exception as e:
+            logging.error(f"Session sweep failed: {e}")
+        else:
+            if expired:
+                logging.info(f"Expired {expired} idle session(s); {manager.sessions.size} remain")
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL)
 
-manager = ConnectionManager()
 
 @app.websocket("/ws")
-async def websocket_chat(ws: WebSocket):
-    await manager.connect(ws)
+async def websocket_chat(ws: WebSocket, session: str = None):
+    # ?session=<id> resumes an earlier session, e.g. after a reconnect that landed on another worker
+    session_id = await manager.connect(ws, session)
     try:
+        await manager.send_frame({"type": "session", "id": session_id}, ws)
         # Send greeting only once when connection is established
-        await manager.send_message(
-            "Hello! I'm CalBot, your calendar assistant. How can I help you today?",
-            ws
-        )
+        await manager.send_frame({
+            "type": "message",
+            "content": "Hello! I'm CalBot, your calendar assistant. How can I help you today?"
+        }, ws)
+        
+        async def emit(frame: dict):
+            await manager.send_frame(frame, ws)
         
         while True:
             data = await ws.receive_text()
             logging.info(f"Received: {data}")
             
             try:
-                reply = run_agent_workflow(data, ws)
-                await manager.send_message(reply, ws)
+                # One trace per message; the root span covers sending the reply
+                with tracing.span("ws.message", {"calbot.transport": "websocket", "calbot.message.length": len(data)},
+                                  kind="SERVER"):
+                    reply = await run_agent_workflow(data, ws, emit=emit)
+                    await manager.send_frame({"type": "message", "content": reply}, ws)
                 
+            except WebSocketDisconnect:
+                raise
             except Exception as e:
                 error_msg = "❌ Sorry, I encountered an error. Please try again."
-                await manager.send_message(error_msg, ws)
+                await manager.send_frame({"type": "error", "content": error_msg}, ws)
                 logging.error(f"WebSocket error: {str(e)}")
                 
     except WebSocketDisconnect:
+        pass
+    finally:
+        # Also runs when receiving fails some other way, so no session outlives its socket
         await manager.disconnect(ws)
 
 
@@ -463,6 +793,11 @@ async def home(request: Request):
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+# Prometheus scrape endpoint
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # ---------- Static files ----------
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -478,10 +813,29 @@ if __name__ == "__main__":
         print("Please add OPENAI_API_KEY=your_api_key to your .env file")
         exit(1)
     
+    parser = argparse.ArgumentParser(description="Run the CalBot web server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.getenv('WEB_CONCURRENCY', '1')),
+                        help="worker processes (production); default WEB_CONCURRENCY or 1")
+    parser.add_argument("--reload", dest="reload", action="store_true",
+                        help="restart on code changes (development); on by default with one worker")
+    parser.add_argument("--no-reload", dest="reload", action="store_false", help="don't restart on code changes")
+    parser.set_defaults(reload=None)
+    args = parser.parse_args()
+    reload = args.workers == 1 if args.reload is None else args.reload
+    if reload and args.workers > 1:
+        parser.error("--reload only works with a single worker")
+    if args.workers > 1 and SESSION_BACKEND == "memory":
+        print(f"⚠️ {args.workers} workers with SESSION_BACKEND=memory: a reply that reaches another worker "
+              "won't see its session. Set SESSION_BACKEND=sqlite or redis.")
+
     print("\n🗓️  ===== CALBOT WEB SERVER =====")
-    print("🌐 Starting web server on http://localhost:8000")
-    print("💡 Open your browser and navigate to http://localhost:8000")
+    print(f"🌐 Starting web server on http://localhost:{args.port}"
+          f" ({args.workers} worker{'s' if args.workers > 1 else ''}, reload {'on' if reload else 'off'})")
+    print(f"💡 Open your browser and navigate to http://localhost:{args.port}")
     print("📝 You can also use the REST API at POST /chat")
     print("=" * 50)
     
-    uvicorn.run("chatbot_server:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run("chatbot_server:app", host=args.host, port=args.port, reload=reload,
+                workers=None if reload else args.workers)
\ No newline at end of file
@@ -0,0 +1,193 @@
+# history.py
+"""Token-budgeted conversation history.
+
+The web server keeps one ConversationHistory per WebSocket session, so
+follow-ups such as "cancel the second one" or "make it 4pm instead" have
+the earlier turns as context. Whole turns are kept, never split, so a
+tool call always stays next to its result. When the budget is exceeded
+the oldest turns are folded into a short running summary. Tool output
+stored in the history is capped.
+
+Token counts are estimated from message length, so trimming never adds a
+tokenizer or model call to a turn.
+"""
+import json
+import os
+from collections import deque
+
+from langchain_core.messages import (
+    AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage, messages_from_dict, messages_to_dict,
+)
+
+HISTORY_TOKEN_BUDGET = int(os.getenv('HISTORY_TOKEN_BUDGET', '2000'))
+HISTORY_SUMMARY_TOKENS = int(os.getenv('HISTORY_SUMMARY_TOKENS', '300'))
+TOOL_OUTPUT_MAX_CHARS = int(os.getenv('TOOL_OUTPUT_MAX_CHARS', '1500'))
+
+# Rough characters per token for English text with OpenAI tokenizers
+CHARS_PER_TOKEN = 4
+# Per-message overhead (role and separators) in the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+SUMMARY_LINE_CHARS = 120
+
+
+def estimate_tokens(message: BaseMessage) -> int:
+    chars = len(message.content) if isinstance(message.content, str) else len(json.dumps(message.content))
+    if isinstance(message, AIMessage) and message.tool_calls:
+        chars += len(json.dumps([[call["name"], call["args"]] for call in message.tool_calls], default=str))
+    return chars // CHARS_PER_TOKEN + MESSAGE_OVERHEAD_TOKENS
+
+
+def cap_tool_output(message: BaseMessage, max_chars: int = TOOL_OUTPUT_MAX_CHARS) -> BaseMessage:
+    """A copy of a ToolMessage cut to ``max_chars``; other messages are returned as-is"""
+    if not isinstance(message, ToolMessage) or len(message.content) <= max_chars:
+        return message
+    dropped = len(message.content) - max_chars
+    return ToolMessage(
+        content=f"{message.content[:max_chars]}\n… ({dropped} more characters not shown)",
+        tool_call_id=message.tool_call_id,
+    )
+
+
+def _compact(message: BaseMessage, max_chars: int = TOOL_OUTPUT_MAX_CHARS) -> BaseMessage:
+    """The parts of a message the next prompt needs: capped tool output, and
+    model replies (including streamed chunks) without their response metadata"""
+    if isinstance(message, AIMessage):
+        return AIMessage(content=message.content, tool_calls=message.tool_calls)
+    return cap_tool_output(message, max_chars)
+
+
+def _clip(text: str, limit: int = SUMMARY_LINE_CHARS) -> str:
+    text = " ".join(str(text).split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def summarize_turn(turn: list) -> str:
+    """One line for a turn: what the user asked, which tools ran and how CalBot answered"""
+    asked = next((m.content for m in turn if isinstance(m, HumanMessage)), "")
+    tools = [call["name"] for m in turn if isinstance(m, AIMessage) for call in m.tool_calls]
+    answer = next((m.content for m in reversed(turn) if isinstance(m, AIMessage) and m.content), "")
+    line = f"- User: {_clip(asked)}"
+    if tools:
+        line += f" [tools: {', '.join(dict.fromkeys(tools))}]"
+    first_line = next((text for text in answer.splitlines() if text.strip()), "")
+    if first_line:
+        line += f" → CalBot: {_clip(first_line)}"
+    return line
+
+
+def _summary_message(lines) -> SystemMessage:
+    return SystemMessage(content="Summary of earlier turns in this conversation (oldest first):\n" + "\n".join(lines))
+
+
+def split_turns(messages) -> list:
+    """Group messages into turns, each starting at a HumanMessage"""
+    turns = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def window(messages, token_budget: int = HISTORY_TOKEN_BUDGET,
+           summary_tokens: int = HISTORY_SUMMARY_TOKENS) -> list:
+    """The newest whole turns of ``messages`` that fit ``token_budget``, with tool
+    output capped, after a summary of the turns that didn't fit.
+
+    Stateless counterpart of ConversationHistory, for callers that keep the
+    full message list themselves (the CLI graph).
+    """
+    turns = [[cap_tool_output(m) for m in turn] for turn in split_turns(messages)]
+    kept, used = [], 0
+    while turns:
+        cost = sum(estimate_tokens(m) for m in turns[-1])
+        if kept and used + cost > token_budget:
+            break
+        kept.insert(0, turns.pop())
+        used += cost
+    lines, summary_used = [], 0
+    for turn in reversed(turns):
+        line = summarize_turn(turn)
+        summary_used += len(line) // CHARS_PER_TOKEN + 1
+        if summary_used > summary_tokens:
+            break
+        lines.insert(0, line)
+    prefix = [_summary_message(lines)] if lines else []
+    return prefix + [m for turn in kept for m in turn]
+
+
+class ConversationHistory:
+    """One session's recent turns within a token budget, plus a summary of older ones.
+
+    The newest turn is always kept, even on its own over budget, so the
+    model sees what it just did.
+    """
+    __slots__ = ("token_budget", "summary_tokens", "tool_output_chars",
+                 "_turns", "_tokens", "_summary", "_summary_tokens")
+
+    def __init__(self, token_budget: int = HISTORY_TOKEN_BUDGET,
+                 summary_tokens: int = HISTORY_SUMMARY_TOKENS,
+                 tool_output_chars: int = TOOL_OUTPUT_MAX_CHARS):
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.tool_output_chars = tool_output_chars
+        self._turns = deque()  # (messages, estimated tokens)
+        self._tokens = 0
+        self._summary = deque()  # (line, estimated tokens)
+        self._summary_tokens = 0
+
+    def __len__(self) -> int:
+        return len(self._turns)
+
+    @property
+    def tokens(self) -> int:
+        """Estimated tokens that ``messages()`` adds to a prompt"""
+        return self._tokens + self._summary_tokens
+
+    def messages(self) -> list:
+        """The history as prompt messages: the summary (if any), then the kept turns"""
+        prefix = [_summary_message(line for line, _ in self._summary)] if self._summary else []
+        return prefix + [m for turn, _ in self._turns for m in turn]
+
+    def add_turn(self, messages: list):
+        """Record a finished turn (user message, tool calls and results, reply)"""
+        turn = [_compact(m, self.tool_output_chars) for m in messages]
+        cost = sum(estimate_tokens(m) for m in turn)
+        self._turns.append((turn, cost))
+        self._tokens += cost
+        while self._tokens > self.token_budget and len(self._turns) > 1:
+            old_turn, old_cost = self._turns.popleft()
+            self._tokens -= old_cost
+            self._summarize(old_turn)
+
+    def _summarize(self, turn: list):
+        line = summarize_turn(turn)
+        cost = len(line) // CHARS_PER_TOKEN + 1
+        self._summary.append((line, cost))
+        self._summary_tokens += cost
+        while self._summary_tokens > self.summary_tokens and len(self._summary) > 1:
+            _, dropped = self._summary.popleft()
+            self._summary_tokens -= dropped
+
+    def to_dict(self) -> dict:
+        """JSON-safe form, for session backends that store history outside this process"""
+        return {
+            "turns": [messages_to_dict(turn) for turn, _ in self._turns],
+            "summary": [line for line, _ in self._summary],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ConversationHistory":
+        history = cls()
+        for line in data.get("summary", []):
+            cost = len(line) // CHARS_PER_TOKEN + 1
+            history._summary.append((line, cost))
+            history._summary_tokens += cost
+        for turn in data.get("turns", []):
+            history.add_turn(messages_from_dict(turn))
+        return history
+
+    def clear(self):
+        self._turns.clear()
+        self._summary.clear()
+        self._tokens = self._summary_tokens = 0
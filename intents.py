@@ -0,0 +1,317 @@
+# intents.py
+"""Shortcuts past the model for common calendar commands.
+
+classify_intent() matches a message against compiled patterns for the
+book, list, cancel, reschedule and availability intents. It extracts the
+tool arguments and scores its confidence. chatbot_server calls the tool
+directly when the score reaches ROUTER_MIN_CONFIDENCE and otherwise falls
+back to the LLM. The router only acts when a message is unambiguous, so
+the scores lean conservative. Cancel and reschedule routes change the
+calendar, so chatbot_server asks the user to confirm them first
+(WRITE_INTENTS).
+
+PlanCache remembers which read-only tool calls the model chose for a
+message, so a repeat of the same request on the same day skips the
+model's first round trip.
+"""
+import copy
+import os
+import re
+import string
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+from cal import event_catalog, parse_date_flexible, parse_date_range
+
+from metrics import PLAN_CACHE_REQUESTS
+
+ROUTER_MIN_CONFIDENCE = float(os.getenv('ROUTER_MIN_CONFIDENCE', '0.8'))
+PLAN_CACHE_TTL = float(os.getenv('PLAN_CACHE_TTL', '600'))
+PLAN_CACHE_SIZE = int(os.getenv('PLAN_CACHE_SIZE', '512'))
+
+_WEEKDAY_NAMES = r'(?:monday|tuesday|wednesday|thursday|friday|saturday|sunday)'
+_MONTH_NAMES = (r'(?:january|february|march|april|may|june|july|august|september|october|november|december'
+                r'|jan|feb|mar|apr|jun|jul|aug|sep|oct|nov|dec)')
+
+_TIME_RE = re.compile(
+    r'(?<![\d/:-])(\d{1,2}(?::\d{2})?\s*(?:am|pm)|\d{1,2}:\d{2}|noon)(?![\d/])'
+    r'|\b(?:at|@)\s*(\d{1,2})\b(?![:/\d])'
+)
+_DATE_RE = re.compile(
+    r'\b(day after tomorrow|today|tonight|tomorrow'
+    r'|(?:this|next|last) ' + _WEEKDAY_NAMES +
+    r'|(?:on )?' + _WEEKDAY_NAMES +
+    r'|\d{1,2}/\d{1,2}(?:/\d{2,4})?|\d{4}-\d{1,2}-\d{1,2}'
+    r'|' + _MONTH_NAMES + r' \d{1,2}(?:st|nd|rd|th)?(?:,? \d{4})?'
+    r'|\d{1,2}(?:st|nd|rd|th)? ' + _MONTH_NAMES + r'(?:,? \d{4})?)\b'
+)
+_RANGE_RE = re.compile(
+    r'\b((?:this|next) week(?:end)?|weekend|rest of the week'
+    r'|next (?:\d+|two|three|four|five|six|seven|ten|fourteen) (?:weekdays?|business days?|working days?|days?)'
+    r'|' + _WEEKDAY_NAMES + r' (?:to|through|thru|until|-) ' + _WEEKDAY_NAMES + r')\b'
+)
+
+# Keyword patterns per intent; each one that matches adds to that intent's score
+_INTENT_PATTERNS = {
+    "book": [re.compile(r'\b(?:book|schedule (?:a|an|me)|set up|arrange)\b')],
+    "cancel": [re.compile(r'\b(?:cancel|delete|remove|call off)\b')],
+    "reschedule": [
+        re.compile(r'\b(?:reschedule|move|shift|push|change)\b'),
+        re.compile(r'\bto\b'),
+    ],
+    "list": [
+        re.compile(r'\b(?:show|list|see|view|what(?:\'s| is| are)?|do i have|display)\b'),
+        re.compile(r'\b(?:meetings?|events?|schedule|calendar|appointments?|bookings?|agenda)\b'),
+    ],
+    "availability": [
+        re.compile(r'\b(?:free|available|availability|open slots?|openings?)\b'),
+    ],
+}
+
+# Phrasings the router shouldn't guess at: questions about specific people,
+# recurring meetings, or several actions in one message
+_COMPLEX_RE = re.compile(r'\b(?:every|recurring|weekly|daily|with \w+|and then|also|all my|each)\b')
+
+# Separates the meeting being moved from where it's going
+_RESCHEDULE_SPLIT_RE = re.compile(r'\b(?:to|until|till)\b')
+
+# Negations and questions about an action ("don't cancel...", "should I move...?")
+# aren't requests to do it
+_NOT_A_COMMAND_RE = re.compile(
+    r"\b(?:don'?t|do not|doesn'?t|not|never|no need|should|shall|would it|what if|whether|why|how about)\b|\?"
+)
+
+# Intents whose tools change the calendar
+WRITE_INTENTS = {"cancel", "reschedule"}
+
+
+@dataclass
+class Route:
+    intent: str
+    confidence: float
+    tool: Optional[str] = None
+    args: dict = field(default_factory=dict)
+
+
+def _times(text: str) -> list:
+    found = []
+    for match in _TIME_RE.finditer(text):
+        value = match.group(1) or match.group(2)
+        found.append((match.start(), "12pm" if value == "noon" else value.replace(" ", "")))
+    return found
+
+
+def _dates(text: str) -> tuple:
+    """([(position, date phrase the tools accept)], whether some date-like text didn't parse)"""
+    found, unparsed = [], False
+    for match in _DATE_RE.finditer(text):
+        phrase = match.group(1)
+        if phrase.startswith("on "):
+            phrase = phrase[3:]
+        if phrase == "tonight":
+            phrase = "today"
+        elif re.fullmatch(_WEEKDAY_NAMES, phrase):
+            phrase = f"this {phrase}"
+        try:
+            parse_date_flexible(phrase)
+        except ValueError:
+            unparsed = True
+            continue
+        found.append((match.start(), phrase))
+    return found, unparsed
+
+
+def _event_type_id(text: str) -> Optional[int]:
+    event_type = event_catalog.find_in_text(text) or event_catalog.default()
+    return event_type["id"] if event_type else None
+
+
+def _score(intent: str, text: str) -> float:
+    hits = sum(1 for pattern in _INTENT_PATTERNS[intent] if pattern.search(text))
+    return hits / len(_INTENT_PATTERNS[intent])
+
+
+def classify_intent(message: str) -> Optional[Route]:
+    """Best-matching intent with its tool call and a 0-1 confidence, or None if nothing matches"""
+    text = " ".join(message.lower().split())
+    scores = {intent: _score(intent, text) for intent in _INTENT_PATTERNS}
+    # "cancel"/"book" are verbs about a meeting; "list" also matches most messages
+    # that mention a meeting, so it only wins when no action verb is present
+    actions = {intent: score for intent, score in scores.items() if score and intent != "list"}
+    if actions:
+        intent = max(actions, key=actions.get)
+    elif scores["list"] == 1:
+        intent = "list"
+    else:
+        return None
+
+    times = _times(text)
+    dates, unparsed_date = _dates(text)
+    confidence = 0.95
+    if len([i for i in actions if actions[i] >= 0.5]) > 1 and intent != "reschedule":
+        confidence -= 0.4  # e.g. "cancel my 2pm and book 3pm"
+    if _COMPLEX_RE.search(text) or len(text.split()) > 20:
+        confidence -= 0.3
+    if unparsed_date:
+        confidence -= 0.4
+    if intent in WRITE_INTENTS and _NOT_A_COMMAND_RE.search(text):
+        confidence -= 0.6
+
+    if intent == "book":
+        # Booking keeps its own path (availability check, then book or offer the closest time)
+        if not times:
+            confidence -= 0.4
+        return Route("book", round(confidence, 2))
+
+    if intent == "list":
+        if dates or times or _RANGE_RE.search(text):
+            # list_scheduled_events can't filter by day; the model can narrow the list down
+            confidence -= 0.3
+        return Route("list", round(confidence, 2), "list_scheduled_events", {})
+
+    if intent == "cancel":
+        args = {}
+        if times:
+            args["time"] = times[0][1]
+        if dates:
+            args["date_reference"] = dates[0][1]
+        elif "this week" in text:
+            args["date_reference"] = "this week"
+        if not times and not args.get("date_reference"):
+            confidence -= 0.5  # "cancel my meeting": which one?
+        elif len(times) > 1 or len(dates) > 1:
+            confidence -= 0.4
+        if re.search(r'\bconfirm(?:ed)?\b', text):
+            args["confirm"] = True
+        return Route("cancel", round(confidence, 2), "cancel_event", args)
+
+    if intent == "reschedule":
+        if len(times) != 2 or scores["reschedule"] < 1:
+            return Route("reschedule", round(confidence - 0.5, 2))
+        (old_at, old_time), (new_at, new_time) = times
+        args = {"old_time": old_time, "new_time": new_time}
+        # The old meeting is described before "to"/"until", the new time after it
+        split = _RESCHEDULE_SPLIT_RE.search(text, old_at, new_at + 1)
+        if split is None:
+            return Route("reschedule", round(confidence - 0.5, 2))
+        old_dates = [phrase for at, phrase in dates if at < split.start()]
+        new_dates = [phrase for at, phrase in dates if at >= split.end()]
+        if len(old_dates) == 1:
+            args["date_reference"] = old_dates[0]
+        else:
+            # reschedule_event defaults to tomorrow; with no old date, or
+            # several, let the model decide which meeting is meant
+            confidence -= 0.3 if not old_dates else 0.4
+        if new_dates:
+            args["new_date"] = new_dates[0]
+            if len(new_dates) > 1:
+                confidence -= 0.4
+        return Route("reschedule", round(confidence, 2), "reschedule_event", args)
+
+    # availability
+    event_type_id = _event_type_id(text)
+    if event_type_id is None:
+        return Route("availability", round(confidence - 0.5, 2))
+    span = _RANGE_RE.search(text)
+    if span:
+        try:
+            parse_date_range(span.group(1))
+        except ValueError:
+            confidence -= 0.5
+        return Route("availability", round(confidence, 2), "check_availability_range",
+                     {"event_type_id": event_type_id, "dates": span.group(1)})
+    args = {"event_type_id": event_type_id, "date": dates[0][1] if dates else "today"}
+    if not dates:
+        confidence -= 0.2
+    if times:
+        args["requested_time"] = times[0][1]
+    return Route("availability", round(confidence, 2), "check_availability", args)
+
+
+# Plans made only of these tools are cached; they read the calendar without changing it
+PLAN_CACHE_TOOLS = {"list_event_types", "list_scheduled_events", "check_availability", "check_availability_range"}
+
+# Kept in canonical messages since they change what a date or time means
+_KEEP_PUNCTUATION = ":/-@"
+_STRIP_PUNCTUATION = str.maketrans("", "", "".join(c for c in string.punctuation if c not in _KEEP_PUNCTUATION))
+_FILLER_RE = re.compile(r'^(?:(?:hi|hey|hello|please|pls|calbot|can you|could you|would you|kindly)\s+)+|\s+(?:please|pls|thanks|thank you)$')
+
+
+def canonical_message(message: str) -> str:
+    """Lower-case the message and drop punctuation, extra spaces and greetings/pleasantries"""
+    text = " ".join(message.lower().translate(_STRIP_PUNCTUATION).split())
+    return _FILLER_RE.sub("", text)
+
+
+class PlanCache:
+    """TTL + LRU cache of the model's first tool-call plan for a message.
+
+    Keyed by the canonical message and the current date, since plans for
+    "today" or "this week" may carry dates the model resolved. Only the
+    tool names and arguments are stored, never their results, and only
+    plans whose tools are all in PLAN_CACHE_TOOLS.
+    """
+
+    def __init__(self, ttl: float = PLAN_CACHE_TTL, maxsize: int = PLAN_CACHE_SIZE,
+                 clock=time.monotonic, today=lambda: datetime.now().date()):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._clock = clock
+        self._today = today
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, message: str):
+        return (canonical_message(message), self._today())
+
+    def get(self, message: str) -> Optional[list]:
+        """Fresh copies of the cached tool calls (with new ids), or None"""
+        if self.maxsize <= 0:
+            return None
+        key = self._key(message)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, plan = entry
+                if expires_at > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    PLAN_CACHE_REQUESTS.inc(result="hit")
+                    return [
+                        {"name": name, "args": copy.deepcopy(args), "id": f"cached_{i}_{time.time_ns()}"}
+                        for i, (name, args) in enumerate(plan)
+                    ]
+                del self._entries[key]
+            self.misses += 1
+            PLAN_CACHE_REQUESTS.inc(result="miss")
+            return None
+
+    def put(self, message: str, tool_calls: list) -> bool:
+        """Remember a plan; returns False (and stores nothing) if it isn't cacheable"""
+        if self.maxsize <= 0 or not tool_calls or any(call["name"] not in PLAN_CACHE_TOOLS for call in tool_calls):
+            return False
+        plan = tuple((call["name"], copy.deepcopy(call["args"])) for call in tool_calls)
+        key = self._key(message)
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, plan)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+plan_cache = PlanCache()
@@ -0,0 +1,254 @@
+# metrics.py
+"""Minimal Prometheus-style metrics: counters, gauges and histograms with labels.
+
+Thread-safe (tools run on worker threads) and rendered in the Prometheus text
+exposition format by render(), which chatbot_server serves at /metrics.
+"""
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from cache hits up to slow LLM turns
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, key: tuple, extra: dict = None) -> str:
+        pairs = list(zip(self.labelnames, key)) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> list:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{self._format_labels(key)} {value}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """A value that goes up and down; can also be read from a callback at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        self._function = function
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function):
+        """Read the (unlabelled) value from ``function()`` whenever metrics are rendered"""
+        self._function = function
+
+    def _samples(self):
+        if self._function is not None:
+            return [f"{self.name} {self._function()}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{self._format_labels(key)} {value}" for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the ``with`` block; labels may be updated inside it"""
+        start = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[-1] if series else 0
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = []
+        for key, series in items:
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{self._format_labels(key, {'le': bound})} {count}")
+            lines.append(f"{self.name}_bucket{self._format_labels(key, {'le': '+Inf'})} {series[-1]}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {series[-2]}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def get(self, name: str):
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text format"""
+    return REGISTRY.render()
+
+
+def resident_memory_bytes() -> int:
+    """Current resident set size of this process (peak RSS where /proc isn't available, 0 on Windows)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource  # Unix only
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+# ---------- CalBot metrics ----------
+TOOL_DURATION = Histogram(
+    "calbot_tool_duration_seconds", "Tool invocation latency", ("tool", "outcome")
+)
+CALCOM_REQUEST_DURATION = Histogram(
+    "calbot_calcom_request_duration_seconds", "Cal.com API request latency",
+    ("method", "endpoint", "status")
+)
+LLM_REQUEST_DURATION = Histogram(
+    "calbot_llm_request_duration_seconds", "Model call latency", ("mode", "outcome")
+)
+AGENT_ITERATIONS = Histogram(
+    "calbot_agent_iterations", "Model iterations per agent turn", (),
+    buckets=(1, 2, 3, 4, 5)
+)
+AGENT_TURNS = Counter(
+    "calbot_agent_turns_total", "Chat turns by how they were answered", ("path",)
+)
+WEBSOCKET_CONNECTIONS = Gauge(
+    "calbot_websocket_connections", "Active WebSocket connections"
+)
+CALCOM_QUEUE_DEPTH = Gauge(
+    "calbot_calcom_queue_depth", "Cal.com requests waiting for the client-side rate limiter", ("lane",)
+)
+CALCOM_QUEUE_WAIT = Histogram(
+    "calbot_calcom_queue_wait_seconds", "Time Cal.com requests waited for the rate limiter", ("lane",)
+)
+CALCOM_THROTTLED = Counter(
+    "calbot_calcom_throttled_total", "Cal.com requests held back by rate limits", ("lane", "outcome")
+)
+CALCOM_COALESCED = Counter(
+    "calbot_calcom_coalesced_requests_total", "Cal.com GETs answered by an identical request already in flight",
+    ("endpoint",)
+)
+SLOT_CACHE_REQUESTS = Counter(
+    "calbot_slot_cache_requests_total", "Slot cache lookups", ("result",)
+)
+ROUTER_DECISIONS = Counter(
+    "calbot_router_decisions_total", "Intent router outcomes per chat turn", ("intent", "decision")
+)
+PLAN_CACHE_REQUESTS = Counter(
+    "calbot_plan_cache_requests_total", "Lookups of cached model tool-call plans", ("result",)
+)
+LLM_PROMPT_TOKENS = Counter(
+    "calbot_llm_prompt_tokens_total", "Prompt tokens sent to the model, by provider prompt-cache hit", ("cache",)
+)
+SESSIONS = Gauge(
+    "calbot_sessions", "Chat sessions held in the session store"
+)
+SESSIONS_CLOSED = Counter(
+    "calbot_sessions_closed_total", "Chat sessions removed from the session store", ("reason",)
+)
+PROCESS_RESIDENT_MEMORY = Gauge(
+    "calbot_process_resident_memory_bytes", "Resident memory of this server process",
+    function=resident_memory_bytes
+)
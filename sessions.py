@@ -0,0 +1,479 @@
+# sessions.py
+"""Per-connection chat state with idle expiry and a cap on the number of sessions.
+
+Each WebSocket connection gets a Session: its pending confirmation
+(ConversationContext) and its conversation history. Sessions expire after
+SESSION_IDLE_TTL seconds without a message, and the least recently used ones
+are evicted once there are SESSION_MAX_COUNT of them. When a connection ends,
+its session is dropped right away unless it has something to resume (a
+pending confirmation or earlier turns). A client that reconnects with its
+session id, or sends it with a /chat request, picks up where it left off.
+
+SESSION_BACKEND chooses where sessions live:
+
+- ``memory`` (default): in this process. Only correct with a single worker.
+- ``sqlite``: a SQLite file (SESSION_DB_PATH) shared by the workers on one host.
+- ``redis``: a Redis-protocol server (Redis, Valkey, KeyDB) at SESSION_REDIS_URL,
+  shared by workers on any host. Redis expires idle sessions itself;
+  SESSION_MAX_COUNT is left to its maxmemory policy.
+
+The memory store is only touched from the event loop. The shared backends
+block on disk or network I/O (a SQLite writer may wait up to 10s for a lock),
+so the server calls them from worker threads (``SessionStore.blocking``);
+each serializes its own connection. ``size`` is a cheap session count for
+metrics: exact in memory, and for the shared backends kept up to date by this
+process's own calls and recounted on every sweep.
+"""
+import abc
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from urllib.parse import unquote, urlparse
+
+from history import ConversationHistory
+from metrics import SESSIONS_CLOSED
+
+SESSION_IDLE_TTL = float(os.getenv('SESSION_IDLE_TTL', '1800'))
+SESSION_MAX_COUNT = int(os.getenv('SESSION_MAX_COUNT', '10000'))
+SESSION_SWEEP_INTERVAL = float(os.getenv('SESSION_SWEEP_INTERVAL', '60'))
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'memory').lower()
+SESSION_DB_PATH = os.getenv('SESSION_DB_PATH', 'sessions.db')
+SESSION_REDIS_URL = os.getenv('SESSION_REDIS_URL', 'redis://127.0.0.1:6379/0')
+
+
+# this class is set to handle conversation context
+# This will help manage pending actions like bookings, cancellations, etc.
+class ConversationContext:
+    __slots__ = ("pending_action", "pending_data")
+
+    def __init__(self):
+        self.pending_action = None
+        self.pending_data = None
+
+    def set_pending_booking(self, event_type_id, date, suggested_time, original_time):
+        self.pending_action = "booking_confirmation"
+        self.pending_data = {
+            "event_type_id": event_type_id,
+            "date": date,
+            "suggested_time": suggested_time,
+            "original_time": original_time
+        }
+
+    def set_pending_tool_call(self, tool_call: dict, summary: str):
+        """A routed calendar change waiting for the user's yes/no"""
+        self.pending_action = "tool_confirmation"
+        self.pending_data = {"tool_call": tool_call, "summary": summary}
+
+    def clear(self):
+        self.pending_action = None
+        self.pending_data = None
+
+    def to_dict(self) -> dict:
+        return {"pending_action": self.pending_action, "pending_data": self.pending_data}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ConversationContext":
+        context = cls()
+        context.pending_action = data.get("pending_action")
+        context.pending_data = data.get("pending_data")
+        return context
+
+
+class Session:
+    __slots__ = ("id", "context", "history", "last_seen")
+
+    def __init__(self, session_id: str, now: float):
+        self.id = session_id
+        self.context = ConversationContext()
+        self.history = ConversationHistory()
+        self.last_seen = now
+
+    @property
+    def resumable(self) -> bool:
+        """Whether there is anything to come back to (a pending confirmation or earlier turns)"""
+        return self.context.pending_action is not None or len(self.history) > 0
+
+    def to_dict(self) -> dict:
+        return {"context": self.context.to_dict(), "history": self.history.to_dict()}
+
+    @classmethod
+    def from_dict(cls, session_id: str, data: dict, last_seen: float) -> "Session":
+        session = cls(session_id, last_seen)
+        session.context = ConversationContext.from_dict(data.get("context", {}))
+        session.history = ConversationHistory.from_dict(data.get("history", {}))
+        return session
+
+
+class SessionStore(abc.ABC):
+    """Sessions by id. Subclasses implement storage; see create_session_store()"""
+    # Whether calls do blocking I/O and belong on a worker thread
+    blocking = True
+
+    def __init__(self, idle_ttl: float = SESSION_IDLE_TTL, max_sessions: int = SESSION_MAX_COUNT,
+                 clock=time.time):
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self._clock = clock
+        self._size = 0
+
+    @property
+    def size(self) -> int:
+        """Session count without a query (see the module docstring)"""
+        return self._size
+
+    @abc.abstractmethod
+    def __len__(self) -> int:
+        """Exact session count; may query the backend"""
+
+    @abc.abstractmethod
+    def open(self, session_id: str) -> Session:
+        """Start a fresh session, evicting the least recently used ones if the store is full"""
+
+    @abc.abstractmethod
+    def get(self, session_id: str) -> Optional[Session]:
+        """The live session (marking it used), or None if it is unknown or has expired"""
+
+    @abc.abstractmethod
+    def save(self, session: Session):
+        """Store the session's state after a turn and mark it used"""
+
+    @abc.abstractmethod
+    def close(self, session_id: str, reason: str = "disconnect") -> bool:
+        """Drop a session; False if there was none"""
+
+    def sweep(self) -> int:
+        """Drop sessions idle for longer than idle_ttl (and recount them); returns how many"""
+        return 0
+
+    def get_or_open(self, session_id: str) -> Session:
+        return self.get(session_id) or self.open(session_id)
+
+    def release(self, session_id: str) -> bool:
+        """A connection using the session ended: drop the session unless it can be resumed"""
+        session = self.get(session_id)
+        if session is not None and not session.resumable:
+            return self.close(session_id)
+        return False
+
+
+class MemorySessionStore(SessionStore):
+    """Sessions in this process, least recently used first"""
+    blocking = False
+
+    def __init__(self, idle_ttl: float = SESSION_IDLE_TTL, max_sessions: int = SESSION_MAX_COUNT,
+                 clock=time.monotonic):
+        super().__init__(idle_ttl, max_sessions, clock)
+        self._sessions = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    @property
+    def size(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def open(self, session_id: str) -> Session:
+        self._sessions.pop(session_id, None)
+        while len(self._sessions) >= self.max_sessions > 0:
+            self._sessions.popitem(last=False)
+            SESSIONS_CLOSED.inc(reason="capacity")
+        session = Session(session_id, self._clock())
+        self._sessions[session_id] = session
+        return session
+
+    def get(self, session_id: str) -> Optional[Session]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        now = self._clock()
+        if now - session.last_seen > self.idle_ttl:
+            del self._sessions[session_id]
+            SESSIONS_CLOSED.inc(reason="idle")
+            return None
+        session.last_seen = now
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def save(self, session: Session):
+        # Sessions are live objects here; just mark it used (and put it back if it was evicted mid-turn)
+        session.last_seen = self._clock()
+        self._sessions[session.id] = session
+        self._sessions.move_to_end(session.id)
+
+    def close(self, session_id: str, reason: str = "disconnect") -> bool:
+        if self._sessions.pop(session_id, None) is None:
+            return False
+        SESSIONS_CLOSED.inc(reason=reason)
+        return True
+
+    def sweep(self) -> int:
+        cutoff = self._clock() - self.idle_ttl
+        expired = 0
+        # Least recently used first, so stop at the first session still in use
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_seen >= cutoff:
+                break
+            del self._sessions[session_id]
+            expired += 1
+        if expired:
+            SESSIONS_CLOSED.inc(expired, reason="idle")
+        return expired
+
+    def clear(self):
+        self._sessions.clear()
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions in a SQLite file that every worker process on the host opens"""
+
+    def __init__(self, path: str = SESSION_DB_PATH, idle_ttl: float = SESSION_IDLE_TTL,
+                 max_sessions: int = SESSION_MAX_COUNT, clock=time.time):
+        super().__init__(idle_ttl, max_sessions, clock)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+        with self._lock:
+            # WAL lets workers read while another writes
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, last_seen REAL NOT NULL, data TEXT NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen)")
+            self._size = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def open(self, session_id: str) -> Session:
+        session = Session(session_id, self._clock())
+        data = json.dumps(session.to_dict())
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+                if self.max_sessions > 0:
+                    count = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+                    excess = count - self.max_sessions + 1
+                    if excess > 0:
+                        self._db.execute(
+                            "DELETE FROM sessions WHERE id IN (SELECT id FROM sessions ORDER BY last_seen LIMIT ?)",
+                            (excess,)
+                        )
+                        SESSIONS_CLOSED.inc(excess, reason="capacity")
+                self._db.execute("INSERT INTO sessions (id, last_seen, data) VALUES (?, ?, ?)",
+                                 (session_id, session.last_seen, data))
+                self._size = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return session
+
+    def get(self, session_id: str) -> Optional[Session]:
+        now = self._clock()
+        with self._lock:
+            row = self._db.execute("SELECT last_seen, data FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            if now - row[0] > self.idle_ttl:
+                self._size -= self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,)).rowcount
+                SESSIONS_CLOSED.inc(reason="idle")
+                return None
+            self._db.execute("UPDATE sessions SET last_seen = ? WHERE id = ?", (now, session_id))
+        return Session.from_dict(session_id, json.loads(row[1]), now)
+
+    def save(self, session: Session):
+        session.last_seen = self._clock()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO sessions (id, last_seen, data) VALUES (?, ?, ?)",
+                             (session.id, session.last_seen, json.dumps(session.to_dict())))
+
+    def close(self, session_id: str, reason: str = "disconnect") -> bool:
+        with self._lock:
+            deleted = self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,)).rowcount
+            self._size -= deleted
+        if deleted:
+            SESSIONS_CLOSED.inc(reason=reason)
+        return bool(deleted)
+
+    def sweep(self) -> int:
+        with self._lock:
+            expired = self._db.execute("DELETE FROM sessions WHERE last_seen < ?",
+                                       (self._clock() - self.idle_ttl,)).rowcount
+            self._size = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        if expired:
+            SESSIONS_CLOSED.inc(expired, reason="idle")
+        return expired
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM sessions")
+            self._size = 0
+
+
+class RedisError(Exception):
+    """An error reply from the Redis-protocol server"""
+
+
+class RespClient:
+    """Just enough of a Redis (RESP2) client for the session store: one
+    connection, reconnected on failure, commands serialized by a lock"""
+
+    def __init__(self, url: str = SESSION_REDIS_URL, timeout: float = 5.0):
+        parsed = urlparse(url)
+        if parsed.scheme not in ("redis", ""):
+            raise ValueError(f"Unsupported session Redis URL scheme: {parsed.scheme}")
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._sock = None
+        self._reader = None
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._reader = self._sock.makefile("rb")
+        if self.password:
+            self._call(*(("AUTH", self.username, self.password) if self.username else ("AUTH", self.password)))
+        if self.db:
+            self._call("SELECT", self.db)
+
+    def _close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = self._reader = None
+
+    def _call(self, *args):
+        parts = [str(arg).encode() if not isinstance(arg, bytes) else arg for arg in args]
+        payload = b"*%d\r\n" % len(parts) + b"".join(b"$%d\r\n%s\r\n" % (len(p), p) for p in parts)
+        self._sock.sendall(payload)
+        return self._read()
+
+    def _read(self):
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RedisError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(rest)
+            return None if length < 0 else [self._read() for _ in range(length)]
+        raise RedisError(f"Unexpected reply: {line!r}")
+
+    def execute(self, *args):
+        """Send one command and return its reply; retried once on a broken connection"""
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._call(*args)
+                except (OSError, ConnectionError):
+                    self._close()
+                    if attempt:
+                        raise
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+
+class RedisSessionStore(SessionStore):
+    """Sessions as JSON strings on a Redis-protocol server, each with an idle-TTL expiry"""
+
+    def __init__(self, url: str = SESSION_REDIS_URL, idle_ttl: float = SESSION_IDLE_TTL,
+                 max_sessions: int = SESSION_MAX_COUNT, clock=time.time, prefix: str = "calbot:session:"):
+        super().__init__(idle_ttl, max_sessions, clock)
+        self.client = RespClient(url)
+        self.prefix = prefix
+
+    def _ttl_ms(self) -> int:
+        return max(1, int(self.idle_ttl * 1000))
+
+    def __len__(self) -> int:
+        count, cursor = 0, "0"
+        while True:
+            cursor, keys = self.client.execute("SCAN", cursor, "MATCH", f"{self.prefix}*", "COUNT", 1000)
+            cursor = cursor.decode()
+            count += len(keys)
+            if cursor == "0":
+                return count
+
+    def open(self, session_id: str) -> Session:
+        session = Session(session_id, self._clock())
+        self.save(session)
+        self._size += 1
+        return session
+
+    def get(self, session_id: str) -> Optional[Session]:
+        key = self.prefix + session_id
+        data = self.client.execute("GET", key)
+        if data is None:
+            return None
+        self.client.execute("PEXPIRE", key, self._ttl_ms())
+        return Session.from_dict(session_id, json.loads(data), self._clock())
+
+    def save(self, session: Session):
+        session.last_seen = self._clock()
+        self.client.execute("SET", self.prefix + session.id, json.dumps(session.to_dict()), "PX", self._ttl_ms())
+
+    def close(self, session_id: str, reason: str = "disconnect") -> bool:
+        deleted = self.client.execute("DEL", self.prefix + session_id)
+        self._size = max(0, self._size - deleted)
+        if deleted:
+            SESSIONS_CLOSED.inc(reason=reason)
+        return bool(deleted)
+
+    def clear(self):
+        cursor = "0"
+        while True:
+            cursor, keys = self.client.execute("SCAN", cursor, "MATCH", f"{self.prefix}*", "COUNT", 1000)
+            cursor = cursor.decode()
+            if keys:
+                self.client.execute("DEL", *keys)
+            if cursor == "0":
+                self._size = 0
+                return
+
+    def sweep(self) -> int:
+        # Redis expires idle sessions itself; only the count needs refreshing
+        self._size = len(self)
+        return 0
+
+
+def create_session_store(backend: str = SESSION_BACKEND) -> SessionStore:
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    if backend == "redis":
+        return RedisSessionStore()
+    if backend != "memory":
+        print(f"⚠️ Unknown SESSION_BACKEND '{backend}', keeping sessions in memory")
+    return MemorySessionStore()
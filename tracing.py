@@ -0,0 +1,232 @@
+# tracing.py
+"""Request tracing with OpenTelemetry-shaped spans and a local exporter.
+
+Spans nest through a context variable, so a chat turn's root span becomes the
+parent of the model, tool and Cal.com spans beneath it, including spans started
+on worker threads that run with a copy of the context (see ``wrap``).
+Finished spans are written as one JSON object per line, in the same layout as
+the OpenTelemetry SDK's ConsoleSpanExporter, either to stdout or to a file.
+
+Configured with TRACE_EXPORTER (none, console or file) and TRACE_FILE. With
+the default of "none", spans are no-ops.
+"""
+import contextvars
+import functools
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+TRACE_EXPORTER = os.getenv('TRACE_EXPORTER', 'none').lower()
+TRACE_FILE = os.getenv('TRACE_FILE', 'traces.jsonl')
+
+_current_span = contextvars.ContextVar("calbot_current_span", default=None)
+
+
+def _iso(ns: int) -> str:
+    return datetime.fromtimestamp(ns / 1e9, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def _attribute(value):
+    """Coerce a value to an OpenTelemetry attribute type (str, bool, int, float)"""
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    try:
+        return json.dumps(value, default=str, sort_keys=True)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+class Span:
+    """One timed operation; use ``span()`` rather than creating these directly"""
+
+    def __init__(self, name: str, trace_id: str, parent_id: str = None, kind: str = "INTERNAL",
+                 attributes: dict = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = {}
+        self.events = []
+        self.status = "UNSET"
+        self.status_description = None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.set_attributes(attributes or {})
+
+    def set_attribute(self, key: str, value):
+        if value is not None:
+            self.attributes[key] = _attribute(value)
+
+    def set_attributes(self, attributes: dict):
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def add_event(self, name: str, attributes: dict = None):
+        self.events.append({
+            "name": name,
+            "timestamp": _iso(time.time_ns()),
+            "attributes": {k: _attribute(v) for k, v in (attributes or {}).items()},
+        })
+
+    def set_status(self, status: str, description: str = None):
+        self.status = status
+        self.status_description = description
+
+    def record_exception(self, exc: BaseException):
+        self.add_event("exception", {
+            "exception.type": type(exc).__name__,
+            "exception.message": str(exc),
+            "exception.stacktrace": "".join(traceback.format_exception(type(exc), exc, exc.__traceback__)),
+        })
+        self.set_status("ERROR", f"{type(exc).__name__}: {exc}")
+
+    @property
+    def duration(self) -> float:
+        """Seconds from start to end (or to now, while the span is open)"""
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def to_dict(self) -> dict:
+        status = {"status_code": self.status}
+        if self.status_description:
+            status["description"] = self.status_description
+        return {
+            "name": self.name,
+            "context": {"trace_id": f"0x{self.trace_id}", "span_id": f"0x{self.span_id}"},
+            "kind": f"SpanKind.{self.kind}",
+            "parent_id": f"0x{self.parent_id}" if self.parent_id else None,
+            "start_time": _iso(self.start_ns),
+            "end_time": _iso(self.end_ns) if self.end_ns else None,
+            "status": status,
+            "attributes": self.attributes,
+            "events": self.events,
+            "resource": {"attributes": {"service.name": "calbot"}},
+        }
+
+
+class _NoopSpan:
+    """Stand-in returned when tracing is off, so call sites never need to check"""
+    trace_id = span_id = parent_id = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def add_event(self, name, attributes=None):
+        pass
+
+    def set_status(self, status, description=None):
+        pass
+
+    def record_exception(self, exc):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class ConsoleExporter:
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict())
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+class FileExporter(ConsoleExporter):
+    """Append spans as JSON lines to ``path``"""
+
+    def __init__(self, path: str):
+        super().__init__(open(path, "a", buffering=1, encoding="utf-8"))
+        self.path = path
+
+
+class InMemoryExporter:
+    """Keep finished spans in a list; handy in benchmarks and the REPL"""
+
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span: Span):
+        self.spans.append(span)
+
+
+def _exporter_from_env():
+    if TRACE_EXPORTER == "console":
+        return ConsoleExporter()
+    if TRACE_EXPORTER == "file":
+        return FileExporter(TRACE_FILE)
+    if TRACE_EXPORTER not in ("", "none", "off"):
+        print(f"⚠️ Unknown TRACE_EXPORTER '{TRACE_EXPORTER}', tracing disabled")
+    return None
+
+
+_exporter = _exporter_from_env()
+
+
+def set_exporter(exporter):
+    """Replace the exporter (None turns tracing off)"""
+    global _exporter
+    _exporter = exporter
+
+
+def enabled() -> bool:
+    return _exporter is not None
+
+
+def current_span():
+    """The innermost open span in this context, or a no-op span"""
+    return _current_span.get() or NOOP_SPAN
+
+
+@contextmanager
+def span(name: str, attributes: dict = None, kind: str = "INTERNAL"):
+    """Open a child of the current span (or a new trace) for the ``with`` block.
+
+    Exceptions are recorded on the span and re-raised.
+    """
+    exporter = _exporter
+    if exporter is None:
+        yield NOOP_SPAN
+        return
+    parent = _current_span.get()
+    current = Span(
+        name,
+        trace_id=parent.trace_id if parent else secrets.token_hex(16),
+        parent_id=parent.span_id if parent else None,
+        kind=kind,
+        attributes=attributes,
+    )
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as exc:
+        current.record_exception(exc)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end_ns = time.time_ns()
+        if current.status == "UNSET":
+            current.set_status("OK")
+        try:
+            exporter.export(current)
+        except Exception as e:
+            print(f"⚠️ Failed to export span {name}: {e}")
+
+
+def wrap(func):
+    """Bind ``func`` to a copy of the current context, so spans it opens on
+    another thread are children of the current span"""
+    return functools.partial(contextvars.copy_context().run, func)